@@ -0,0 +1,55 @@
+"""
+Cold-start benchmark: time to import the deployed entry point (`main.py`) in a fresh interpreter.
+
+Each run starts a new Python process, as a new function instance would. Point `--functions-dir` at
+an older checkout of `functions/` to compare against it.
+
+    python benchmarks/bench_cold_start.py --runs 5
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "functions")
+
+# Prints the import time of `main` and the modules it pulled in
+PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "ee": "ee" in sys.modules,
+                  "monitoring": "google.cloud.monitoring_v3" in sys.modules,
+                  "firestore": "google.cloud.firestore" in sys.modules}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--functions-dir", default=FUNCTIONS_DIR)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("BUCKET_NAME", "benchmark-bucket")
+    env.setdefault("PROJECT_ID", "benchmark-project")
+
+    timings = []
+    for _ in range(args.runs):
+        result = subprocess.run([sys.executable, "-c", PROBE], cwd=args.functions_dir, env=env,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            sys.exit(f"import main failed:\n{result.stderr}")
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(probe["seconds"])
+
+    print(f"import main: median {statistics.median(timings) * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms over {args.runs} runs")
+    print(f"loaded at import: ee={probe['ee']} monitoring={probe['monitoring']} firestore={probe['firestore']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark and accuracy check of the latency distribution merging.
+
+Splits synthetic log-normal latencies into many Monitoring-like distributions (alternating between an
+exponential and a linear bucket layout), merges them and compares the reported percentiles with the exact
+percentiles of the raw samples. Also reports the merge time for wide windows.
+
+    python benchmarks/bench_distributions.py --samples 1000000 --distributions 10000
+"""
+import os
+import sys
+import time
+import argparse
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "functions"))
+
+from distributions import PERCENTILES, bucket_bounds, merge_distributions, distribution_percentiles  # noqa: E402
+
+LAYOUTS = [
+    SimpleNamespace(
+        explicit_buckets=SimpleNamespace(bounds=[]),
+        exponential_buckets=SimpleNamespace(num_finite_buckets=66, growth_factor=1.4, scale=1.0),
+        linear_buckets=SimpleNamespace(num_finite_buckets=0),
+    ),
+    SimpleNamespace(
+        explicit_buckets=SimpleNamespace(bounds=[]),
+        exponential_buckets=SimpleNamespace(num_finite_buckets=0),
+        linear_buckets=SimpleNamespace(num_finite_buckets=200, width=2.0, offset=0.0),
+    ),
+]
+
+
+def make_distributions(samples, count):
+    """Split `samples` into `count` distributions, alternating between the bucket layouts."""
+    distributions = []
+    for index, part in enumerate(np.array_split(samples, count)):
+        bucket_options = LAYOUTS[index % len(LAYOUTS)]
+        bounds = bucket_bounds(bucket_options)
+        bucket_counts = np.bincount(np.searchsorted(bounds, part, side="right"), minlength=len(bounds) + 1)
+        distributions.append(SimpleNamespace(count=len(part), mean=float(part.mean()),
+                                             bucket_options=bucket_options, bucket_counts=bucket_counts.tolist()))
+    return distributions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--distributions", type=int, default=10_000)
+    args = parser.parse_args()
+
+    samples = np.random.default_rng(0).lognormal(3, 0.8, args.samples)
+    distributions = make_distributions(samples, args.distributions)
+
+    started = time.perf_counter()
+    merged = merge_distributions(distributions)
+    percentiles = distribution_percentiles(merged)
+    elapsed = time.perf_counter() - started
+
+    exact = dict(zip(PERCENTILES, np.percentile(samples, PERCENTILES)))
+    print(f"{args.distributions} distributions, {args.samples} samples: merged in {elapsed * 1000:.1f} ms")
+    print(f"{'':>6} {'merged':>10} {'exact':>10} {'error':>7}")
+    print(f"{'mean':>6} {merged['mean']:>10.2f} {samples.mean():>10.2f} "
+          f"{abs(merged['mean'] - samples.mean()) / samples.mean():>7.2%}")
+    for p in PERCENTILES:
+        error = abs(percentiles[p] - exact[p]) / exact[p]
+        print(f"{'p' + str(p):>6} {percentiles[p]:>10.2f} {exact[p]:>10.2f} {error:>7.2%}")
+
+
+if __name__ == "__main__":
+    main()
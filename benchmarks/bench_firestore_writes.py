@@ -0,0 +1,51 @@
+"""
+Write-throughput benchmark of the Landsat metadata persistence against the Firestore emulator.
+
+Compares one `set()` round trip per document with `firestore_writes.write_documents` (batched writes).
+
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=localhost:8081 python benchmarks/bench_firestore_writes.py --documents 2000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "functions"))
+
+from google.cloud import firestore  # noqa: E402
+from fake_earth_engine import FakeEarthEngineClient  # noqa: E402
+from firestore_writes import write_documents  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--project", default="cloudimagemanager")
+    args = parser.parse_args()
+
+    if "FIRESTORE_EMULATOR_HOST" not in os.environ:
+        sys.exit("FIRESTORE_EMULATOR_HOST is not set; start the Firestore emulator first.")
+
+    client = firestore.Client(project=args.project)
+    scenes = FakeEarthEngineClient(scene_count=args.documents).list_scenes("LANDSAT/LC09", "2023-01-01", "2023-04-01",
+                                                                           None)
+    documents = {scene["properties"]["system:index"]: scene for scene in scenes}
+
+    started = time.perf_counter()
+    for document_id, data in documents.items():
+        client.collection("bench_metadata_set").document(document_id).set(data)
+    single = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batches = write_documents(client, "bench_metadata_batch", documents)
+    batched = time.perf_counter() - started
+
+    print(f"{'mode':>8} {'seconds':>9} {'docs/s':>9} {'round trips':>12}")
+    print(f"{'set':>8} {single:>9.2f} {len(documents) / single:>9.1f} {len(documents):>12}")
+    print(f"{'batched':>8} {batched:>9.2f} {len(documents) / batched:>9.1f} {batches:>12}")
+    print(f"speedup: {single / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Load test of the synchronous and async (`ASYNC_HANDLERS`) handlers against the local fakes.
+
+- `get_firebase_stats`: `--concurrency` client threads, like the concurrent requests of one instance,
+  call it for `--duration` seconds with the metrics cache disabled; reports requests/s and latency.
+- `landsat_cron`: one run ingesting `--images` scenes; reports scenes/s.
+
+Every fake round trip takes `--latency` seconds. Each mode runs in its own process, since
+`ASYNC_HANDLERS` is read at import:
+
+    python benchmarks/bench_load.py --concurrency 1 8 32 --latency 0.05
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from types import SimpleNamespace
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODES = {"sync": "false", "async": "true"}
+
+
+def measure_stats(world, concurrency, duration):
+    import main
+    from bench_suite import http_call, percentile
+
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = http_call(main.get_firebase_stats, {})
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                failures[0] += response.status_code != 200
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "failures": failures[0],
+    }
+
+
+def measure_cron(world, images):
+    import main
+    import landsat_cron
+    from bench_suite import http_call
+
+    landsat_cron.earth_engine_client = world.earth_engine
+    world.upload_config()
+    started = time.perf_counter()
+    response = http_call(main.landsat_cron, {"collection": "LANDSAT/LC09/C02/T2_TOA"})
+    elapsed = time.perf_counter() - started
+    return {"images": images, "seconds": round(elapsed, 2), "scenes_per_second": round(images / elapsed, 1),
+            "status": response.status_code}
+
+
+def run_mode(args):
+    """Measure one mode in this process and print the results as JSON."""
+    from bench_suite import BUCKET_NAME, PROJECT_ID, CONFIG_PATH, FUNCTIONS_DIR, World, http_call
+
+    os.environ.update({"BUCKET_NAME": BUCKET_NAME, "PROJECT_ID": PROJECT_ID, "CONFIG_PATH": CONFIG_PATH})
+    sys.path.insert(0, FUNCTIONS_DIR)
+    import main
+
+    world = World(SimpleNamespace(images=args.images, image_size=256, latency=args.latency, backend="fake"))
+    world.populate_images()
+    # Build the usage aggregates the way the daily reconciliation does
+    http_call(main.reconcile_storage_usage, headers={"X-CloudScheduler-JobName": "benchmark"})
+
+    results = {"stats": [measure_stats(world, concurrency, args.duration) for concurrency in args.concurrency],
+               "cron": measure_cron(world, args.images)}
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated round-trip latency of the fakes")
+    parser.add_argument("--images", type=int, default=200, help="Scenes ingested by the landsat_cron run")
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        sys.path.insert(0, BENCHMARKS_DIR)
+        run_mode(args)
+        return
+
+    results = {}
+    for mode, flag in MODES.items():
+        env = dict(os.environ, ASYNC_HANDLERS=flag, METRICS_CACHE_TTL="0")
+        command = [sys.executable, __file__, "--run", "--duration", str(args.duration), "--latency",
+                   str(args.latency), "--images", str(args.images), "--concurrency", *map(str, args.concurrency)]
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print("get_firebase_stats")
+    print(f"{'mode':>6} {'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'failed':>7}")
+    for mode, result in results.items():
+        for stats in result["stats"]:
+            print(f"{mode:>6} {stats['concurrency']:>8} {stats['requests_per_second']:>8} {stats['p50_ms']:>8} "
+                  f"{stats['p99_ms']:>8} {stats['failures']:>7}")
+
+    print("\nlandsat_cron")
+    print(f"{'mode':>6} {'scenes':>8} {'seconds':>8} {'scenes/s':>9} {'status':>7}")
+    for mode, result in results.items():
+        cron = result["cron"]
+        print(f"{mode:>6} {cron['images']:>8} {cron['seconds']:>8} {cron['scenes_per_second']:>9} {cron['status']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Memory benchmark of the image decode path.
+
+Reports the peak RSS of scaling source images of increasing size, once downloading each source fully
+before decoding it (`buffered`, the previous path) and once streaming it into the decoder through
+`blob.open("rb")` (`streamed`). Sources are served from local files, like a blob reader reading ranges
+over the network, and every measurement runs in its own process. Sizes above the `MAX_SOURCE_PIXELS`
+budget are reported as rejected.
+
+    python benchmarks/bench_memory.py --sizes 1024 2048 4096 --workers 4
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARKS_DIR, "..", "functions"), BENCHMARKS_DIR]
+
+from bench_suite import make_png, peak_rss_mib, reset_peak_rss  # noqa: E402
+
+MODES = ("buffered", "streamed")
+
+
+class FileBlob:
+    """Source blob backed by a local file: `open()` reads it in chunks, `download_as_bytes()` reads all of it."""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.generation = 1
+
+    def open(self, mode="rb", chunk_size=None, timeout=None, retry=None):
+        return open(self.path, "rb", buffering=chunk_size or -1)
+
+    def download_as_bytes(self, timeout=None, retry=None):
+        with open(self.path, "rb") as source:
+            return source.read()
+
+
+def current_rss_mib():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def measure(path, mode, workers, renditions):
+    """Scale `workers` copies of the source concurrently in this process and print the peak RSS as JSON."""
+    import image_scaling
+
+    specs = [image_scaling.RENDITIONS[name] for name in renditions]
+    blobs = [FileBlob(f"landsat_images/scene_{index:05d}.png", path) for index in range(workers)]
+
+    def render(blob):
+        if mode == "buffered":
+            return image_scaling.render_renditions(blob.download_as_bytes(), specs)
+        return image_scaling.render_blob(blob, specs)
+
+    baseline = current_rss_mib()
+    reset_peak_rss()
+    error = None
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(render, blobs))
+    except image_scaling.ImageTooLargeError as e:
+        error = str(e)
+    print(json.dumps({"baseline_mib": baseline, "peak_mib": peak_rss_mib(), "error": error}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048, 4096, 6144],
+                        help="Edge lengths of the synthetic source images")
+    parser.add_argument("--workers", type=int, default=4, help="Images scaled concurrently")
+    parser.add_argument("--renditions", nargs="+", default=["hd", "thumb"])
+    parser.add_argument("--measure", nargs=2, metavar=("PATH", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure[0], args.measure[1], args.workers, args.renditions)
+        return
+
+    print(f"{'size':>6} {'source MiB':>10} {'mode':>9} {'peak MiB':>9} {'over baseline':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            path = os.path.join(directory, f"source_{size}.png")
+            with open(path, "wb") as source:
+                source.write(make_png(size, 0))
+            source_mib = os.path.getsize(path) / 2**20
+
+            for mode in MODES:
+                command = [sys.executable, __file__, "--measure", path, mode, "--workers", str(args.workers),
+                           "--renditions", *args.renditions]
+                result = json.loads(subprocess.run(command, capture_output=True, text=True, check=True).stdout)
+                over = result["peak_mib"] - result["baseline_mib"]
+                line = f"{size:>6} {source_mib:>10.1f} {mode:>9} {result['peak_mib']:>9.1f} {over:>14.1f}"
+                print(line + (f"  rejected: {result['error']}" if result["error"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark of the rendition formats.
+
+Reports the average encoded size and render time (decode + resize + encode) per image for every
+size/format combination, so the rendition specs can be tuned.
+
+    python benchmarks/bench_renditions.py --images 8 --size 2048
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "functions"))
+
+from PIL import Image  # noqa: E402
+from bench_scaling import make_png  # noqa: E402
+from image_scaling import RenditionSpec, render_renditions  # noqa: E402
+
+SIZES = {"thumb": (320, 320), "720p": (1280, 720), "1080p": (1920, 1080)}
+Image.init()
+FORMATS = [image_format for image_format in ("PNG", "JPEG", "WEBP", "AVIF") if image_format in Image.SAVE]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--size", type=int, default=2048, help="Edge length of the synthetic source images")
+    parser.add_argument("--quality", type=int, default=85)
+    args = parser.parse_args()
+
+    sources = [make_png(args.size, seed) for seed in range(args.images)]
+    source_bytes = sum(len(source) for source in sources) / len(sources)
+    print(f"source: {args.size}x{args.size} PNG, {source_bytes / 1024:.1f} KiB/image")
+
+    print(f"{'rendition':>10} {'format':>6} {'KiB/image':>10} {'ms/image':>9}")
+    for name, size in SIZES.items():
+        for image_format in FORMATS:
+            spec = RenditionSpec(name, size, image_format, quality=args.quality)
+
+            started = time.perf_counter()
+            encoded = [render_renditions(source, [spec])[name] for source in sources]
+            elapsed = time.perf_counter() - started
+
+            kib = sum(len(data) for data in encoded) / len(encoded) / 1024
+            print(f"{name:>10} {image_format:>6} {kib:>10.1f} {elapsed / len(sources) * 1000:>9.1f}")
+
+    # All renditions from a single decode, as the storage trigger does
+    specs = [RenditionSpec(name, size, "WEBP", quality=args.quality) for name, size in SIZES.items()]
+    started = time.perf_counter()
+    for source in sources:
+        render_renditions(source, specs)
+    elapsed = time.perf_counter() - started
+    print(f"all sizes, single decode (WEBP): {elapsed / len(sources) * 1000:.1f} ms/image")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Resilience benchmark of the shared HTTP session and retry layer against a local flaky HTTP server.
+
+The server answers a `--failure-rate` fraction of requests with 503 and delays a `--slow-rate` fraction
+past the read timeout. Reports the success rate, latency percentiles and retry counters of concurrent
+thumbnail-sized downloads through `http_session.fetch_bytes`.
+
+    python benchmarks/bench_retries.py --requests 500 --failure-rate 0.2
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "functions"))
+
+from http_session import fetch_bytes  # noqa: E402
+from retries import RetryPolicy, get_retry_stats  # noqa: E402
+
+PAYLOAD = os.urandom(64 * 1024)
+
+
+def make_handler(failure_rate, slow_rate, slow_seconds, seed):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class FlakyHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            with lock:
+                roll = rng.random()
+            if roll < failure_rate:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if roll < failure_rate + slow_rate:
+                time.sleep(slow_seconds)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(PAYLOAD)))
+            self.end_headers()
+            try:
+                self.wfile.write(PAYLOAD)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up on a slow response
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    return FlakyHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.02)
+    parser.add_argument("--read-timeout", type=float, default=0.5)
+    parser.add_argument("--max-attempts", type=int, default=4)
+    args = parser.parse_args()
+
+    handler = make_handler(args.failure_rate, args.slow_rate, args.read_timeout * 2, seed=0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/thumbnail.png"
+
+    policy = RetryPolicy("bench_thumbnail", max_attempts=args.max_attempts, initial_delay=0.05, max_delay=1.0)
+
+    def download(_):
+        started = time.perf_counter()
+        try:
+            fetch_bytes(url, timeout=(1.0, args.read_timeout), retry=policy)
+            return time.perf_counter() - started, True
+        except Exception:
+            return time.perf_counter() - started, False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(download, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    latencies = sorted(latency for latency, _ in results)
+    succeeded = sum(ok for _, ok in results)
+    print(f"{args.requests} downloads, {args.failure_rate:.0%} 503s, {args.slow_rate:.0%} slow: "
+          f"{succeeded / args.requests:.1%} succeeded in {elapsed:.2f}s")
+    for p in (50, 90, 99):
+        print(f"p{p}: {latencies[min(len(latencies) - 1, len(latencies) * p // 100)] * 1000:.1f} ms")
+    print(f"retry stats: {get_retry_stats()['bench_thumbnail']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark of the image scaling pipeline against a local fake bucket.
+
+Reports throughput (images/s) of `image_scaling.scale_blobs` for a range of worker counts.
+
+    python benchmarks/bench_scaling.py --images 32 --size 1024 --latency 0.05
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import random
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "functions"))
+os.environ.setdefault("SCALING_MAX_WORKERS", "64")
+os.environ.setdefault("SCALE_MISSING_RENDITIONS", "true")
+
+from fake_storage import FakeBucket, FakeBlob  # noqa: E402
+from image_scaling import scale_blobs  # noqa: E402
+
+
+def make_png(size, seed):
+    """Build a synthetic, Landsat-like RGB thumbnail."""
+    rng = random.Random(seed)
+    img = Image.effect_noise((size, size), 64).convert("RGB")
+    img = Image.blend(img, Image.new("RGB", (size, size), tuple(rng.randrange(256) for _ in range(3))), 0.5)
+    output = io.BytesIO()
+    img.save(output, format="PNG")
+    return output.getvalue()
+
+
+def populate(bucket, count, size):
+    for i in range(count):
+        FakeBlob(bucket, f"landsat_images/scene_{i:05d}.png").upload_from_string(make_png(size, i), "image/png")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--size", type=int, default=1024, help="Edge length of the synthetic source images")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated GCS latency per call in seconds")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--save-to-storage", action="store_true")
+    args = parser.parse_args()
+
+    bucket = FakeBucket(latency=0)
+    populate(bucket, args.images, args.size)
+    bucket.latency = args.latency
+    source_blobs = list(bucket.list_blobs(prefix="landsat_images/"))
+
+    print(f"{'workers':>8} {'seconds':>10} {'images/s':>10} {'errors':>7}")
+    for workers in args.workers:
+        # Drop renditions from the previous round so every round does the same work
+        for name in [name for name in bucket.objects if name.startswith("scaled_images/")]:
+            del bucket.objects[name]
+
+        started = time.perf_counter()
+        scaled_images, errors = scale_blobs(bucket, source_blobs, workers, save_to_storage=args.save_to_storage)
+        elapsed = time.perf_counter() - started
+        print(f"{workers:>8} {elapsed:>10.3f} {len(scaled_images) / elapsed:>10.2f} {len(errors):>7}")
+
+
+if __name__ == "__main__":
+    main()
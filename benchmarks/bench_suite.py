@@ -0,0 +1,545 @@
+"""
+Offline benchmark suite running every entry point in `main.__all__`.
+
+Storage, Firestore, Cloud Monitoring and Earth Engine are replaced by the in-memory fakes of this
+directory (`--backend fake`, default). With `--backend emulator` Storage and Firestore are the Firebase
+emulators of `firebase.json` instead (start them first); Monitoring and Earth Engine stay fake.
+Source images are synthetic Landsat-like PNGs, thumbnails are served by a local HTTP server.
+
+Every scenario runs in its own process so module state and peak memory don't leak between scenarios.
+For each one the suite reports latency percentiles, throughput (calls/s and items/s, e.g. images) and
+peak RSS, and saves everything as JSON so results can be compared across commits:
+
+    python benchmarks/bench_suite.py --images 100 --iterations 5
+    python benchmarks/bench_suite.py --images 10000 --only get_scaled_images --output results/10k.json
+    python benchmarks/bench_suite.py --compare results/before.json results/after.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import platform
+import resource
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FUNCTIONS_DIR = os.path.join(BENCHMARKS_DIR, "..", "functions")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+BUCKET_NAME = "benchmark-bucket"
+PROJECT_ID = "benchmark-project"
+CONFIG_PATH = "config/regions.json"
+
+# (entry point, variant) pairs; every entry point of `main.__all__` must be covered
+SCENARIOS = [
+    ("landsat_cron", "ingest"),
+    ("get_scaled_images", "scale"),
+    ("get_scaled_images", "stored"),
+    ("get_scaled_images", "not_modified"),
+    ("scale_uploaded_image", "upload"),
+    ("get_total_image_size", "index"),
+    ("get_total_image_size", "fresh"),
+    ("count_uploaded_object", "event"),
+    ("count_deleted_object", "event"),
+    ("reconcile_storage_usage", "full"),
+    ("get_network_traffic", "rollups"),
+    ("get_network_traffic", "cold"),
+    ("get_firebase_stats", "cached"),
+    ("get_firebase_stats", "cold"),
+    ("search_scenes", "page"),
+    ("backfill_scene_catalog", "page"),
+]
+
+
+def make_png(size, seed):
+    """Build a synthetic, Landsat-like RGB thumbnail."""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    img = Image.effect_noise((size, size), 64).convert("RGB")
+    img = Image.blend(img, Image.new("RGB", (size, size), tuple(rng.randrange(256) for _ in range(3))), 0.5)
+    output = io.BytesIO()
+    img.save(output, format="PNG")
+    return output.getvalue()
+
+
+def reset_peak_rss():
+    """Reset the peak RSS of the process (Linux); returns False where that isn't supported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mib():
+    """Peak resident memory of the process in MiB (since the last `reset_peak_rss` on Linux)."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class ThumbnailServer:
+    """Local HTTP server returning the same synthetic PNG for every thumbnail URL."""
+
+    def __init__(self, payload):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/thumbnails"
+
+
+class World:
+    """The fake (or emulated) backends shared by the functions of one scenario process."""
+
+    def __init__(self, args):
+        import clients
+        from fake_monitoring import FakeMetricServiceClient, FakeMetricServiceAsyncClient
+        from fake_earth_engine import FakeEarthEngineClient
+
+        self.args = args
+        if args.backend == "emulator":
+            from google.cloud import firestore, storage
+
+            storage_client = storage.Client(project=PROJECT_ID)
+            self.bucket = storage_client.bucket(BUCKET_NAME)
+            if not self.bucket.exists():
+                self.bucket = storage_client.create_bucket(BUCKET_NAME)
+            self.firestore = firestore.Client(project=PROJECT_ID)
+        else:
+            from fake_storage import FakeStorageClient
+            from fake_firestore import FakeFirestoreClient, FakeAsyncFirestoreClient
+
+            storage_client = FakeStorageClient(latency=args.latency)
+            self.bucket = storage_client.bucket(BUCKET_NAME)
+            self.firestore = FakeFirestoreClient(latency=args.latency)
+            clients.override_client("async_firestore", FakeAsyncFirestoreClient(self.firestore))
+
+        clients.override_client("storage", storage_client)
+        clients.override_client("bucket", self.bucket)
+        clients.override_client("firestore", self.firestore)
+        self.monitoring = FakeMetricServiceClient(latency=args.latency)
+        clients.override_client("monitoring", self.monitoring)
+        clients.override_client("async_monitoring", FakeMetricServiceAsyncClient(latency=args.latency))
+
+        self.png = make_png(args.image_size, 0)
+        self.thumbnails = ThumbnailServer(self.png)
+        self.earth_engine = FakeEarthEngineClient(scene_count=args.images, latency=args.latency,
+                                                  thumbnail_base_url=self.thumbnails.base_url)
+
+    def clear(self, prefix):
+        if hasattr(self.bucket, "clear"):
+            self.bucket.clear(prefix)
+        else:
+            for blob in self.bucket.list_blobs(prefix=prefix):
+                blob.delete()
+
+    def clear_collection(self, name):
+        if hasattr(self.firestore, "clear"):
+            self.firestore.clear(name)
+        else:
+            for snapshot in self.firestore.collection(name).stream():
+                snapshot.reference.delete()
+
+    def populate_images(self):
+        """Upload `--images` source PNGs (a handful of distinct images, reused) to `landsat_images/`."""
+        sources = [self.png] + [make_png(self.args.image_size, seed) for seed in range(1, 4)]
+        for index in range(self.args.images):
+            blob = self.bucket.blob(f"landsat_images/scene_{index:05d}.png")
+            blob.upload_from_string(sources[index % len(sources)], content_type="image/png")
+
+    def upload_config(self):
+        config = {"regions": [{"name": "lausanne", "coordinates": [6.746, 46.529], "radius": 10000}]}
+        self.bucket.blob(CONFIG_PATH).upload_from_string(json.dumps(config), content_type="application/json")
+
+
+_app = None
+
+
+def http_call(function, json_body=None, query_string=None, headers=None):
+    """
+    Call an HTTP (or scheduled) function with a request built by werkzeug's `EnvironBuilder`, inside a Flask
+    request context like the Functions Framework provides (needed by `flask_cors` and `make_response`).
+    """
+    global _app
+    import flask
+
+    if _app is None:
+        _app = flask.Flask("benchmarks")
+    method = "POST" if json_body is not None else "GET"
+    with _app.test_request_context(method=method, json=json_body, query_string=query_string, headers=headers):
+        return function(flask.request)
+
+
+def storage_event(blob, event_type):
+    from cloudevents.http import CloudEvent
+
+    attributes = {
+        "id": f"{blob.name}-{blob.generation}",
+        "source": f"//storage.googleapis.com/projects/_/buckets/{BUCKET_NAME}",
+        "specversion": "1.0",
+        "type": event_type,
+        "time": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f%z"),
+    }
+    data = {
+        "bucket": BUCKET_NAME,
+        "generation": blob.generation,
+        "id": f"{BUCKET_NAME}/{blob.name}/{blob.generation}",
+        "metageneration": 1,
+        "name": blob.name,
+        "size": blob.size,
+        "storageClass": "STANDARD",
+        "contentType": "image/png",
+    }
+    return CloudEvent(attributes, data)
+
+
+def build_scenario(world, entry_point, variant):
+    """
+    Prepare the backends for a scenario and return `(setup, call)`: `setup()` runs untimed before every
+    iteration, `call()` runs the entry point once and returns `(status, items processed)`.
+    """
+    import main
+    import landsat_cron
+    import http_cache
+    import monitoring_queries
+
+    args = world.args
+    function = getattr(main, entry_point)
+
+    if entry_point == "landsat_cron":
+        landsat_cron.earth_engine_client = world.earth_engine
+        world.upload_config()
+
+        def setup():
+            world.clear("landsat_images/")
+            for collection in ("landsat_metadata", "landsat_watermarks", "landsat_metadata_changed"):
+                world.clear_collection(collection)
+
+        def call():
+            response = http_call(function, {"collection": "LANDSAT/LC09/C02/T2_TOA"})
+            return response.status_code, args.images
+
+        return setup, call
+
+    if entry_point == "get_scaled_images":
+        world.populate_images()
+        body = {"delivery": "path", "save_to_storage": True}
+        headers = {}
+
+        def setup():
+            if variant == "scale":
+                world.clear("scaled_images/")
+
+        def call():
+            response = http_call(function, body, headers=headers)
+            return response.status_code, args.images
+
+        # The `stored` variant measures reading renditions that already exist, `not_modified` revalidating
+        # them with the ETag of a previous response
+        if variant in ("stored", "not_modified"):
+            call()
+        if variant == "not_modified":
+            headers["If-None-Match"] = http_call(function, body).headers["ETag"]
+        return setup, call
+
+    if entry_point == "scale_uploaded_image":
+        world.populate_images()
+        blobs = list(world.bucket.list_blobs(prefix="landsat_images/"))
+        position = {"index": 0}
+
+        def setup():
+            world.clear("scaled_images/")
+
+        def call():
+            blob = blobs[position["index"] % len(blobs)]
+            position["index"] += 1
+            function(storage_event(blob, "google.cloud.storage.object.v1.finalized"))
+            return 200, 1
+
+        return setup, call
+
+    if entry_point in ("get_total_image_size", "reconcile_storage_usage", "count_uploaded_object",
+                       "count_deleted_object"):
+        world.populate_images()
+        blobs = list(world.bucket.list_blobs(prefix="landsat_images/"))
+        # Build the usage aggregates the way the daily reconciliation does
+        http_call(main.reconcile_storage_usage, headers={"X-CloudScheduler-JobName": "benchmark"})
+
+        if entry_point == "get_total_image_size":
+            query = {"folder": "landsat_images/", "fresh": "true" if variant == "fresh" else "false"}
+
+            def call():
+                response = http_call(function, query_string=query)
+                return response.status_code, args.images if variant == "fresh" else 1
+
+        elif entry_point == "reconcile_storage_usage":
+            def call():
+                response = http_call(function, headers={"X-CloudScheduler-JobName": "benchmark"})
+                return response.status_code, args.images
+
+        else:
+            event_type = ("google.cloud.storage.object.v1.finalized" if entry_point == "count_uploaded_object"
+                          else "google.cloud.storage.object.v1.deleted")
+            position = {"index": 0}
+
+            def call():
+                blob = blobs[position["index"] % len(blobs)]
+                position["index"] += 1
+                function(storage_event(blob, event_type))
+                return 200, 1
+
+        return (lambda: None), call
+
+    if entry_point == "get_network_traffic":
+        end_date = datetime.date.today()
+        body = {"start_date": (end_date - datetime.timedelta(days=365)).isoformat(),
+                "end_date": end_date.isoformat(), "granularity": "day"}
+
+        def setup():
+            if variant == "cold":
+                world.clear_collection("network_traffic_rollups")
+                http_cache._response_cache = http_cache.LRUCache(http_cache.RESPONSE_CACHE_MAX_BYTES)
+
+        def call():
+            response = http_call(function, body)
+            return response.status_code, 366
+
+        # The `rollups` variant measures a year of already rolled up days
+        if variant == "rollups":
+            call()
+        return setup, call
+
+    if entry_point == "get_firebase_stats":
+        world.populate_images()
+        http_call(main.reconcile_storage_usage, headers={"X-CloudScheduler-JobName": "benchmark"})
+
+        def setup():
+            if variant == "cold":
+                monitoring_queries._metrics_cache = monitoring_queries.TTLCache(monitoring_queries.METRICS_CACHE_TTL)
+                http_cache._response_cache = http_cache.LRUCache(http_cache.RESPONSE_CACHE_MAX_BYTES)
+
+        def call():
+            response = http_call(function, {})
+            return response.status_code, 1
+
+        # Warm up the lazy imports; the `cold` variant then empties the metrics cache before every call
+        call()
+        return setup, call
+
+    if entry_point == "search_scenes":
+        # Catalog the scenes the way the ingestion does, over a year so the date filter keeps about half
+        scenes = world.earth_engine.list_scenes("LANDSAT/LC09/C02/T2_TOA", "2023-01-01", "2024-01-01", None)
+        batch = world.firestore.batch()
+        for scene in scenes:
+            metadata = landsat_cron.build_metadata(scene, [6.746, 46.529], 10000)
+            batch.set(world.firestore.collection("landsat_metadata").document(metadata["id"]), metadata)
+        batch.commit()
+        body = {"start_date": "2023-01-01", "end_date": "2023-06-30", "max_cloud_cover": 60,
+                "near": [6.746, 46.529], "page_size": 50}
+
+        def call():
+            response = http_call(function, body)
+            return response.status_code, json.loads(response.get_data())["count"]
+
+        return (lambda: None), call
+
+    if entry_point == "backfill_scene_catalog":
+        # Scenes stored before the catalog fields existed: only the flattened properties
+        scenes = world.earth_engine.list_scenes("LANDSAT/LC09/C02/T2_TOA", "2023-01-01", "2024-01-01", None)
+        documents = {}
+        for scene in scenes:
+            metadata = landsat_cron.build_metadata(scene, [6.746, 46.529], 10000)
+            documents[metadata["id"]] = {field: value for field, value in metadata.items()
+                                         if field not in landsat_cron.CATALOG_FIELDS}
+
+        def setup():
+            world.clear_collection("landsat_metadata")
+            batch = world.firestore.batch()
+            for document_id, data in documents.items():
+                batch.set(world.firestore.collection("landsat_metadata").document(document_id), data)
+            batch.commit()
+
+        def call():
+            response = http_call(function, {"page_size": landsat_cron.MAX_BACKFILL_PAGE_SIZE})
+            return response.status_code, json.loads(response.get_data())["updated"]
+
+        return setup, call
+
+    raise ValueError(f"No scenario for {entry_point}")
+
+
+def run_scenario(args):
+    """Run one scenario in this process and print its result as a JSON line."""
+    os.environ.update({"BUCKET_NAME": BUCKET_NAME, "PROJECT_ID": PROJECT_ID, "CONFIG_PATH": CONFIG_PATH})
+    os.environ.setdefault("SCALING_MAX_WORKERS", "16")
+    # The `get_scaled_images:scale` scenario measures the inline backfill of missing renditions
+    os.environ.setdefault("SCALE_MISSING_RENDITIONS", "true")
+    sys.path[:0] = [FUNCTIONS_DIR, BENCHMARKS_DIR]
+
+    world = World(args)
+    entry_point, variant = args.scenario.split(":")
+    setup, call = build_scenario(world, entry_point, variant)
+
+    latencies = []
+    statuses = {}
+    items = 0
+    peak_reset = reset_peak_rss()
+    for _ in range(args.iterations):
+        setup()
+        started = time.perf_counter()
+        status, processed = call()
+        latencies.append(time.perf_counter() - started)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        items += processed
+
+    total = sum(latencies)
+    latencies.sort()
+    print(json.dumps({
+        "scenario": args.scenario,
+        "iterations": args.iterations,
+        "statuses": statuses,
+        "latency_ms": {f"p{p}": round(percentile(latencies, p) * 1000, 2) for p in (50, 90, 99)},
+        "mean_ms": round(total / len(latencies) * 1000, 2),
+        "calls_per_second": round(len(latencies) / total, 2) if total else None,
+        "items_per_second": round(items / total, 2) if total else None,
+        "peak_rss_mib": round(peak_rss_mib(), 1),
+        "peak_rss_scope": "scenario" if peak_reset else "process",
+    }))
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def check_coverage():
+    """Fail when an entry point of `main.__all__` has no scenario, so new functions get benchmarked."""
+    probe = "import json, main; print(json.dumps(main.__all__))"
+    env = dict(os.environ, BUCKET_NAME=BUCKET_NAME, PROJECT_ID=PROJECT_ID)
+    result = subprocess.run([sys.executable, "-c", probe], cwd=FUNCTIONS_DIR, env=env, capture_output=True,
+                            text=True)
+    if result.returncode != 0:
+        sys.exit(f"import main failed:\n{result.stderr}")
+    missing = set(json.loads(result.stdout.strip().splitlines()[-1])) - {entry for entry, _ in SCENARIOS}
+    if missing:
+        sys.exit(f"No benchmark scenario for: {', '.join(sorted(missing))}")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    before_results = {result["scenario"]: result for result in before["results"]}
+
+    print(f"{before.get('revision')} -> {after.get('revision')}")
+    print(f"{'scenario':<36} {'p50 ms':>18} {'items/s':>20} {'peak MiB':>16}")
+    for result in after["results"]:
+        old = before_results.get(result["scenario"])
+        if old is None or "error" in result or "error" in old:
+            continue
+        p50 = f"{old['latency_ms']['p50']:.1f}->{result['latency_ms']['p50']:.1f}"
+        throughput = f"{old['items_per_second']}->{result['items_per_second']}"
+        rss = f"{old['peak_rss_mib']}->{result['peak_rss_mib']}"
+        print(f"{result['scenario']:<36} {p50:>18} {throughput:>20} {rss:>16}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=100, help="Source images / scenes (10 to 10000)")
+    parser.add_argument("--image-size", type=int, default=512, help="Edge length of the synthetic PNGs")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated round-trip latency of the fakes")
+    parser.add_argument("--backend", choices=("fake", "emulator"), default="fake")
+    parser.add_argument("--only", nargs="*", help="Entry points (or entry:variant) to run")
+    parser.add_argument("--output", help="JSON results file (default: results/<date>_<revision>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two results files")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+    if args.scenario:
+        return run_scenario(args)
+    if args.backend == "emulator" and not (os.getenv("FIRESTORE_EMULATOR_HOST")
+                                           and os.getenv("STORAGE_EMULATOR_HOST")):
+        sys.exit("Set FIRESTORE_EMULATOR_HOST and STORAGE_EMULATOR_HOST to the emulators of firebase.json.")
+
+    check_coverage()
+    scenarios = [f"{entry}:{variant}" for entry, variant in SCENARIOS
+                 if not args.only or entry in args.only or f"{entry}:{variant}" in args.only]
+
+    results = []
+    print(f"{'scenario':<36} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'calls/s':>9} {'items/s':>10} {'peak MiB':>9}")
+    for scenario in scenarios:
+        command = [sys.executable, os.path.abspath(__file__), "--scenario", scenario, "--images", str(args.images),
+                   "--image-size", str(args.image_size), "--iterations", str(args.iterations),
+                   "--latency", str(args.latency), "--backend", args.backend]
+        process = subprocess.run(command, capture_output=True, text=True)
+        lines = [line for line in process.stdout.splitlines() if line.startswith('{"scenario"')]
+        if process.returncode != 0 or not lines:
+            results.append({"scenario": scenario, "error": process.stderr.strip().splitlines()[-1:]})
+            print(f"{scenario:<36} failed: {process.stderr.strip().splitlines()[-1:]}")
+            continue
+
+        result = json.loads(lines[-1])
+        results.append(result)
+        latency = result["latency_ms"]
+        print(f"{scenario:<36} {latency['p50']:>9.1f} {latency['p90']:>9.1f} {latency['p99']:>9.1f} "
+              f"{result['calls_per_second']:>9} {result['items_per_second']:>10} {result['peak_rss_mib']:>9}")
+
+    revision = git_revision()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d-%H%M%S}_{revision or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump({
+            "revision": revision,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "settings": {"images": args.images, "image_size": args.image_size, "iterations": args.iterations,
+                         "latency": args.latency, "backend": args.backend},
+            "results": results,
+        }, results_file, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import time
+import random
+from datetime import datetime, timedelta
+
+
+class FakeEarthEngineClient:
+    """
+    Local stand-in for `earth_engine.EarthEngineClient` serving synthetic Landsat-like scenes.
+
+    Thumbnail URLs point at `thumbnail_base_url` (e.g. a local HTTP server) and every call counts as
+    one Earth Engine round trip in `round_trips`. A scene only depends on `seed` and its index and
+    acquisition time, so repeated listings return the same scenes.
+    """
+
+    def __init__(self, scene_count=10, thumbnail_base_url="http://localhost:8000/thumbnails", latency=0.0, seed=0):
+        self.scene_count = scene_count
+        self.thumbnail_base_url = thumbnail_base_url
+        self.latency = latency
+        self.seed = seed
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_region(self, coordinates, radius):
+        return {"type": "Polygon", "center": coordinates, "radius": radius}
+
+    def make_scene(self, index, acquired_at):
+        rng = random.Random(f"{self.seed}-{index}")
+        path, row = rng.randint(1, 233), rng.randint(1, 248)
+        scene_id = f"LC09_{path:03d}{row:03d}_{acquired_at:%Y%m%d}_{index:05d}"
+        return {
+            "type": "Image",
+            "id": f"LANDSAT/LC09/C02/T2_TOA/{scene_id}",
+            "properties": {
+                "system:time_start": int(acquired_at.timestamp() * 1000),
+                "system:index": scene_id,
+                "CLOUD_COVER": round(rng.uniform(0, 100), 2),
+                "WRS_PATH": path,
+                "WRS_ROW": row,
+                "SPACECRAFT_ID": "LANDSAT_9",
+                "system:footprint": {
+                    "type": "LinearRing",
+                    "coordinates": [[6.0, 46.0], [7.5, 46.0], [7.5, 47.0], [6.0, 47.0], [6.0, 46.0]],
+                },
+            },
+        }
+
+    def list_scenes(self, collection_name, start_date, end_date, region):
+        self._round_trip()
+        start = datetime.fromisoformat(start_date)
+        span = (datetime.fromisoformat(end_date) - start) / max(1, self.scene_count)
+        return [self.make_scene(i, start + span * i + timedelta(hours=10)) for i in range(self.scene_count)]
+
+    def get_thumb_url(self, scene_id, region):
+        self._round_trip()
+        return f"{self.thumbnail_base_url}/{scene_id.split('/')[-1]}.png"
+
+
+class FakeImageCollection:
+    """Chainable stand-in for an `ee.ImageCollection` of scene infos; nothing is evaluated before `getInfo()`."""
+
+    # Earth Engine aborts collection queries accumulating more elements
+    MAX_ELEMENTS = 5000
+
+    def __init__(self, module, scenes):
+        self.module = module
+        self.scenes = scenes
+
+    def filterDate(self, start_date, end_date):
+        start = datetime.fromisoformat(start_date).timestamp() * 1000
+        end = datetime.fromisoformat(end_date).timestamp() * 1000
+        return FakeImageCollection(self.module, [
+            scene for scene in self.scenes if start <= scene["properties"]["system:time_start"] < end
+        ])
+
+    def filterBounds(self, region):
+        return self
+
+    def select(self, bands):
+        return self
+
+    def sort(self, prop):
+        return FakeImageCollection(self.module, sorted(self.scenes, key=lambda scene: scene["properties"][prop]))
+
+    def toList(self, count, offset=0):
+        return FakeComputedList(self.module, self.scenes[offset:offset + count])
+
+    def getInfo(self):
+        self.module.round_trips += 1
+        if len(self.scenes) > self.MAX_ELEMENTS:
+            raise RuntimeError(f"Collection query aborted after accumulating over {self.MAX_ELEMENTS} elements.")
+        return {"type": "ImageCollection", "features": list(self.scenes)}
+
+
+class FakeComputedList:
+    """Result of `FakeImageCollection.toList`, evaluated by `getInfo()` in one round trip."""
+
+    def __init__(self, module, scenes):
+        self.module = module
+        self.scenes = scenes
+
+    def getInfo(self):
+        self.module.round_trips += 1
+        limit = FakeImageCollection.MAX_ELEMENTS
+        if len(self.scenes) > limit:
+            raise RuntimeError(f"List query aborted after accumulating over {limit} elements.")
+        return list(self.scenes)
+
+
+class FakeEarthEngineModule:
+    """
+    Local stand-in for the `ee` module behind `earth_engine.EarthEngineClient.list_scenes`: every
+    `ImageCollection` holds the scenes of a `FakeEarthEngineClient` over `start_date` to `end_date`.
+    """
+
+    def __init__(self, scene_count, start_date, end_date, seed=0):
+        client = FakeEarthEngineClient(scene_count=scene_count, seed=seed)
+        start = datetime.fromisoformat(start_date)
+        step = (datetime.fromisoformat(end_date) - start) / max(1, scene_count)
+        # Stored newest first, so listings have to sort to come back in acquisition order
+        self.scenes = [client.make_scene(i, start + step * i) for i in reversed(range(scene_count))]
+        self.round_trips = 0
+
+    def ImageCollection(self, collection_name):
+        return FakeImageCollection(self, self.scenes)
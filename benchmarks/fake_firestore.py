@@ -0,0 +1,302 @@
+import time
+import asyncio
+import uuid
+import threading
+from datetime import datetime, timezone
+from google.api_core import exceptions
+from google.cloud.firestore_v1.transforms import Increment, Sentinel
+
+
+def _get_field(data, field_path):
+    for part in field_path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+
+def _apply_transforms(current, data):
+    """Resolve `Increment` and `SERVER_TIMESTAMP` values against the current document data."""
+    resolved = {}
+    for key, value in data.items():
+        if isinstance(value, Increment):
+            resolved[key] = (current.get(key) or 0) + value.value
+        elif isinstance(value, Sentinel):
+            resolved[key] = datetime.now(timezone.utc)
+        elif isinstance(value, dict):
+            resolved[key] = _apply_transforms(current.get(key) or {}, value)
+        else:
+            resolved[key] = value
+    return resolved
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data, field_paths=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        if data is not None and field_paths is not None:
+            data = {path: _get_field(data, path) for path in field_paths}
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return _get_field(self._data, field_path)
+
+
+class FakeDocumentReference:
+    def __init__(self, client, collection_name, document_id):
+        self.client = client
+        self.collection_name = collection_name
+        self.id = document_id
+
+    @property
+    def path(self):
+        return f"{self.collection_name}/{self.id}"
+
+    def get(self, field_paths=None):
+        self.client.round_trip("reads")
+        return FakeSnapshot(self, self.client.documents.get(self.path), field_paths)
+
+    def set(self, data, merge=False):
+        self.client.round_trip("writes")
+        self.client.write(self.path, data, merge)
+
+    def create(self, data):
+        self.client.round_trip("writes")
+        with self.client.lock:
+            if self.path in self.client.documents:
+                raise exceptions.AlreadyExists(f"Document already exists: {self.path}")
+            self.client.documents[self.path] = _apply_transforms({}, data)
+
+    def update(self, data):
+        self.client.round_trip("writes")
+        if self.path not in self.client.documents:
+            raise exceptions.NotFound(f"No document to update: {self.path}")
+        self.client.write(self.path, data, merge=True)
+
+    def delete(self):
+        self.client.round_trip("writes")
+        with self.client.lock:
+            self.client.documents.pop(self.path, None)
+
+
+class FakeQuery:
+    """Subset of `google.cloud.firestore.Query`: equality/range filters, ordering, cursors, limit, projection."""
+
+    OPERATORS = {
+        "==": lambda a, b: a == b,
+        "!=": lambda a, b: a != b,
+        "<": lambda a, b: a is not None and a < b,
+        "<=": lambda a, b: a is not None and a <= b,
+        ">": lambda a, b: a is not None and a > b,
+        ">=": lambda a, b: a is not None and a >= b,
+        "in": lambda a, b: a in b,
+        "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    }
+
+    def __init__(self, collection, filters=(), orders=(), limit_count=None, start_after_values=None, fields=None):
+        self.collection = collection
+        self.filters = list(filters)
+        self.orders = list(orders)
+        self.limit_count = limit_count
+        self.start_after_values = start_after_values
+        self.fields = fields
+
+    def _copy(self, **changes):
+        state = {"filters": self.filters, "orders": self.orders, "limit_count": self.limit_count,
+                 "start_after_values": self.start_after_values, "fields": self.fields}
+        state.update(changes)
+        return FakeQuery(self.collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self.filters + [(field_path, op_string, value)])
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(orders=self.orders + [(field_path, direction)])
+
+    def limit(self, count):
+        return self._copy(limit_count=count)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def start_after(self, document_fields_or_snapshot):
+        if isinstance(document_fields_or_snapshot, FakeSnapshot):
+            snapshot = document_fields_or_snapshot
+            values = [snapshot.id if path == "__name__" else snapshot.get(path) for path, _ in self.orders]
+        elif isinstance(document_fields_or_snapshot, dict):
+            values = [document_fields_or_snapshot.get(path) for path, _ in self.orders]
+        else:
+            values = list(document_fields_or_snapshot)
+        return self._copy(start_after_values=values)
+
+    def _sort_key(self, item):
+        document_id, data = item
+        return [document_id if path == "__name__" else _get_field(data, path) for path, _ in self.orders]
+
+    def stream(self):
+        client = self.collection.client
+        client.round_trip("reads")
+        prefix = f"{self.collection.name}/"
+        with client.lock:
+            items = [(path[len(prefix):], data) for path, data in client.documents.items()
+                     if path.startswith(prefix) and "/" not in path[len(prefix):]]
+
+        items = [
+            (document_id, data) for document_id, data in items
+            if all(self.OPERATORS[op](_get_field(data, path), value) for path, op, value in self.filters)
+        ]
+        # Like Firestore, documents missing an ordered field are left out
+        items = [item for item in items if all(key is not None for key in self._sort_key(item))]
+        for path, direction in reversed(self.orders):
+            items.sort(key=lambda item, path=path: item[0] if path == "__name__" else _get_field(item[1], path),
+                       reverse=direction == "DESCENDING")
+        if not self.orders:
+            items.sort(key=lambda item: item[0])
+
+        if self.start_after_values is not None:
+            cursor = self.start_after_values
+
+            def after(item):
+                for (path, direction), key, value in zip(self.orders, self._sort_key(item), cursor):
+                    if key != value:
+                        return key < value if direction == "DESCENDING" else key > value
+                return False
+
+            items = [item for item in items if after(item)]
+
+        if self.limit_count is not None:
+            items = items[:self.limit_count]
+        for document_id, data in items:
+            yield FakeSnapshot(self.collection.document(document_id), data, self.fields)
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        super().__init__(self)
+
+    @property
+    def id(self):
+        return self.name
+
+    def document(self, document_id=None):
+        return FakeDocumentReference(self.client, self.name, document_id or uuid.uuid4().hex)
+
+    def add(self, data):
+        reference = self.document()
+        reference.set(data)
+        return None, reference
+
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self.client = client
+        self.operations = []
+
+    def set(self, reference, data, merge=False):
+        self.operations.append((reference.path, data, merge))
+
+    def commit(self):
+        self.client.round_trip("commits")
+        for path, data, merge in self.operations:
+            self.client.write(path, data, merge)
+        self.client.stats["writes"] += len(self.operations)
+        return []
+
+
+class FakeFirestoreClient:
+    """
+    In-memory stand-in for `google.cloud.firestore.Client` with simulated round-trip latency.
+
+    Covers the document, query, batch and `get_all` calls the functions make; `stats` counts reads,
+    writes and batch commits.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.documents = {}
+        self.lock = threading.Lock()
+        self.stats = {"reads": 0, "writes": 0, "commits": 0}
+
+    def round_trip(self, kind):
+        with self.lock:
+            self.stats[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def write(self, path, data, merge=False):
+        with self.lock:
+            current = self.documents.get(path) or {}
+            resolved = _apply_transforms(current, data)
+            self.documents[path] = {**current, **resolved} if merge else resolved
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def get_all(self, references, field_paths=None):
+        self.round_trip("reads")
+        for reference in references:
+            yield FakeSnapshot(reference, self.documents.get(reference.path), field_paths)
+
+    def clear(self, collection_name=None):
+        """Delete every document (of one collection)."""
+        with self.lock:
+            for path in list(self.documents):
+                if collection_name is None or path.startswith(f"{collection_name}/"):
+                    del self.documents[path]
+
+
+class FakeAsyncDocumentReference:
+    def __init__(self, client, collection_name, document_id):
+        self.client = client
+        self.reference = FakeDocumentReference(client.sync_client, collection_name, document_id)
+        self.id = document_id
+
+    async def get(self, field_paths=None):
+        await self.client.round_trip("reads")
+        return FakeSnapshot(self.reference, self.client.sync_client.documents.get(self.reference.path), field_paths)
+
+    async def set(self, data, merge=False):
+        await self.client.round_trip("writes")
+        self.client.sync_client.write(self.reference.path, data, merge)
+
+
+class FakeAsyncCollectionReference:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def document(self, document_id=None):
+        return FakeAsyncDocumentReference(self.client, self.name, document_id or uuid.uuid4().hex)
+
+
+class FakeAsyncFirestoreClient:
+    """
+    Stand-in for `google.cloud.firestore.AsyncClient` over the documents of a `FakeFirestoreClient`
+    (shared data and `stats`); the latency is awaited instead of slept. Covers document reads and writes.
+    """
+
+    def __init__(self, sync_client):
+        self.sync_client = sync_client
+
+    async def round_trip(self, kind):
+        with self.sync_client.lock:
+            self.sync_client.stats[kind] += 1
+        if self.sync_client.latency:
+            await asyncio.sleep(self.sync_client.latency)
+
+    def collection(self, name):
+        return FakeAsyncCollectionReference(self, name)
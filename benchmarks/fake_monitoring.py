@@ -0,0 +1,106 @@
+import time
+import asyncio
+import bisect
+import random
+import datetime
+from types import SimpleNamespace
+
+
+# Exponential bucket layout used for the synthetic latency distributions
+LATENCY_BUCKETS = SimpleNamespace(num_finite_buckets=66, growth_factor=1.4, scale=1.0)
+
+
+def make_distribution(samples, exponential_buckets=LATENCY_BUCKETS):
+    """Build a Monitoring-like `Distribution` (count, mean, exponential bucket counts) from raw samples."""
+    bounds = [exponential_buckets.scale * exponential_buckets.growth_factor ** index
+              for index in range(exponential_buckets.num_finite_buckets + 1)]
+    bucket_counts = [0] * (len(bounds) + 1)
+    for sample in samples:
+        bucket_counts[bisect.bisect_right(bounds, sample)] += 1
+
+    bucket_options = SimpleNamespace(
+        explicit_buckets=SimpleNamespace(bounds=[]),
+        exponential_buckets=exponential_buckets,
+        linear_buckets=SimpleNamespace(num_finite_buckets=0),
+    )
+    return SimpleNamespace(count=len(samples), mean=sum(samples) / len(samples) if samples else 0.0,
+                           bucket_options=bucket_options, bucket_counts=bucket_counts)
+
+
+class FakeMetricServiceClient:
+    """
+    Local stand-in for `monitoring_v3.MetricServiceClient`.
+
+    `list_time_series` returns `series_count` synthetic series with one point per alignment period when the
+    request carries an aggregation (a cross-series reducer folds them into one series), and `raw_points`
+    points per series otherwise. Every call is recorded in `requests` and sleeps for `latency` seconds.
+    """
+
+    def __init__(self, series_count=4, raw_points=1440, latency=0.0, seed=0):
+        self.series_count = series_count
+        self.raw_points = raw_points
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.requests = []
+
+    def _point(self, metric_type, end_time):
+        interval = SimpleNamespace(end_time=end_time)
+        if "latencies" in metric_type:
+            distribution = make_distribution([self.rng.lognormvariate(3, 0.8) for _ in range(self.rng.randint(1, 100))])
+            return SimpleNamespace(interval=interval,
+                                   value=SimpleNamespace(distribution_value=distribution, int64_value=0))
+        return SimpleNamespace(interval=interval, value=SimpleNamespace(int64_value=self.rng.randint(0, 1000)))
+
+    def list_time_series(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._series(request)
+
+    def _series(self, request):
+        self.requests.append(request)
+        metric_type = request["filter"].split('"')[1]
+        interval = request["interval"]
+        start_seconds, end_seconds = interval["start_time"]["seconds"], interval["end_time"]["seconds"]
+        aggregation = request.get("aggregation")
+        if aggregation is None:
+            series_count, point_count = self.series_count, self.raw_points
+        else:
+            # proto-plus exposes the alignment period Duration as a `timedelta`
+            point_count = max(1, (end_seconds - start_seconds) // int(aggregation.alignment_period.total_seconds()))
+            series_count = 1 if aggregation.cross_series_reducer else self.series_count
+
+        # Points are newest first and stamped with the end of their period, like Monitoring does
+        step = (end_seconds - start_seconds) / point_count
+        end_times = [
+            datetime.datetime.fromtimestamp(end_seconds - index * step, tz=datetime.timezone.utc)
+            for index in range(point_count)
+        ]
+        return [
+            SimpleNamespace(points=[self._point(metric_type, end_time) for end_time in end_times])
+            for _ in range(series_count)
+        ]
+
+
+class FakeAsyncPager:
+    """Async iterator over the series of a response, like `ListTimeSeriesAsyncPager`."""
+
+    def __init__(self, series):
+        self._series = iter(series)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._series)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+class FakeMetricServiceAsyncClient(FakeMetricServiceClient):
+    """Local stand-in for `monitoring_v3.MetricServiceAsyncClient`; the latency is awaited instead of slept."""
+
+    async def list_time_series(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return FakeAsyncPager(self._series(request))
@@ -0,0 +1,182 @@
+import io
+import hmac
+import time
+import hashlib
+import datetime
+import itertools
+import threading
+from urllib.parse import quote, unquote, urlsplit, parse_qs
+
+
+class FakeBlob:
+    """In-memory stand-in for `google.cloud.storage.Blob` with simulated network latency."""
+
+    def __init__(self, bucket, name, data=None):
+        self.bucket = bucket
+        self.name = name
+        self.data = data
+        self.content_type = None
+        self.generation = None
+        self.metadata = None
+
+    @property
+    def size(self):
+        return len(self.data) if self.data is not None else None
+
+    def delete(self):
+        self.bucket.simulate_latency()
+        self.bucket.remove(self.name)
+
+    def exists(self):
+        self.bucket.simulate_latency()
+        return self.name in self.bucket.objects
+
+    def download_as_bytes(self, timeout=None, retry=None):
+        self.bucket.simulate_latency()
+        return self.bucket.objects[self.name].data
+
+    def open(self, mode="rb", chunk_size=None, timeout=None, retry=None):
+        self.bucket.simulate_latency()
+        return io.BytesIO(self.bucket.objects[self.name].data)
+
+    def download_as_text(self, if_generation_match=None, timeout=None, retry=None):
+        return self.download_as_bytes().decode("utf-8")
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None, timeout=None, retry=None):
+        self.bucket.simulate_latency()
+        # Like the real client, text is stored UTF-8 encoded
+        self.data = data.encode("utf-8") if isinstance(data, str) else data
+        self.content_type = content_type
+        self.generation = next(self.bucket.generations)
+        self.bucket.store(self)
+
+    def upload_from_file(self, file_obj, content_type=None):
+        self.upload_from_string(file_obj.read(), content_type=content_type)
+
+
+class FakeBucket:
+    """In-memory stand-in for `google.cloud.storage.Bucket`."""
+
+    def __init__(self, name="fake-bucket", latency=0.0):
+        self.name = name
+        self.latency = latency
+        self.objects = {}
+        self.generations = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def simulate_latency(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def store(self, blob):
+        with self._lock:
+            self.objects[blob.name] = blob
+
+    def remove(self, name):
+        with self._lock:
+            self.objects.pop(name, None)
+
+    def clear(self, prefix=""):
+        """Delete every object under `prefix` without simulated latency."""
+        with self._lock:
+            for name in [name for name in self.objects if name.startswith(prefix)]:
+                del self.objects[name]
+
+    def blob(self, name, generation=None):
+        # Like the real client, no properties (size, metadata) are loaded until the blob is fetched
+        blob = FakeBlob(self, name)
+        blob.generation = generation
+        return blob
+
+    def get_blob(self, name):
+        self.simulate_latency()
+        return self.objects.get(name)
+
+    def list_blobs(self, prefix="", start_offset=None, end_offset=None, page_size=None, page_token=None,
+                   fields=None, max_results=None):
+        with self._lock:
+            names = sorted(
+                name for name in self.objects
+                if name.startswith(prefix)
+                and (start_offset is None or name >= start_offset)
+                and (end_offset is None or name < end_offset)
+            )
+        if max_results is not None:
+            names = names[:max_results]
+        return FakeBlobIterator(self, names, page_size or 1000, int(page_token or 0))
+
+
+class FakeBlobIterator:
+    """Paged listing like `google.api_core.page_iterator.HTTPIterator`; each page costs one simulated round trip."""
+
+    def __init__(self, bucket, names, page_size, offset):
+        self.bucket = bucket
+        self.names = names
+        self.page_size = page_size
+        self.offset = offset
+        self.next_page_token = None
+
+    @property
+    def pages(self):
+        while self.offset < len(self.names) or (self.offset == 0 and not self.names):
+            self.bucket.simulate_latency()
+            page_names = self.names[self.offset:self.offset + self.page_size]
+            self.offset += self.page_size
+            self.next_page_token = str(self.offset) if self.offset < len(self.names) else None
+            yield [self.bucket.objects[name] for name in page_names if name in self.bucket.objects]
+            if not page_names:
+                return
+
+    def __iter__(self):
+        for page in self.pages:
+            yield from page
+
+
+class FakeStorageClient:
+    """In-memory stand-in for `google.cloud.storage.Client` serving `FakeBucket`s."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.buckets = {}
+
+    def bucket(self, name):
+        if name not in self.buckets:
+            self.buckets[name] = FakeBucket(name, latency=self.latency)
+        return self.buckets[name]
+
+
+class FakeUrlSigner:
+    """
+    Local stand-in for `signed_urls.UrlSigner`: URLs are signed with an HMAC of a fixed key instead of
+    service account credentials, so they are deterministic for a given `clock` and can be checked with
+    `verify`.
+    """
+
+    def __init__(self, base_url="https://storage.fake", key=b"fake-signing-key", clock=None):
+        self.base_url = base_url
+        self.key = key
+        self.clock = clock or (lambda: datetime.datetime.now(datetime.timezone.utc))
+
+    def _signature(self, path, generation, expires):
+        message = f"GET\n{path}\n{generation}\n{expires}".encode("utf-8")
+        return hmac.new(self.key, message, hashlib.sha256).hexdigest()
+
+    def sign(self, blob, expiration):
+        path = f"/{blob.bucket.name}/{quote(blob.name, safe='/')}"
+        expires = int((self.clock() + expiration).timestamp())
+        signature = self._signature(path, blob.generation, expires)
+        return f"{self.base_url}{path}?generation={blob.generation}&expires={expires}&signature={signature}"
+
+    def verify(self, url):
+        """Return `(bucket_name, blob_name, generation)` of a URL from `sign`, or None if forged or expired."""
+        parts = urlsplit(url)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        generation = int(query["generation"]) if query.get("generation", "None") != "None" else None
+        expires = int(query.get("expires", 0))
+        expected = self._signature(parts.path, generation, expires)
+        if not hmac.compare_digest(expected, query.get("signature", "")):
+            return None
+        if self.clock().timestamp() >= expires:
+            return None
+        bucket_name, blob_name = parts.path.lstrip("/").split("/", 1)
+        return bucket_name, unquote(blob_name), generation
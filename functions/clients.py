@@ -0,0 +1,86 @@
+import threading
+from config import BUCKET_NAME
+
+# Clients are created on first use and shared by every module of the instance. The Google client
+# libraries are imported inside the factories so that endpoints only pay for what they use.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _get_or_create(name, factory):
+    """Return the client registered under `name`, creating it with `factory` on first use."""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def override_client(name, client):
+    """Register a client instance (e.g. a local fake) under `name` instead of creating the real one."""
+    with _clients_lock:
+        _clients[name] = client
+
+
+def get_firestore_client():
+    """Return the shared Firestore client."""
+    def create():
+        from google.cloud import firestore
+        return firestore.Client()
+    return _get_or_create("firestore", create)
+
+
+def get_storage_client():
+    """Return the shared Cloud Storage client."""
+    def create():
+        from google.cloud import storage
+        return storage.Client()
+    return _get_or_create("storage", create)
+
+
+def get_bucket():
+    """Return the configured `BUCKET_NAME` bucket."""
+    return _get_or_create("bucket", lambda: get_storage_client().bucket(BUCKET_NAME))
+
+
+def get_monitoring_client():
+    """Return the shared Cloud Monitoring client."""
+    def create():
+        from google.cloud import monitoring_v3
+        return monitoring_v3.MetricServiceClient()
+    return _get_or_create("monitoring", create)
+
+
+def get_async_firestore_client():
+    """Return the shared asyncio Firestore client; only use it on the shared event loop (`event_loop`)."""
+    def create():
+        from google.cloud import firestore
+        return firestore.AsyncClient()
+    return _get_or_create("async_firestore", create)
+
+
+def get_async_monitoring_client():
+    """Return the shared asyncio Cloud Monitoring client; only use it on the shared event loop (`event_loop`)."""
+    def create():
+        from google.cloud import monitoring_v3
+        return monitoring_v3.MetricServiceAsyncClient()
+    return _get_or_create("async_monitoring", create)
+
+
+def get_earth_engine():
+    """Return the `ee` module, initializing Earth Engine on first use."""
+    def create():
+        import ee
+        ee.Initialize()
+        return ee
+    return _get_or_create("earth_engine", create)
+
+
+def get_url_signer():
+    """Return the shared signer of download URLs (`signed_urls.UrlSigner`)."""
+    def create():
+        from signed_urls import UrlSigner
+        return UrlSigner()
+    return _get_or_create("url_signer", create)
@@ -0,0 +1,100 @@
+import numpy as np
+
+# Percentiles reported for distribution metrics such as request latencies
+PERCENTILES = (50, 90, 99)
+
+
+def bucket_bounds(bucket_options):
+    """
+    Return the finite bucket boundaries of a Monitoring `Distribution.BucketOptions` as an array.
+
+    A distribution with `n` boundaries has `n + 1` buckets: an underflow bucket below the first
+    boundary, the finite buckets, and an overflow bucket above the last boundary.
+    """
+    if len(bucket_options.explicit_buckets.bounds):
+        return np.asarray(bucket_options.explicit_buckets.bounds, dtype=float)
+
+    exponential = bucket_options.exponential_buckets
+    if exponential.num_finite_buckets:
+        return exponential.scale * exponential.growth_factor ** np.arange(exponential.num_finite_buckets + 1)
+
+    linear = bucket_options.linear_buckets
+    if linear.num_finite_buckets:
+        return linear.offset + linear.width * np.arange(linear.num_finite_buckets + 1)
+
+    return np.empty(0)
+
+
+def merge_distributions(distributions):
+    """
+    Merge Monitoring `Distribution` values across series and points.
+
+    Bucket counts of distributions sharing a bucket layout are summed in one vectorized operation per
+    layout. Returns `{"count", "mean", "layouts"}` where `layouts` maps each boundary tuple to its
+    summed bucket counts; the count-weighted mean is computed from the per-distribution means.
+    """
+    grouped = {}
+    count = 0
+    weighted_sum = 0.0
+    for distribution in distributions:
+        if not distribution.count:
+            continue
+        count += distribution.count
+        weighted_sum += distribution.mean * distribution.count
+
+        bounds = tuple(bucket_bounds(distribution.bucket_options))
+        # Trailing empty buckets may be omitted from `bucket_counts`
+        counts = np.zeros(len(bounds) + 1, dtype=np.int64)
+        bucket_counts = np.asarray(distribution.bucket_counts, dtype=np.int64)[:len(counts)]
+        counts[:len(bucket_counts)] = bucket_counts
+        grouped.setdefault(bounds, []).append(counts)
+
+    layouts = {bounds: np.sum(counts, axis=0) for bounds, counts in grouped.items()}
+    return {"count": count, "mean": weighted_sum / count if count else 0.0, "layouts": layouts}
+
+
+def _cumulative(bounds, counts):
+    """
+    Return the `(edges, cumulative counts)` of a bucket layout, treating values as spread uniformly inside
+    each finite bucket. The underflow bucket starts at 0 (or at the first boundary when it's negative).
+    The overflow bucket has no upper bound and is left out, so percentiles falling in it are clamped
+    to the last boundary.
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    lower = min(0.0, bounds[0])
+    edges = np.concatenate(([lower], bounds))
+    cumulative = np.concatenate(([0], np.cumsum(counts[:-1])))
+    if lower == bounds[0]:
+        # No room below the first boundary: the underflow count sits at the first edge
+        edges, cumulative = edges[1:], cumulative[1:]
+    return edges, cumulative
+
+
+def distribution_percentiles(merged, percentiles=PERCENTILES):
+    """
+    Return `{p: value}` for the requested percentiles of a merged distribution, interpolating linearly
+    inside buckets. Layouts with different boundaries are combined by summing their cumulative counts on
+    the union of all boundaries. Distributions without buckets fall back to the mean.
+    """
+    layouts = {bounds: counts for bounds, counts in merged["layouts"].items() if bounds}
+    total = sum(int(counts.sum()) for counts in layouts.values())
+    if not total:
+        return {p: merged["mean"] for p in percentiles}
+
+    cumulatives = [_cumulative(bounds, counts) for bounds, counts in layouts.items()]
+    edges = np.unique(np.concatenate([layout_edges for layout_edges, _ in cumulatives]))
+    cdf = np.zeros(len(edges))
+    for layout_edges, cumulative in cumulatives:
+        cdf += np.interp(edges, layout_edges, cumulative, left=0, right=cumulative[-1])
+
+    targets = np.asarray(percentiles, dtype=float) / 100 * total
+    # First edge whose cumulative count reaches each target, then interpolate inside the preceding bucket
+    upper = np.clip(np.searchsorted(cdf, targets, side="left"), 1, len(edges) - 1) if len(edges) > 1 else None
+    if upper is None:
+        return {p: float(edges[0]) for p in percentiles}
+
+    lower = upper - 1
+    span = cdf[upper] - cdf[lower]
+    fraction = np.divide(targets - cdf[lower], span, out=np.ones_like(targets), where=span > 0)
+    values = edges[lower] + np.clip(fraction, 0, 1) * (edges[upper] - edges[lower])
+    return {p: float(value) for p, value in zip(percentiles, values)}
@@ -0,0 +1,47 @@
+import os
+from clients import get_earth_engine
+
+# Scenes fetched per `getInfo()` round trip; Earth Engine aborts collection queries above 5000 elements
+LIST_PAGE_SIZE = int(os.getenv("EE_LIST_PAGE_SIZE", "1000"))
+
+BANDS = ["B4", "B3", "B2"]
+VIS_PARAMS = {"min": 0.0, "max": 0.4, "bands": BANDS}
+
+
+class EarthEngineClient:
+    """
+    The Earth Engine calls made by `landsat_cron`, kept behind a small interface so the cron
+    can run against a local stand-in. Earth Engine is only initialized on first use.
+    """
+
+    def get_region(self, coordinates, radius):
+        """Return the bounding box of a circle of `radius` meters around `coordinates`."""
+        ee = get_earth_engine()
+        return ee.Geometry.Point(coordinates).buffer(radius).bounds()
+
+    def list_scenes(self, collection_name, start_date, end_date, region):
+        """
+        Return the info (`id`, `properties`, ...) of every scene of the collection in the date range
+        intersecting the region, oldest first, in pages of `LIST_PAGE_SIZE` scenes per `getInfo()` round
+        trip (a single one for most windows).
+        """
+        ee = get_earth_engine()
+        collection = (
+            ee.ImageCollection(collection_name)
+            .filterDate(start_date, end_date)
+            .filterBounds(region)
+            .select(BANDS)
+            .sort("system:time_start")
+        )
+        scenes = []
+        while True:
+            page = collection.toList(LIST_PAGE_SIZE, len(scenes)).getInfo()
+            scenes.extend(page)
+            if len(page) < LIST_PAGE_SIZE:
+                return scenes
+
+    def get_thumb_url(self, scene_id, region):
+        """Return the URL of a PNG thumbnail of the scene over the region."""
+        ee = get_earth_engine()
+        image = ee.Image(scene_id).select(BANDS)
+        return image.getThumbURL({"region": region, "format": "png", **VIS_PARAMS})
@@ -0,0 +1,52 @@
+import os
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Run the I/O-heavy endpoints (`get_firebase_stats`, `landsat_cron`) as coroutines on the shared event loop
+ASYNC_HANDLERS = os.getenv("ASYNC_HANDLERS", "true").lower() == "true"
+
+# Worker threads of the loop for the blocking client libraries (Cloud Storage, Earth Engine) awaited with
+# `asyncio.to_thread`; the asyncio default of `cpu_count + 4` would serialize them on small instances
+EVENT_LOOP_THREADS = int(os.getenv("EVENT_LOOP_THREADS", "32"))
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    """Return the event loop shared by every request of the instance, running on a daemon thread from first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(EVENT_LOOP_THREADS, thread_name_prefix="event-loop-io"))
+            threading.Thread(target=loop.run_forever, name="event-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+async def _in_context(context, coroutine):
+    # Tasks start from the loop thread's context; adopt the caller's so spans record into its trace
+    for variable, value in context.items():
+        variable.set(value)
+    return await coroutine
+
+
+def run(coroutine):
+    """
+    Run `coroutine` on the shared event loop and block the calling (request) thread until it finishes.
+
+    The synchronous `https_fn` entry points call this, so the I/O of concurrent requests is multiplexed
+    on one loop and the async clients (gRPC channels, HTTP connection pools) are shared between them.
+    """
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coroutine.close()
+        raise RuntimeError("run() must not be called from the shared event loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(_in_context(contextvars.copy_context(), coroutine), loop).result()
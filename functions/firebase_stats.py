@@ -1,24 +1,47 @@
-import os
-from google.cloud import monitoring_v3, storage
+import asyncio
 import datetime
 import json
-from dotenv import load_dotenv
+import time
+from concurrent.futures import ThreadPoolExecutor
 from flask_cors import cross_origin
 from firebase_functions import https_fn
-
-# Load environment variables
-load_dotenv()
-
-# Initialize clients
-storage_client = storage.Client()
-
-# Environment variables
-PROJECT_ID = os.getenv("PROJECT_ID")
-BUCKET_NAME = os.getenv("BUCKET_NAME")
+from config import PROJECT_ID, BUCKET_NAME
+from event_loop import ASYNC_HANDLERS, run
+from http_cache import conditional_response, json_response, max_age
+from monitoring_queries import METRICS_CACHE_TTL, get_metric_sum, get_metric_distribution, get_metric_sum_async, \
+    get_metric_distribution_async
+from storage_usage import get_usage, get_usage_async
+from tracing import submit, traced
+
+READ_COUNT_METRIC = "firestore.googleapis.com/document/read_count"
+REQUEST_LATENCIES_METRIC = "firestore.googleapis.com/api/request_latencies"
+REQUEST_COUNT_METRIC = "firestore.googleapis.com/api/request_count"
+
+
+def fetch_metrics(start_date, end_date):
+    """
+    Fetch the Firestore metrics concurrently on a thread pool and return `(reads, latency, request_count)`.
+    The metrics are aggregated server-side by Cloud Monitoring and cached for `METRICS_CACHE_TTL` seconds.
+    """
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        reads_future = submit(executor, get_metric_sum, READ_COUNT_METRIC, start_date, end_date)
+        latency_future = submit(executor, get_metric_distribution, REQUEST_LATENCIES_METRIC, start_date, end_date)
+        count_future = submit(executor, get_metric_sum, REQUEST_COUNT_METRIC, start_date, end_date)
+    return reads_future.result(), latency_future.result(), count_future.result()
+
+
+async def fetch_metrics_async(start_date, end_date):
+    """`fetch_metrics` as one coroutine per query, awaited together on the shared event loop."""
+    return await asyncio.gather(
+        get_metric_sum_async(READ_COUNT_METRIC, start_date, end_date),
+        get_metric_distribution_async(REQUEST_LATENCIES_METRIC, start_date, end_date),
+        get_metric_sum_async(REQUEST_COUNT_METRIC, start_date, end_date),
+    )
 
 
 @https_fn.on_request()
-@cross_origin(origins="*")
+@cross_origin(origins="*", expose_headers=["ETag"])
+@traced("get_firebase_stats")
 def get_firebase_stats(request: https_fn.Request) -> https_fn.Response:
     try:
         if not BUCKET_NAME or not PROJECT_ID:
@@ -38,12 +61,14 @@ def get_firebase_stats(request: https_fn.Request) -> https_fn.Response:
                     mimetype="application/json",
                 )
 
+            fresh = request_json.get("fresh", False)
             start_date_str = request_json.get("start_date")
             end_date_str = request_json.get("end_date")
 
             # If no parameters provided, use the default: today and 30 days prior
             if not start_date_str or not end_date_str:
-                end_date = datetime.datetime.utcnow()
+                # Truncated to the minute so repeated dashboard refreshes hit the metrics cache
+                end_date = datetime.datetime.utcnow().replace(second=0, microsecond=0)
                 start_date = end_date - datetime.timedelta(days=30)
             else:
                 # Convert provided dates to datetime objects
@@ -64,97 +89,53 @@ def get_firebase_stats(request: https_fn.Request) -> https_fn.Response:
                 mimetype="application/json",
             )
 
-        # Fetch Firebase Storage stats
-        bucket = storage_client.bucket(BUCKET_NAME)
-        blobs = list(bucket.list_blobs(prefix="landsat_images/"))
-
-        total_files = len(blobs)
-        total_size = sum(blob.size for blob in blobs if blob.size is not None)
-
-        # Fetch Firestore metrics using Monitoring API
-        client = monitoring_v3.MetricServiceClient()
-        interval = monitoring_v3.TimeInterval(
-            {
-                "start_time": {"seconds": int(start_date.timestamp())},
-                "end_time": {"seconds": int(end_date.timestamp())},
-            }
-        )
-
-        # Fetch firestore.googleapis.com/document/read_count
-        firestore_reads = 0
-        read_query = 'metric.type="firestore.googleapis.com/document/read_count"'
-        read_results = client.list_time_series(
-            request={
-                "name": f"projects/{PROJECT_ID}",
-                "filter": read_query,
-                "interval": interval,
-                "view": monitoring_v3.ListTimeSeriesRequest.TimeSeriesView.FULL,
-            }
-        )
-
-        if read_results:
-            for result in read_results:
-                for point in result.points:
-                    firestore_reads += point.value.int64_value
-
-        # Fetch firestore.googleapis.com/api/request_latencies
-        latency_query = 'metric.type="firestore.googleapis.com/api/request_latencies"'
-        request_latencies = []
-        latency_results = client.list_time_series(
-            request={
-                "name": f"projects/{PROJECT_ID}",
-                "filter": latency_query,
-                "interval": interval,
-                "view": monitoring_v3.ListTimeSeriesRequest.TimeSeriesView.FULL,
-            }
-        )
-
-        if latency_results:
-            for result in latency_results:
-                for point in result.points:
-                    request_latencies.append(point.value.double_value)
-
-        avg_latency = (
-            sum(request_latencies) / len(request_latencies) if request_latencies else 0
-        )
-
-        # Fetch firestore.googleapis.com/api/request_count
-        request_count = 0
-        count_query = 'metric.type="firestore.googleapis.com/api/request_count"'
-        count_results = client.list_time_series(
-            request={
-                "name": f"projects/{PROJECT_ID}",
-                "filter": count_query,
-                "interval": interval,
-                "view": monitoring_v3.ListTimeSeriesRequest.TimeSeriesView.FULL,
+        # The usage aggregate is a single document read; the Firestore metrics are only queried when the
+        # client's ETag is stale. Both run as coroutines on the shared event loop (multiplexed with other
+        # requests), or on a thread pool without `ASYNC_HANDLERS`
+        if ASYNC_HANDLERS:
+            usage = run(get_usage_async("landsat_images/", fresh))
+        else:
+            usage = get_usage("landsat_images/", fresh)
+
+        def compute():
+            if ASYNC_HANDLERS:
+                firestore_reads, latency, request_count = run(fetch_metrics_async(start_date, end_date))
+            else:
+                firestore_reads, latency, request_count = fetch_metrics(start_date, end_date)
+
+            return {
+                "storage": {
+                    "total_files": usage["count"],
+                    "total_size_mb": round(usage["total_bytes"] / (1024 * 1024), 2),
+                    "updated_at": usage["updated_at"],
+                },
+                "firestore": {
+                    "total_reads": firestore_reads,
+                },
+                "firebase": {
+                    "average_request_latency_ms": round(latency["mean"], 2),
+                    "request_latency_ms": {
+                        "count": latency["count"],
+                        "mean": round(latency["mean"], 2),
+                        "p50": round(latency["p50"], 2),
+                        "p90": round(latency["p90"], 2),
+                        "p99": round(latency["p99"], 2),
+                    },
+                    "total_request_count": request_count,
+                },
             }
-        )
-
-        if count_results:
-            for result in count_results:
-                for point in result.points:
-                    request_count += point.value.int64_value
-
-        # Build the response
-        response_data = {
-            "storage": {
-                "total_files": total_files,
-                "total_size_mb": round(total_size / (1024 * 1024), 2),
-            },
-            "firestore": {
-                "total_reads": firestore_reads,
-            },
-            "firebase": {
-                "average_request_latency_ms": round(avg_latency, 2),
-                "total_request_count": request_count,
-            },
-        }
 
-        return https_fn.Response(
-            json.dumps(response_data),
-            status=200,
-            mimetype="application/json",
-        )
+        cache_control = max_age(int(METRICS_CACHE_TTL))
+        if METRICS_CACHE_TTL <= 0:
+            # Metrics are never reused, so only the body can tell whether anything changed
+            return json_response(request, compute(), cache_control)
+
+        # Dashboards polling with `If-None-Match` get a 304 while the usage aggregate is unchanged and the
+        # metrics of the range may still be reused (within the same `METRICS_CACHE_TTL` window)
+        validator = ["get_firebase_stats", usage, start_date, end_date,
+                     [READ_COUNT_METRIC, REQUEST_LATENCIES_METRIC, REQUEST_COUNT_METRIC],
+                     int(time.time() // METRICS_CACHE_TTL)]
+        return conditional_response(request, validator, compute, cache_control)
     except Exception as e:
         return https_fn.Response(
             json.dumps({"error": f"Unexpected error: {str(e)}"}),
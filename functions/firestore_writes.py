@@ -0,0 +1,43 @@
+import os
+from google.api_core import exceptions
+from retries import FIRESTORE_RETRY
+
+# Firestore accepts at most 500 writes per batch
+FIRESTORE_BATCH_SIZE = int(os.getenv("FIRESTORE_BATCH_SIZE", "500"))
+
+
+def commit_with_retry(batch):
+    """
+    Commit a `WriteBatch`, retrying contention and unavailability with exponential backoff and jitter
+    (`FIRESTORE_RETRY`, up to `FIRESTORE_MAX_ATTEMPTS` attempts).
+    """
+    return FIRESTORE_RETRY.call(batch.commit)
+
+
+def write_documents(firestore_client, collection_name, documents, batch_size=FIRESTORE_BATCH_SIZE, merge=False):
+    """
+    Set every `{document_id: data}` of `documents` in `collection_name` using batched writes of up to
+    `batch_size` operations, one round trip per batch instead of one per document. With `merge` the
+    fields of `data` are merged into the existing documents.
+    Returns the number of committed batches.
+    """
+    collection = firestore_client.collection(collection_name)
+    items = list(documents.items())
+
+    batches = 0
+    for offset in range(0, len(items), batch_size):
+        batch = firestore_client.batch()
+        for document_id, data in items[offset:offset + batch_size]:
+            batch.set(collection.document(document_id), data, merge=merge)
+        commit_with_retry(batch)
+        batches += 1
+    return batches
+
+
+def create_if_absent(document_ref, data):
+    """Create the document unless it already exists, without reading it first."""
+    try:
+        document_ref.create(data)
+        return True
+    except exceptions.AlreadyExists:
+        return False
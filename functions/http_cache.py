@@ -0,0 +1,92 @@
+import os
+import json
+import hashlib
+from firebase_functions import https_fn
+from cache import LRUCache
+from tracing import count
+
+# Total size of the response bodies kept per function instance for conditional and repeated requests
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# `max-age` (seconds) of responses that clients and shared caches may reuse without revalidating
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+
+# Responses that must be revalidated (with `If-None-Match`) before every reuse
+REVALIDATE = "no-cache"
+
+# Responses that must not be stored at all (e.g. expiring signed URLs or per-call listings)
+NO_STORE = "no-store"
+
+_response_cache = LRUCache(RESPONSE_CACHE_MAX_BYTES)
+
+
+def max_age(seconds=None):
+    """Return a `Cache-Control` value letting any cache reuse the response for `seconds` (`HTTP_CACHE_MAX_AGE`)."""
+    return f"public, max-age={HTTP_CACHE_MAX_AGE if seconds is None else seconds}"
+
+
+def make_etag(*parts):
+    """Return a strong ETag (unquoted) for JSON-serializable parts, e.g. blob names and generations."""
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def _json(body, etag, cache_control):
+    headers = {"Cache-Control": cache_control}
+    if etag is not None:
+        headers["ETag"] = f'"{etag}"'
+    return https_fn.Response(body, status=200, mimetype="application/json", headers=headers)
+
+
+def _not_modified(request, etag, cache_control):
+    """
+    Return a 304 response when the request's `If-None-Match` matches `etag`, else None.
+
+    The JSON endpoints take their parameters in POST bodies, so 304 is returned for any method
+    instead of the 412 HTTP prescribes for non-GET requests.
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    count("not_modified")
+    return https_fn.Response(
+        status=304, mimetype="application/json", headers={"ETag": f'"{etag}"', "Cache-Control": cache_control}
+    )
+
+
+def json_response(request, payload, cache_control=None):
+    """
+    Return `payload` as a 200 JSON response with a strong ETag of its body and `Cache-Control`
+    (`max_age()` by default), or a bodyless 304 when the client already has this body.
+    """
+    cache_control = cache_control or max_age()
+    body = json.dumps(payload)
+    etag = make_etag(body)
+    return _not_modified(request, etag, cache_control) or _json(body, etag, cache_control)
+
+
+def conditional_response(request, validator, compute, cache_control=REVALIDATE, cacheable=None):
+    """
+    Return the JSON response of `compute()` for a request whose result is fully determined by `validator`
+    (e.g. the names and generations of the blobs it reads), without calling `compute` when possible.
+
+    The strong ETag is derived from `validator`, so `If-None-Match` gets a 304 before anything is
+    computed, and bodies are kept in a per-instance LRU cache (`RESPONSE_CACHE_MAX_BYTES`) under it.
+    Payloads for which `cacheable(payload)` is False (e.g. partial failures) are returned without an
+    ETag and not cached.
+    """
+    etag = make_etag(validator)
+    not_modified = _not_modified(request, etag, cache_control)
+    if not_modified is not None:
+        return not_modified
+
+    body = _response_cache.get(etag)
+    if body is not None:
+        count("response_cache_hits")
+        return _json(body, etag, cache_control)
+
+    payload = compute()
+    body = json.dumps(payload)
+    if cacheable is not None and not cacheable(payload):
+        return _json(body, None, NO_STORE)
+    _response_cache.set(etag, body)
+    return _json(body, etag, cache_control)
@@ -0,0 +1,75 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from retries import THUMBNAIL_RETRY
+
+# (connect, read) timeout in seconds for outgoing HTTP requests
+HTTP_TIMEOUT = (
+    float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+    float(os.getenv("HTTP_READ_TIMEOUT", "60")),
+)
+
+# Number of pooled keep-alive connections per host
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+
+_session = None
+_async_client = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the shared `requests.Session` with a sized pool of keep-alive connections.
+    Retries are left to the callers' `RetryPolicy` so they are budgeted and counted.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _get(url, timeout):
+    response = get_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+
+def fetch_bytes(url, timeout=HTTP_TIMEOUT, retry=THUMBNAIL_RETRY):
+    """
+    GET `url` through the shared session and return the response body.
+    Connection errors, timeouts and transient statuses are retried according to `retry`.
+    """
+    return retry.call(_get, url, timeout)
+
+
+def get_async_client():
+    """
+    Return the shared `httpx.AsyncClient`, pooling up to `HTTP_POOL_SIZE` keep-alive connections.
+    Only use it on the shared event loop (`event_loop`); like the session, it never retries by itself.
+    """
+    global _async_client
+    with _session_lock:
+        if _async_client is None:
+            import httpx
+
+            _async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(HTTP_TIMEOUT[1], connect=HTTP_TIMEOUT[0]),
+                limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+            )
+        return _async_client
+
+
+async def _get_async(url):
+    response = await get_async_client().get(url)
+    response.raise_for_status()
+    return response.content
+
+
+async def fetch_bytes_async(url, retry=THUMBNAIL_RETRY):
+    """`fetch_bytes` through the shared `httpx.AsyncClient`, awaiting the response instead of blocking a thread."""
+    return await retry.call_async(_get_async, url)
@@ -0,0 +1,373 @@
+import io
+import os
+import json
+import base64
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from google.api_core import exceptions
+from PIL import Image
+from retries import gcs_options
+from tracing import add_bytes, count, span, submit
+
+# Maximum number of images processed concurrently (download, scale, upload)
+SCALING_MAX_WORKERS = int(os.getenv("SCALING_MAX_WORKERS", "8"))
+
+# Maximum number of images resized/encoded at the same time. Pillow releases the GIL
+# while decoding, resizing and encoding, so threads are enough to use every core.
+SCALING_CPU_WORKERS = int(os.getenv("SCALING_CPU_WORKERS", str(os.cpu_count() or 1)))
+
+# Renditions are generated by the storage trigger, so by default requests never scale missing renditions
+# that would be kept in storage; they are reported as errors instead. Set to True to backfill them inline.
+SCALE_MISSING_RENDITIONS = os.getenv("SCALE_MISSING_RENDITIONS", "false").lower() == "true"
+
+# Custom metadata key on a rendition holding the generation of the source image it was scaled from
+SOURCE_GENERATION_KEY = "source_generation"
+
+# Decode budget per source image: larger files (bytes) or images (width x height) fail with `ImageTooLargeError`
+MAX_SOURCE_BYTES = int(os.getenv("MAX_SOURCE_BYTES", str(64 * 1024 * 1024)))
+MAX_SOURCE_PIXELS = int(os.getenv("MAX_SOURCE_PIXELS", str(25_000_000)))
+
+# Size of the ranged reads source images are streamed into the decoder with (the client default is 40 MiB)
+SOURCE_CHUNK_SIZE = int(os.getenv("SOURCE_CHUNK_SIZE", str(2 * 1024 * 1024)))
+
+# Downscales by more than this factor first shrink the image with the fast `reduce()` box filter
+# and only run the resampling filter on the remaining, smaller image
+REDUCING_GAP = 3.0
+
+CONTENT_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp", "AVIF": "image/avif"}
+
+_cpu_slots = threading.BoundedSemaphore(max(1, SCALING_CPU_WORKERS))
+
+
+class ImageTooLargeError(ValueError):
+    """A source image exceeds the `MAX_SOURCE_BYTES` / `MAX_SOURCE_PIXELS` decode budget."""
+
+
+@dataclass(frozen=True)
+class RenditionSpec:
+    """
+    How a rendition is produced from a source image.
+
+    `fit` is either `stretch` (exactly `size`, ignoring the aspect ratio) or `contain` (fit inside
+    `size`, keeping the aspect ratio and never upscaling).
+    """
+    name: str
+    size: tuple
+    format: str = "PNG"
+    quality: int = 85
+    resample: str = "LANCZOS"
+    fit: str = "contain"
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES[self.format]
+
+    @property
+    def suffix(self):
+        """Suffix of the rendition blob name, e.g. `_hd.png`."""
+        extension = "jpg" if self.format == "JPEG" else self.format.lower()
+        return f"_{self.name}.{extension}"
+
+
+# Default renditions; `hd` is the original 1280x720 PNG rendition
+DEFAULT_RENDITIONS = {
+    "hd": RenditionSpec("hd", (1280, 720), "PNG", fit="stretch"),
+    "thumb": RenditionSpec("thumb", (320, 320), "WEBP", quality=75),
+    "720p": RenditionSpec("720p", (1280, 720), "WEBP", quality=85),
+    "1080p": RenditionSpec("1080p", (1920, 1080), "JPEG", quality=90),
+}
+
+
+def load_renditions():
+    """Return the default renditions, extended or overridden by the JSON in `RENDITION_SPECS`."""
+    renditions = dict(DEFAULT_RENDITIONS)
+    for name, spec in json.loads(os.getenv("RENDITION_SPECS", "{}")).items():
+        spec["size"] = tuple(spec["size"])
+        spec["format"] = spec.get("format", "PNG").upper()
+        if spec["format"] not in CONTENT_TYPES:
+            raise ValueError(f"Unsupported rendition format: {spec['format']}")
+        renditions[name] = RenditionSpec(name=name, **spec)
+    return renditions
+
+
+RENDITIONS = load_renditions()
+
+DEFAULT_RENDITION = "hd"
+
+
+def get_scaled_blob_name(blob_name, rendition=DEFAULT_RENDITION):
+    """Return the name of a rendition for a source image in `landsat_images/`."""
+    scaled_blob_name = blob_name.replace("landsat_images/", "scaled_images/")
+    return scaled_blob_name.replace(".png", RENDITIONS[rendition].suffix)
+
+
+def _target_size(source_size, spec):
+    """Return the output size of `spec` for an image of `source_size`."""
+    if spec.fit == "stretch":
+        return spec.size
+
+    ratio = min(spec.size[0] / source_size[0], spec.size[1] / source_size[1], 1.0)
+    return max(1, round(source_size[0] * ratio)), max(1, round(source_size[1] * ratio))
+
+
+def _encode(img, spec):
+    """Encode a resized image according to `spec`."""
+    Image.init()
+    if spec.format not in Image.SAVE:
+        raise ValueError(f"{spec.format} encoding is not supported by the installed Pillow build")
+    if spec.format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    output = io.BytesIO()
+    if spec.format == "PNG":
+        img.save(output, format="PNG")
+    else:
+        img.save(output, format=spec.format, quality=spec.quality)
+    return output.getvalue()
+
+
+def _open_image(source):
+    """Read the image header and check its size against `MAX_SOURCE_PIXELS` before anything is decoded."""
+    try:
+        img = Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+
+    width, height = img.size
+    if width * height > MAX_SOURCE_PIXELS:
+        img.close()
+        raise ImageTooLargeError(
+            f"Image is {width}x{height} ({width * height / 1e6:.1f} MP), above the decode budget of "
+            f"{MAX_SOURCE_PIXELS / 1e6:.1f} MP (MAX_SOURCE_PIXELS)"
+        )
+    return img
+
+
+def render_renditions(source, specs):
+    """
+    Decode the image once and return a dict mapping each spec name to its encoded rendition.
+
+    `source` is the encoded image, as bytes or a binary file (e.g. a blob reader, so the image is decoded
+    while it streams in). Images above the `MAX_SOURCE_PIXELS` budget raise `ImageTooLargeError`.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with _open_image(source) as img:
+        # Loading a streamed source is where it is downloaded, so only resizing and encoding take a CPU slot
+        with span("decode"):
+            # Let decoders that support it (JPEG) decode directly at a reduced scale
+            largest = max((_target_size(img.size, spec) for spec in specs), key=lambda size: size[0] * size[1])
+            img.draft(img.mode, largest)
+            img.load()
+
+        with _cpu_slots:
+            renditions = {}
+            for spec in specs:
+                resample = Image.Resampling[spec.resample]
+                with span("resize"):
+                    img_resized = img.resize(_target_size(img.size, spec), resample, reducing_gap=REDUCING_GAP)
+                with span("encode"):
+                    renditions[spec.name] = _encode(img_resized, spec)
+            count("renditions_rendered", len(specs))
+            return renditions
+
+
+def _download(blob):
+    """Download a blob with the shared Cloud Storage timeout and retry policy."""
+    with span("download"):
+        data = blob.download_as_bytes(**gcs_options())
+    add_bytes("download", len(data))
+    return data
+
+
+def check_source_size(name, size):
+    """Raise `ImageTooLargeError` when a source of `size` bytes (None when unknown) exceeds `MAX_SOURCE_BYTES`."""
+    if size is not None and size > MAX_SOURCE_BYTES:
+        raise ImageTooLargeError(
+            f"{name} is {size / 2**20:.1f} MiB, above the decode budget of "
+            f"{MAX_SOURCE_BYTES / 2**20:.1f} MiB (MAX_SOURCE_BYTES)"
+        )
+
+
+def render_blob(blob, specs):
+    """
+    Stream a source blob into the decoder in `SOURCE_CHUNK_SIZE` reads and return its encoded renditions,
+    so the whole encoded file is never held in memory. Sources above `MAX_SOURCE_BYTES` (or
+    `MAX_SOURCE_PIXELS`) raise `ImageTooLargeError` without being read.
+    """
+    check_source_size(blob.name, blob.size)
+
+    with blob.open("rb", chunk_size=SOURCE_CHUNK_SIZE, **gcs_options()) as source:
+        rendered = render_renditions(source, specs)
+        add_bytes("download", source.tell())
+    return rendered
+
+
+def list_renditions(bucket, blobs=None, rendition=DEFAULT_RENDITION):
+    """
+    Map rendition blob name to rendition blob with a single listing of `scaled_images/`.
+
+    When the source `blobs` are given (e.g. one page), the listing is limited to the range of
+    their rendition names instead of the whole folder; no blobs need no listing.
+    """
+    if blobs is not None and not blobs:
+        return {}
+    with span("list_renditions"):
+        if blobs is None:
+            return {blob.name: blob for blob in bucket.list_blobs(prefix="scaled_images/")}
+
+        scaled_blob_names = [get_scaled_blob_name(blob.name, rendition) for blob in blobs]
+        listed = bucket.list_blobs(
+            prefix="scaled_images/",
+            start_offset=min(scaled_blob_names),
+            end_offset=max(scaled_blob_names) + "\0",
+        )
+        return {blob.name: blob for blob in listed}
+
+
+def is_rendition_fresh(scaled_blob, blob):
+    """A rendition is fresh when it exists and was scaled from the current generation of its source."""
+    if scaled_blob is None:
+        return False
+    return (scaled_blob.metadata or {}).get(SOURCE_GENERATION_KEY) == str(blob.generation)
+
+
+def save_renditions(bucket, blob, scaled_blobs):
+    """
+    Scale `blob` into several renditions from a single streamed read and decode, and upload them
+    tagged with the source generation.
+
+    `scaled_blobs` maps each rendition name to the currently stored rendition blob (or None); an upload
+    only succeeds if that rendition hasn't been replaced in the meantime, so concurrent writers never
+    overwrite each other. Returns a dict mapping rendition name to the uploaded blob and its bytes.
+    """
+    specs = [RENDITIONS[rendition] for rendition in scaled_blobs]
+    rendered = render_blob(blob, specs)
+
+    saved = {}
+    for spec in specs:
+        current_blob = scaled_blobs[spec.name]
+        if_generation_match = current_blob.generation if current_blob is not None else 0
+
+        scaled_blob = bucket.blob(get_scaled_blob_name(blob.name, spec.name))
+        scaled_blob.metadata = {SOURCE_GENERATION_KEY: str(blob.generation)}
+        with span("upload"):
+            scaled_blob.upload_from_string(
+                rendered[spec.name], content_type=spec.content_type, if_generation_match=if_generation_match,
+                **gcs_options()
+            )
+        add_bytes("upload", len(rendered[spec.name]))
+        saved[spec.name] = scaled_blob, rendered[spec.name]
+    return saved
+
+
+def save_rendition(bucket, blob, scaled_blob=None, rendition=DEFAULT_RENDITION):
+    """Scale `blob` into a single rendition and upload it; see `save_renditions`."""
+    return save_renditions(bucket, blob, {rendition: scaled_blob})[rendition]
+
+
+def process_blob(bucket, blob, save_to_storage=False, delivery="base64", sign_url=None, renditions=None,
+                 rendition=DEFAULT_RENDITION):
+    """
+    Return the `rendition` of a single source blob as base64, or as a `{"path", "generation"}` reference
+    (plus a `url` from `sign_url`) for the `path` and `signed_url` deliveries. Renditions kept in storage
+    that aren't fresh in `renditions` raise `LookupError` unless `SCALE_MISSING_RENDITIONS` is set.
+    """
+    scaled_blob_name = get_scaled_blob_name(blob.name, rendition)
+    scaled_blob = (renditions or {}).get(scaled_blob_name)
+    save_to_storage = save_to_storage or delivery != "base64"
+    scaled_image_data = None
+
+    if save_to_storage and is_rendition_fresh(scaled_blob, blob):
+        if delivery == "base64":
+            scaled_image_data = _download(scaled_blob)
+    elif save_to_storage:
+        if not SCALE_MISSING_RENDITIONS:
+            raise LookupError(f"Rendition {scaled_blob_name} has not been generated yet")
+        try:
+            scaled_blob, scaled_image_data = save_rendition(bucket, blob, scaled_blob, rendition)
+        except exceptions.PreconditionFailed:
+            # The storage trigger (or another request) stored the rendition first; serve that one
+            scaled_blob = bucket.get_blob(scaled_blob_name)
+            if not is_rendition_fresh(scaled_blob, blob):
+                raise
+            if delivery == "base64":
+                scaled_image_data = _download(scaled_blob)
+    else:
+        scaled_image_data = render_blob(blob, [RENDITIONS[rendition]])[rendition]
+
+    if delivery == "base64":
+        return base64.b64encode(scaled_image_data).decode("utf-8")
+
+    result = {"path": scaled_blob.name, "generation": scaled_blob.generation}
+    if delivery == "signed_url":
+        result["url"] = sign_url(scaled_blob)
+    return result
+
+
+def iter_scaled_blobs(bucket, blobs, max_workers=SCALING_MAX_WORKERS, **options):
+    """
+    Yield `(blob_name, scaled_image, error)` for every PNG blob, in the order of `blobs`; `options` are
+    passed on to `process_blob`. `blobs` may be a lazy iterator: images are submitted in windows of
+    `max_workers`, each with its own range-limited `list_renditions` when `renditions` isn't given.
+    """
+    max_workers = max(1, min(max_workers, SCALING_MAX_WORKERS))
+    keeps_renditions = options.get("save_to_storage") or options.get("delivery", "base64") != "base64"
+    lists_renditions = options.get("renditions") is None and keeps_renditions
+    pending = deque()
+    window = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit_window():
+            window_options = options
+            if lists_renditions:
+                renditions = list_renditions(bucket, window, options.get("rendition", DEFAULT_RENDITION))
+                window_options = dict(options, renditions=renditions)
+            for window_blob in window:
+                future = submit(executor, process_blob, bucket, window_blob, **window_options)
+                pending.append((window_blob.name, future))
+            window.clear()
+
+        for blob in blobs:
+            # Skip files that do not end with ".png"
+            if not blob.name.endswith(".png"):
+                continue
+
+            window.append(blob)
+            if len(window) == max_workers:
+                while len(pending) > max_workers:
+                    yield _collect(*pending.popleft())
+                submit_window()
+
+        if window:
+            submit_window()
+        while pending:
+            yield _collect(*pending.popleft())
+
+
+def _collect(blob_name, future):
+    """Turn a finished future into a `(blob_name, scaled_image, error)` tuple."""
+    try:
+        return blob_name, future.result(), None
+    except Exception as e:
+        return blob_name, None, str(e)
+
+
+def scale_blobs(bucket, blobs, max_workers=SCALING_MAX_WORKERS, **options):
+    """
+    Scale the PNG blobs concurrently on a bounded thread pool. `options` are passed on to `process_blob`.
+
+    Failures are isolated per image: the returned tuple holds the renditions as returned by
+    `process_blob` (in the order of `blobs`) and a list of errors for the images that could not be processed.
+    """
+    scaled_images = []
+    errors = []
+    for blob_name, scaled_image, error in iter_scaled_blobs(bucket, blobs, max_workers, **options):
+        if error is None:
+            scaled_images.append(scaled_image)
+        else:
+            errors.append({"image": blob_name, "error": error})
+
+    return scaled_images, errors
@@ -1,23 +1,22 @@
 from firebase_functions import https_fn
-from google.cloud import storage
-import os
 import json
-from dotenv import load_dotenv
-
-# Load environment variables from .env
-load_dotenv()
-
-# Initialize Cloud Storage client
-storage_client = storage.Client()
-
-# Fetch the bucket name from the .env file
-BUCKET_NAME = os.getenv("BUCKET_NAME")
+from config import BUCKET_NAME
+from http_cache import NO_STORE, json_response, max_age
+from storage_usage import get_usage
+from tracing import traced
 
 
 @https_fn.on_request()
+@traced("get_total_image_size")
 def get_total_image_size(request: https_fn.Request) -> https_fn.Response:
     """
     Firebase Function to calculate the total size of all images in a specified folder in Firebase Storage.
+
+    The size is read from the folder's usage aggregate kept up to date by the storage triggers; with
+    `fresh=true` (or for prefixes without an aggregate) the folder is listed and summed page by page.
+
+    Aggregate responses carry a strong ETag, which changes with the aggregate's `updated_at`, so
+    `If-None-Match` gets a 304; listed sizes are never cached.
     """
     try:
         if not BUCKET_NAME:
@@ -27,22 +26,22 @@ def get_total_image_size(request: https_fn.Request) -> https_fn.Response:
                 mimetype="application/json"
             )
 
-        # Connect to the bucket
-        bucket = storage_client.bucket(BUCKET_NAME)
-
         # Define the folder to calculate size
         folder = request.args.get("folder", "landsat_images/")  # Default folder
-
-        # List all blobs in the folder
-        blobs = list(bucket.list_blobs(prefix=folder))
-
-        # Calculate thee total size
-        total_size = sum(blob.size for blob in blobs if blob.size is not None)
-
-        return https_fn.Response(
-            json.dumps({"folder": folder, "total_size_bytes": total_size}),
-            status=200,
-            mimetype="application/json"
+        fresh = request.args.get("fresh", "false").lower() == "true"
+
+        usage = get_usage(folder, fresh)
+
+        return json_response(
+            request,
+            {
+                "folder": folder,
+                "total_size_bytes": usage["total_bytes"],
+                "total_files": usage["count"],
+                "updated_at": usage["updated_at"],
+                "source": usage["source"],
+            },
+            max_age() if usage["source"] == "index" else NO_STORE,
         )
 
     except Exception as e:
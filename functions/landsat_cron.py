@@ -1,16 +1,310 @@
-import ee
-import requests
+import os
+import re
 import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from firebase_functions import https_fn
-from config import firestore_client, bucket, BUCKET_NAME, CONFIG_PATH
-from utils import get_region_from_cloud_storage, flatten_data, log_error_to_firestore
+from clients import get_bucket, get_firestore_client
+from config import CONFIG_PATH
+from earth_engine import EarthEngineClient
+from event_loop import ASYNC_HANDLERS, run
+from firestore_writes import write_documents, create_if_absent
+from http_session import fetch_bytes, fetch_bytes_async
+from retries import gcs_options, get_retry_stats
+from scene_catalog import extract_catalog_fields
+from tracing import add_bytes, count, span, submit, traced
+from utils import get_regions_from_cloud_storage, flatten_data, log_error_to_firestore
+
+# Maximum number of scenes ingested concurrently (per region)
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", "8"))
+
+# Maximum number of regions ingested concurrently
+REGION_MAX_WORKERS = int(os.getenv("REGION_MAX_WORKERS", "4"))
+
+# Maximum number of thumbnails in flight per region with `ASYNC_HANDLERS` (coroutines are cheap, threads aren't)
+INGEST_ASYNC_CONCURRENCY = int(os.getenv("INGEST_ASYNC_CONCURRENCY", "32"))
+
+earth_engine_client = EarthEngineClient()
+
+# Firestore collection holding, per collection and region, the end of the last fully ingested window
+WATERMARK_COLLECTION = "landsat_watermarks"
+
+# Typed catalog fields written by `build_metadata`, compared against the stored ones by `backfill_catalog`
+CATALOG_FIELDS = ["acquired_at", "cloud_cover", "wrs_path", "wrs_row", "spacecraft", "geohash", "geohash_prefixes"]
+
+# Metadata documents scanned per `backfill_scene_catalog` call by default, and at most
+BACKFILL_PAGE_SIZE = 500
+MAX_BACKFILL_PAGE_SIZE = 2000
+
+
+def get_watermark_ref(collection_name, region_coordinates, region_radius):
+    """Return the Firestore document holding the ingestion watermark of a collection and region."""
+    key = f"{collection_name}_{region_coordinates[0]}_{region_coordinates[1]}_{region_radius}"
+    return get_firestore_client().collection(WATERMARK_COLLECTION).document(re.sub(r"[^A-Za-z0-9_.-]", "_", key))
+
+
+def find_ingested_scenes(image_ids):
+    """
+    Return the ids of the scenes whose metadata document and thumbnail both already exist, using one
+    batched Firestore read and one listing of `landsat_images/` instead of two lookups per scene.
+    """
+    if not image_ids:
+        return set()
+
+    firestore_client = get_firestore_client()
+    metadata_refs = [firestore_client.collection("landsat_metadata").document(image_id) for image_id in image_ids]
+    with_metadata = {snapshot.id for snapshot in firestore_client.get_all(metadata_refs, field_paths=["id"])
+                     if snapshot.exists}
+
+    blob_names = [f"landsat_images/{image_id}.png" for image_id in image_ids]
+    listed = get_bucket().list_blobs(
+        prefix="landsat_images/",
+        start_offset=min(blob_names),
+        end_offset=max(blob_names) + "\0",
+    )
+    with_image = {blob.name[len("landsat_images/"):-len(".png")] for blob in listed}
+
+    return with_metadata & with_image
+
+
+def build_metadata(scene, region_coordinates, region_radius):
+    """
+    Build the `landsat_metadata` document of a scene from its Earth Engine info, with the typed catalog
+    fields queried by `search_scenes` next to the flattened properties.
+    """
+    image_id = scene.get("id").split("/")[-1]
+
+    properties = flatten_data(scene.get("properties", {}))
+    metadata = {
+        "type": "Image/png",
+        "id": image_id,
+        "location": {"coordinates": region_coordinates, "region_radius": region_radius},
+        "properties": properties,
+    }
+    metadata.update(extract_catalog_fields(scene.get("properties", {})))
+    return metadata
+
+
+def backfill_catalog(page_size=BACKFILL_PAGE_SIZE, cursor=None):
+    """
+    Recompute the typed catalog fields of one page of `landsat_metadata` documents (ordered by id, after
+    `cursor`) from their stored properties and merge the ones that changed, so scenes ingested before a
+    field existed become searchable without being ingested again.
+    Returns the number of scanned and updated documents and the id to continue after (None on the last page).
+    """
+    query = get_firestore_client().collection("landsat_metadata").select(["properties"] + CATALOG_FIELDS)
+    query = query.order_by("__name__")
+    if cursor:
+        query = query.start_after({"__name__": cursor})
+    with span("catalog_scan"):
+        snapshots = list(query.limit(page_size).stream())
+
+    updates = {}
+    for snapshot in snapshots:
+        data = snapshot.to_dict()
+        fields = extract_catalog_fields(data.get("properties") or {})
+        changed = {field: value for field, value in fields.items() if data.get(field) != value}
+        if changed:
+            updates[snapshot.id] = changed
+    with span("firestore_write"):
+        write_documents(get_firestore_client(), "landsat_metadata", updates, merge=True)
+
+    next_cursor = snapshots[-1].id if len(snapshots) == page_size else None
+    return {"scanned": len(snapshots), "updated": len(updates), "next_cursor": next_cursor}
+
+
+def ingest_thumbnail(scene, region):
+    """
+    Fetch the thumbnail of a scene and upload it to Cloud Storage.
+    Returns the image id and the uploaded blob name.
+    """
+    image_id = scene.get("id").split("/")[-1]
+
+    with span("ee_thumb_url"):
+        url = earth_engine_client.get_thumb_url(scene.get("id"), region)
+    with span("thumb_fetch"):
+        thumbnail = fetch_bytes(url)
+    add_bytes("thumb_fetch", len(thumbnail))
+
+    return image_id, upload_thumbnail(image_id, thumbnail)
+
+
+async def ingest_thumbnail_async(scene, region):
+    """
+    `ingest_thumbnail` on the shared event loop: the thumbnail download is awaited, while the Earth Engine
+    and Cloud Storage calls (synchronous client libraries) run on worker threads.
+    """
+    image_id = scene.get("id").split("/")[-1]
+
+    with span("ee_thumb_url"):
+        url = await asyncio.to_thread(earth_engine_client.get_thumb_url, scene.get("id"), region)
+    with span("thumb_fetch"):
+        thumbnail = await fetch_bytes_async(url)
+    add_bytes("thumb_fetch", len(thumbnail))
+
+    return image_id, await asyncio.to_thread(upload_thumbnail, image_id, thumbnail)
+
+
+def upload_thumbnail(image_id, thumbnail):
+    """Upload a thumbnail to `landsat_images/` and return the blob name."""
+    image_blob_name = f"landsat_images/{image_id}.png"
+    # Re-uploading the same thumbnail is harmless, so unconditional uploads are retried too
+    with span("gcs_upload"):
+        get_bucket().blob(image_blob_name).upload_from_string(thumbnail, content_type="image/png", **gcs_options())
+    return image_blob_name
+
+
+def prepare_region(collection_name, region_config, start_date, end_date):
+    """
+    Find the new scenes of a region and save their metadata, before their thumbnails are ingested.
+
+    Ingestion is incremental: the window starts at the watermark left by the last complete run of the
+    region (or at `start_date` on the first run), and scenes whose metadata and thumbnail already exist
+    are skipped. Returns the progress report, the scenes whose thumbnails are missing, the Earth Engine
+    region and the watermark document; a report with a `message` means there is nothing to ingest.
+    """
+    region_coordinates, region_radius = region_config.coordinates, region_config.radius
+    region = earth_engine_client.get_region(region_coordinates, region_radius)
+    report = {"region": region_config.name, "image_count": 0, "saved_images": [], "skipped_images": [],
+              "errors": []}
+
+    # Continue from the end of the last complete run
+    watermark_ref = get_watermark_ref(collection_name, region_coordinates, region_radius)
+    with span("firestore_read"):
+        watermark = watermark_ref.get()
+    if watermark.exists:
+        start_date = watermark.get("end_date")
+        if start_date >= end_date:
+            report["message"] = "No new images"
+            return report, [], region, watermark_ref
+
+    # Fetch the ids and properties of all scenes, one Earth Engine round trip per `EE_LIST_PAGE_SIZE` scenes
+    with span("ee_list_scenes"):
+        scenes = earth_engine_client.list_scenes(collection_name, start_date, end_date, region)
+    report["image_count"] = len(scenes)
+    count("scenes", len(scenes))
+    if not scenes and not watermark.exists:
+        log_error_to_firestore(get_firestore_client(), f"No images found for region {region_config.name}")
+        report["message"] = "No images found"
+        return report, [], region, watermark_ref
+
+    # Skip the scenes that were already ingested
+    with span("find_ingested"):
+        ingested = find_ingested_scenes([scene.get("id").split("/")[-1] for scene in scenes])
+    report["skipped_images"] = [f"landsat_images/{image_id}.png" for image_id in sorted(ingested)]
+    scenes = [scene for scene in scenes if scene.get("id").split("/")[-1] not in ingested]
+
+    # Save the metadata of all scenes with batched writes
+    metadata = {}
+    for scene in scenes:
+        scene_metadata = build_metadata(scene, region_coordinates, region_radius)
+        metadata[scene_metadata["id"]] = scene_metadata
+    with span("firestore_write"):
+        write_documents(get_firestore_client(), "landsat_metadata", metadata)
+    return report, scenes, region, watermark_ref
+
+
+def finish_region(report, scenes, results, watermark_ref, collection_name, end_date, today):
+    """
+    Record the outcome of every thumbnail (`(image_id, blob_name)` or the exception it raised) in the
+    report; a failing scene is logged and doesn't stop the others.
+    """
+    for scene, result in zip(scenes, results):
+        if isinstance(result, BaseException):
+            log_error_to_firestore(get_firestore_client(), f"Failed to ingest {scene.get('id')}: {result}")
+            report["errors"].append({"id": scene.get("id"), "error": str(result)})
+        else:
+            report["saved_images"].append(result[1])
+            count("images_saved")
+
+    # Only advance the watermark when every scene made it, so failed scenes are retried next run
+    if not report["errors"]:
+        watermark_ref.set({"collection": collection_name, "end_date": end_date, "updated_at": today.isoformat()})
+
+    report["message"] = "Region ingested successfully"
+    return report
+
+
+def _result(future):
+    try:
+        return future.result()
+    except Exception as e:
+        return e
+
+
+def ingest_region(collection_name, region_config, start_date, end_date, today):
+    """Ingest the new scenes of a single region and return its progress report (see `prepare_region`)."""
+    report, scenes, region, watermark_ref = prepare_region(collection_name, region_config, start_date, end_date)
+    if "message" in report:
+        return report
+
+    # Ingest the thumbnails concurrently so downloads and uploads of different scenes overlap
+    with ThreadPoolExecutor(max_workers=INGEST_MAX_WORKERS) as executor:
+        futures = [submit(executor, ingest_thumbnail, scene, region) for scene in scenes]
+
+    results = [_result(future) for future in futures]
+    return finish_region(report, scenes, results, watermark_ref, collection_name, end_date, today)
+
+
+async def ingest_region_async(collection_name, region_config, start_date, end_date, today):
+    """
+    `ingest_region` on the shared event loop: up to `INGEST_ASYNC_CONCURRENCY` thumbnails are in flight
+    at once, while the few Firestore and Earth Engine round trips before and after run on worker threads.
+    """
+    report, scenes, region, watermark_ref = await asyncio.to_thread(
+        prepare_region, collection_name, region_config, start_date, end_date
+    )
+    if "message" in report:
+        return report
+
+    slots = asyncio.Semaphore(INGEST_ASYNC_CONCURRENCY)
+
+    async def ingest(scene):
+        async with slots:
+            return await ingest_thumbnail_async(scene, region)
+
+    results = await asyncio.gather(*(ingest(scene) for scene in scenes), return_exceptions=True)
+    return await asyncio.to_thread(
+        finish_region, report, scenes, results, watermark_ref, collection_name, end_date, today
+    )
+
+
+def ingest_regions(collection_name, regions, start_date, end_date, today):
+    """Ingest the regions concurrently on threads; returns each region's report or the exception it raised."""
+    with ThreadPoolExecutor(max_workers=REGION_MAX_WORKERS) as executor:
+        futures = [
+            submit(executor, ingest_region, collection_name, region, start_date, end_date, today)
+            for region in regions
+        ]
+    return [_result(future) for future in futures]
+
+
+async def ingest_regions_async(collection_name, regions, start_date, end_date, today):
+    """`ingest_regions` as coroutines on the shared event loop, `REGION_MAX_WORKERS` regions at a time."""
+    slots = asyncio.Semaphore(REGION_MAX_WORKERS)
+
+    async def ingest(region):
+        async with slots:
+            return await ingest_region_async(collection_name, region, start_date, end_date, today)
+
+    return await asyncio.gather(*(ingest(region) for region in regions), return_exceptions=True)
 
 
 @https_fn.on_request()
+@traced("landsat_cron")
 def landsat_cron(req: https_fn.Request) -> https_fn.Response:
+    """
+    Firebase Function to ingest new Landsat scenes of every region configured in `CONFIG_PATH`.
+
+    Regions are ingested concurrently (`REGION_MAX_WORKERS`) and each gets its own report; a failing
+    region doesn't stop the others. The optional `regions` list in the request body restricts the run
+    to the named regions, e.g. to run one region per scheduled call. With `ASYNC_HANDLERS` the ingestion
+    runs on the shared event loop.
+    """
     try:
-        collection_name = req.get_json().get("collection", "LANDSAT/LC09/C02/T2_TOA")
+        request_data = req.get_json()
+        collection_name = request_data.get("collection", "LANDSAT/LC09/C02/T2_TOA")
 
         today = datetime.utcnow()
         two_years = timedelta(days=730)
@@ -18,57 +312,67 @@ def landsat_cron(req: https_fn.Request) -> https_fn.Response:
         end_date = (today - two_years).date().isoformat()
         start_date = (today - two_years - quarter).date().isoformat()
 
-        region_coordinates, region_radius = get_region_from_cloud_storage(bucket, CONFIG_PATH)
-        region = ee.Geometry.Point(region_coordinates).buffer(region_radius).bounds()
-        collection = (
-            ee.ImageCollection(collection_name)
-            .filterDate(start_date, end_date)
-            .filterBounds(region)
-            .select(["B4", "B3", "B2"])
-        )
+        with span("config_read"):
+            regions = get_regions_from_cloud_storage(get_bucket(), CONFIG_PATH)
+        if request_data.get("regions"):
+            regions = [region for region in regions if region.name in request_data["regions"]]
+        if not regions:
+            return https_fn.Response(json.dumps({"error": "No matching regions configured"}), status=400)
 
-        image_count = collection.size().getInfo()
-        if image_count == 0:
-            log_error_to_firestore(firestore_client, "No images found")
-            return https_fn.Response(json.dumps({"message": "No images found"}), status=404)
+        # Create empty collection `landsat_metadata_changed` in Firestore if it does not exist
+        create_if_absent(get_firestore_client().collection("landsat_metadata_changed").document("placeholder"), {})
 
-        saved_images = []
-        saved_metadata = []
+        if ASYNC_HANDLERS:
+            results = run(ingest_regions_async(collection_name, regions, start_date, end_date, today))
+        else:
+            results = ingest_regions(collection_name, regions, start_date, end_date, today)
 
-        # Create empty collection `landsat_metadata_changed` in Firestore if it does not exist
-        if not firestore_client.collection("landsat_metadata_changed").document("placeholder").get().exists:
-            firestore_client.collection("landsat_metadata_changed").document("placeholder").set({})
-
-        images = collection.toList(image_count)
-        for i in range(image_count):
-            image = ee.Image(images.get(i))
-            raw_metadata = image.getInfo()
-            image_id = raw_metadata.get("id").split("/")[-1]
-
-            properties = flatten_data(raw_metadata.get("properties", {}))
-            metadata = {
-                "type": "Image/png",
-                "id": image_id,
-                "location": {"coordinates": region_coordinates, "region_radius": region_radius},
-                "properties": properties,
-            }
-
-            firestore_client.collection("landsat_metadata").document(image_id).set(metadata)
-            saved_metadata.append(image_id)
-
-            vis_params = {"min": 0.0, "max": 0.4, "bands": ["B4", "B3", "B2"]}
-            url = image.getThumbURL({"region": region, "format": "png", **vis_params})
-            response = requests.get(url)
-            response.raise_for_status()
-
-            image_blob_name = f"landsat_images/{image_id}.png"
-            bucket.blob(image_blob_name).upload_from_string(response.content, content_type="image/png")
-            saved_images.append(image_blob_name)
+        reports = []
+        for region, result in zip(regions, results):
+            if isinstance(result, BaseException):
+                log_error_to_firestore(get_firestore_client(), f"Failed to ingest region {region.name}: {result}")
+                reports.append({"region": region.name, "error": str(result)})
+            else:
+                reports.append(result)
+
+        if all("error" in report for report in reports):
+            return https_fn.Response(json.dumps({"error": "All regions failed", "regions": reports}), status=500)
+        if all(report.get("message") == "No images found" for report in reports):
+            return https_fn.Response(json.dumps({"message": "No images found", "regions": reports}), status=404)
 
         return https_fn.Response(
-            json.dumps({"message": "Cron job executed successfully", "image_count": image_count, "saved_images": saved_images}),
+            json.dumps({
+                "message": "Cron job executed successfully",
+                "image_count": sum(report.get("image_count", 0) for report in reports),
+                "saved_images": [name for report in reports for name in report.get("saved_images", [])],
+                "skipped_images": [name for report in reports for name in report.get("skipped_images", [])],
+                "errors": [error for report in reports for error in report.get("errors", [])],
+                "regions": reports,
+                "retry_stats": get_retry_stats(),
+            }),
             status=200,
         )
     except Exception as e:
-        log_error_to_firestore(firestore_client, str(e))
+        log_error_to_firestore(get_firestore_client(), str(e))
+        return https_fn.Response(json.dumps({"error": str(e)}), status=500)
+
+
+@https_fn.on_request()
+@traced("backfill_scene_catalog")
+def backfill_scene_catalog(req: https_fn.Request) -> https_fn.Response:
+    """
+    Firebase Function to backfill the catalog fields of already ingested scenes, one page per call
+    (`page_size`, default 500). Pass `next_cursor` back as `cursor` until it is null.
+    """
+    try:
+        params = req.get_json(silent=True) or req.args.to_dict()
+        try:
+            page_size = int(params.get("page_size", BACKFILL_PAGE_SIZE))
+            if not 1 <= page_size <= MAX_BACKFILL_PAGE_SIZE:
+                raise ValueError(f"page_size must be between 1 and {MAX_BACKFILL_PAGE_SIZE}.")
+        except ValueError as e:
+            return https_fn.Response(json.dumps({"error": str(e)}), status=400)
+        return https_fn.Response(json.dumps(backfill_catalog(page_size, params.get("cursor"))), status=200)
+    except Exception as e:
+        log_error_to_firestore(get_firestore_client(), str(e))
         return https_fn.Response(json.dumps({"error": str(e)}), status=500)
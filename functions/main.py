@@ -1,10 +1,13 @@
 from firebase_functions import https_fn
-from landsat_cron import landsat_cron
-from config import firestore_client, bucket
+from config import BUCKET_NAME, PROJECT_ID
+from landsat_cron import landsat_cron, backfill_scene_catalog
 from scaled_image import get_scaled_images
+from rendition_trigger import scale_uploaded_image
 from images_blob_information import get_total_image_size
+from storage_usage import count_uploaded_object, count_deleted_object, reconcile_storage_usage
 from network_information import get_network_traffic
 from firebase_stats import get_firebase_stats
+from scene_search import search_scenes
 
 
 def initialize_application():
@@ -12,14 +15,17 @@ def initialize_application():
     Perform any necessary application-wide initialization here.
     This might include loading additional configuration,
     setting up logging, or verifying dependencies.
+
+    Clients (Earth Engine, Firestore, Storage, Monitoring) are created lazily on first use by `clients`,
+    so nothing is initialized here that an endpoint might not need.
     """
     print("Initializing application...")
-    print(f"Firestore Client: {firestore_client}")
-    print(f"Storage Bucket: {bucket.name}")
+    print(f"Project: {PROJECT_ID}")
+    print(f"Storage Bucket: {BUCKET_NAME}")
 
 
 # Initialize the application
 initialize_application()
 
 # Register functions for deployment
-__all__ = ["landsat_cron", "get_scaled_images", "get_total_image_size", "get_network_traffic", "get_firebase_stats"]  # Explicitly expose the functions for Cloud Functions
+__all__ = ["landsat_cron", "backfill_scene_catalog", "get_scaled_images", "scale_uploaded_image", "get_total_image_size", "count_uploaded_object", "count_deleted_object", "reconcile_storage_usage", "get_network_traffic", "get_firebase_stats", "search_scenes"]  # Explicitly expose the functions for Cloud Functions
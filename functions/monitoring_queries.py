@@ -0,0 +1,136 @@
+import os
+from cache import TTLCache
+from clients import get_async_monitoring_client, get_monitoring_client
+from config import PROJECT_ID
+from tracing import span
+
+# Seconds aggregated metric values are reused across requests
+METRICS_CACHE_TTL = float(os.getenv("METRICS_CACHE_TTL", "60"))
+
+# Cloud Monitoring requires alignment periods of at least 60 seconds
+MIN_ALIGNMENT_PERIOD = 60
+
+_metrics_cache = TTLCache(METRICS_CACHE_TTL)
+
+
+def _cache_key(kind, metric_type, start_time, end_time):
+    return kind, metric_type, int(start_time.timestamp()), int(end_time.timestamp())
+
+
+def _time_series_request(metric_filter, start_time, end_time, aligner, reducer, alignment_period=None):
+    from google.cloud import monitoring_v3
+
+    start_seconds, end_seconds = int(start_time.timestamp()), int(end_time.timestamp())
+    if alignment_period is None:
+        alignment_period = max(MIN_ALIGNMENT_PERIOD, end_seconds - start_seconds)
+
+    aggregation = monitoring_v3.Aggregation(
+        {
+            "alignment_period": {"seconds": alignment_period},
+            "per_series_aligner": aligner,
+            "cross_series_reducer": reducer,
+        }
+    )
+    return {
+        "name": f"projects/{PROJECT_ID}",
+        "filter": metric_filter,
+        "interval": {"start_time": {"seconds": start_seconds}, "end_time": {"seconds": end_seconds}},
+        "aggregation": aggregation,
+        "view": monitoring_v3.ListTimeSeriesRequest.TimeSeriesView.FULL,
+    }
+
+
+def list_aggregated_series(metric_filter, start_time, end_time, aligner, reducer, alignment_period=None):
+    """
+    List the time series matching `metric_filter` between two datetimes, aligned and reduced server-side
+    so only pre-aggregated points are returned.
+
+    Without `alignment_period` the whole interval is a single alignment period.
+    """
+    request = _time_series_request(metric_filter, start_time, end_time, aligner, reducer, alignment_period)
+    return get_monitoring_client().list_time_series(request=request)
+
+
+async def list_aggregated_series_async(metric_filter, start_time, end_time, aligner, reducer,
+                                       alignment_period=None):
+    """`list_aggregated_series` through the asyncio client; returns the list of series of every page."""
+    request = _time_series_request(metric_filter, start_time, end_time, aligner, reducer, alignment_period)
+    pager = await get_async_monitoring_client().list_time_series(request=request)
+    return [series async for series in pager]
+
+
+def _query(kind):
+    """Return the aligner, reducer and summary function of a metric query kind (`sum` or `distribution`)."""
+    from google.cloud import monitoring_v3
+
+    if kind == "sum":
+        return monitoring_v3.Aggregation.Aligner.ALIGN_SUM, monitoring_v3.Aggregation.Reducer.REDUCE_SUM, _sum
+    return (monitoring_v3.Aggregation.Aligner.ALIGN_DELTA, monitoring_v3.Aggregation.Reducer.REDUCE_NONE,
+            _distribution_summary)
+
+
+def _sum(results):
+    return sum(point.value.int64_value for result in results for point in result.points)
+
+
+def _distribution_summary(results):
+    # NumPy is only needed here, so it stays out of the cold start
+    from distributions import merge_distributions, distribution_percentiles
+
+    merged = merge_distributions(point.value.distribution_value for result in results for point in result.points)
+    percentiles = distribution_percentiles(merged)
+    summary = {"count": merged["count"], "mean": merged["mean"]}
+    summary.update({f"p{p}": value for p, value in percentiles.items()})
+    return summary
+
+
+def _get_metric(kind, metric_type, start_time, end_time):
+    aligner, reducer, summarize = _query(kind)
+
+    def compute():
+        # The pager is consumed inside the span so the time of every page request is included
+        with span("monitoring_query"):
+            results = list(list_aggregated_series(f'metric.type="{metric_type}"', start_time, end_time,
+                                                  aligner, reducer))
+        return summarize(results)
+
+    return _metrics_cache.get_or_compute(_cache_key(kind, metric_type, start_time, end_time), compute)
+
+
+async def _get_metric_async(kind, metric_type, start_time, end_time):
+    key = _cache_key(kind, metric_type, start_time, end_time)
+    value = _metrics_cache.get(key)
+    if value is None:
+        aligner, reducer, summarize = _query(kind)
+        with span("monitoring_query"):
+            results = await list_aggregated_series_async(f'metric.type="{metric_type}"', start_time, end_time,
+                                                         aligner, reducer)
+        value = summarize(results)
+        _metrics_cache.set(key, value)
+    return value
+
+
+def get_metric_sum(metric_type, start_time, end_time):
+    """Return the sum of an INT64 DELTA metric over the interval (cached for `METRICS_CACHE_TTL`)."""
+    return _get_metric("sum", metric_type, start_time, end_time)
+
+
+async def get_metric_sum_async(metric_type, start_time, end_time):
+    """`get_metric_sum` through the asyncio client, sharing its cache."""
+    return await _get_metric_async("sum", metric_type, start_time, end_time)
+
+
+def get_metric_distribution(metric_type, start_time, end_time):
+    """
+    Return `{"count", "mean", "p50", "p90", "p99"}` of a DISTRIBUTION DELTA metric over the interval
+    (cached for `METRICS_CACHE_TTL`).
+
+    Each series is aligned server-side into one distribution over the interval; the series are then
+    merged bucket by bucket here, so series with different bucket layouts can be combined.
+    """
+    return _get_metric("distribution", metric_type, start_time, end_time)
+
+
+async def get_metric_distribution_async(metric_type, start_time, end_time):
+    """`get_metric_distribution` through the asyncio client, sharing its cache."""
+    return await _get_metric_async("distribution", metric_type, start_time, end_time)
@@ -1,22 +1,24 @@
-import os
 from firebase_functions import https_fn
-from google.cloud import monitoring_v3
 import datetime
 import json
-from dotenv import load_dotenv
-
-# Load environment variables from .env
-load_dotenv()
-
-# Fetch project ID and bucket name from environment variables
-PROJECT_ID = os.getenv("PROJECT_ID")
-BUCKET_NAME = os.getenv("BUCKET_NAME")
+from config import PROJECT_ID, BUCKET_NAME
+from http_cache import HTTP_CACHE_MAX_AGE, conditional_response, max_age
+from traffic_rollups import GRANULARITIES, days_to_query, get_daily_traffic, is_settled, list_days, read_rollups, \
+    to_series
+from tracing import traced
 
 
 @https_fn.on_request()
+@traced("get_network_traffic")
 def get_network_traffic(request: https_fn.Request) -> https_fn.Response:
     """
     Firebase Function to fetch the 'Sent Bytes' metric for a GCS bucket over a specified date range.
+
+    The optional `granularity` (`day` or `hour`) adds a bucketed `series` of the traffic to the total.
+
+    Responses carry a strong ETag derived from the rollups read for the range, so `If-None-Match` is
+    answered before Cloud Monitoring is queried; ranges of settled days only are served from immutable
+    rollups and may be cached for a day.
     """
     try:
         # Parse the request payload
@@ -50,54 +52,51 @@ def get_network_traffic(request: https_fn.Request) -> https_fn.Response:
                 mimetype="application/json",
             )
 
-        # Define the start and end timestamps
-        start_time = datetime.datetime.combine(start_date, datetime.time.min).isoformat() + "Z"
-        end_time = datetime.datetime.combine(end_date, datetime.time.max).isoformat() + "Z"
+        if start_date > end_date:
+            return https_fn.Response(
+                json.dumps({"error": "start_date must not be later than end_date."}),
+                status=400,
+                mimetype="application/json",
+            )
 
-        # Initialize the Monitoring client
-        client = monitoring_v3.MetricServiceClient()
+        granularity = request_data.get("granularity")
+        if granularity is not None and granularity not in GRANULARITIES:
+            return https_fn.Response(
+                json.dumps({"error": f"Invalid granularity. Use one of: {', '.join(GRANULARITIES)}."}),
+                status=400,
+                mimetype="application/json",
+            )
 
-        # Build the query to fetch the 'Sent Bytes' metric
-        project_name = f"projects/{PROJECT_ID}"
-        interval = monitoring_v3.TimeInterval(
-            {
-                "start_time": start_time,
-                "end_time": end_time,
-            }
-        )
-        filter_query = (
-            f'metric.type="storage.googleapis.com/network/sent_bytes_count" '
-            f'resource.labels.bucket_name="{BUCKET_NAME}"'
-        )
-        results = client.list_time_series(
-            request={
-                "name": project_name,
-                "filter": filter_query,
-                "interval": interval,
-                "view": monitoring_v3.ListTimeSeriesRequest.TimeSeriesView.FULL,
-            }
-        )
+        # Completed days come from their Firestore rollups; only the missing and partial days hit Monitoring
+        now = datetime.datetime.now(datetime.timezone.utc)
+        days = list_days(start_date, end_date, now)
+        rollups = read_rollups(BUCKET_NAME, days, now)
+        queried_days = days_to_query(BUCKET_NAME, days, rollups, now)
 
-        # Sum up the total sent bytes
-        total_sent_bytes = 0
-        for result in results:
-            for point in result.points:
-                total_sent_bytes += point.value.int64_value
+        def compute():
+            daily_traffic = get_daily_traffic(BUCKET_NAME, start_date, end_date, now, rollups)
+            response_data = {
+                "project_id": PROJECT_ID,
+                "bucket_name": BUCKET_NAME,
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "total_sent_bytes": sum(day["total"] or 0 for day in daily_traffic),
+                "rollup_days": sum(day["source"] == "rollup" for day in daily_traffic),
+                "queried_days": sum(day["source"] == "monitoring" for day in daily_traffic),
+                "unavailable_days": sum(day["source"] == "unavailable" for day in daily_traffic),
+            }
+            if granularity:
+                response_data["granularity"] = granularity
+                response_data["series"] = to_series(daily_traffic, granularity, now)
+            return response_data
 
-        # Return the total sent bytes
-        return https_fn.Response(
-            json.dumps(
-                {
-                    "project_id": PROJECT_ID,
-                    "bucket_name": BUCKET_NAME,
-                    "start_date": start_date.isoformat(),
-                    "end_date": end_date.isoformat(),
-                    "total_sent_bytes": total_sent_bytes,
-                }
-            ),
-            status=200,
-            mimetype="application/json",
-        )
+        # Rollups never change; days queried from Monitoring are revalidated once per `HTTP_CACHE_MAX_AGE`
+        validator = ["get_network_traffic", BUCKET_NAME, start_date, end_date, granularity, sorted(rollups),
+                     queried_days]
+        if queried_days:
+            validator.append(int(now.timestamp()) // max(1, HTTP_CACHE_MAX_AGE))
+        settled = all(is_settled(day, now) for day in days)
+        return conditional_response(request, validator, compute, max_age(24 * 3600) if settled else max_age())
 
     except Exception as e:
         return https_fn.Response(
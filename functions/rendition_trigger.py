@@ -0,0 +1,67 @@
+from firebase_functions import storage_fn
+from google.api_core import exceptions
+import os
+from clients import get_storage_client
+from config import BUCKET_NAME
+from image_scaling import RENDITIONS, ImageTooLargeError, check_source_size, get_scaled_blob_name, is_rendition_fresh, \
+    save_renditions
+from tracing import traced
+
+# Renditions generated for every new image (comma separated names from `image_scaling.RENDITIONS`, default all
+# of them, since `get_scaled_images` only serves stored renditions unless `SCALE_MISSING_RENDITIONS` is set)
+TRIGGER_RENDITIONS = [name.strip() for name in os.getenv("TRIGGER_RENDITIONS", ",".join(RENDITIONS)).split(",")
+                      if name.strip()]
+
+
+@storage_fn.on_object_finalized(bucket=BUCKET_NAME)
+@traced("scale_uploaded_image")
+def scale_uploaded_image(event: storage_fn.CloudEvent[storage_fn.StorageObjectData]) -> None:
+    """
+    Firebase Function triggered by uploads to Cloud Storage. Every new PNG in `landsat_images/`
+    is scaled to the `TRIGGER_RENDITIONS` as soon as it lands (decoded once for all of them),
+    so `get_scaled_images` only has to read them.
+
+    The work is keyed on the source generation: retried or duplicated events for a generation that
+    already has its renditions are no-ops, and events for a generation that has since been replaced are skipped.
+    """
+    data = event.data
+    if not data.name.startswith("landsat_images/") or not data.name.endswith(".png"):
+        return
+
+    # The blob built from the event has no size, so the decode budget is checked against the event's
+    try:
+        check_source_size(data.name, int(data.size) if data.size is not None else None)
+    except ImageTooLargeError as e:
+        print(f"Source {data.name}#{data.generation} exceeds the decode budget, skipping: {e}")
+        return
+
+    bucket = get_storage_client().bucket(data.bucket)
+    source_blob = bucket.blob(data.name, generation=data.generation)
+
+    # All renditions of the image share the `scaled_images/{id}_` prefix, so a single listing finds them
+    rendition_prefix = data.name.replace("landsat_images/", "scaled_images/").removesuffix(".png") + "_"
+    existing = {blob.name: blob for blob in bucket.list_blobs(prefix=rendition_prefix)}
+
+    scaled_blobs = {}
+    for rendition in TRIGGER_RENDITIONS:
+        scaled_blob = existing.get(get_scaled_blob_name(data.name, rendition))
+        if not is_rendition_fresh(scaled_blob, source_blob):
+            scaled_blobs[rendition] = scaled_blob
+
+    if not scaled_blobs:
+        print(f"Renditions of {data.name}#{data.generation} already exist, skipping")
+        return
+
+    try:
+        saved = save_renditions(bucket, source_blob, scaled_blobs)
+        for scaled_blob, _ in saved.values():
+            print(f"Saved rendition {scaled_blob.name} for {data.name}#{data.generation}")
+    except exceptions.NotFound:
+        # The source generation was replaced or deleted; the newer event handles it
+        print(f"Source {data.name}#{data.generation} no longer exists, skipping")
+    except exceptions.PreconditionFailed:
+        # Another invocation wrote the rendition concurrently
+        print(f"Renditions of {data.name} were updated concurrently, skipping")
+    except ImageTooLargeError as e:
+        # Retrying can't help; the image has to be shrunk or the budget raised
+        print(f"Source {data.name}#{data.generation} exceeds the decode budget, skipping: {e}")
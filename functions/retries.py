@@ -0,0 +1,202 @@
+import os
+import sys
+import time
+import asyncio
+import random
+import itertools
+import threading
+from dataclasses import dataclass
+import requests
+from google.api_core import exceptions
+from google.api_core.retry import Retry
+
+# Timeout in seconds of a single Cloud Storage request
+GCS_TIMEOUT = float(os.getenv("GCS_TIMEOUT", "60"))
+
+# Every call deposits this fraction of a retry into its policy's budget, so under a persistent outage
+# retries are capped at about this ratio of the calls instead of multiplying the load
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+
+# Retries a policy may spend before any calls have refilled its budget (and its budget cap)
+RETRY_BUDGET_MIN = float(os.getenv("RETRY_BUDGET_MIN", "10"))
+
+# HTTP statuses worth retrying
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Google API and connection errors worth retrying
+RETRYABLE_ERRORS = (
+    exceptions.TooManyRequests,
+    exceptions.InternalServerError,
+    exceptions.BadGateway,
+    exceptions.ServiceUnavailable,
+    exceptions.GatewayTimeout,
+    exceptions.DeadlineExceeded,
+    exceptions.Aborted,
+    exceptions.ResourceExhausted,
+    requests.ConnectionError,
+    requests.Timeout,
+)
+
+_stats_lock = threading.Lock()
+_retry_stats = {}
+
+
+class RetryBudget:
+    """Token bucket limiting the retries of a policy to a ratio of its calls."""
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, minimum=RETRY_BUDGET_MIN):
+        self.ratio = ratio
+        self.maximum = minimum
+        self._tokens = minimum
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.maximum, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """Spend one retry; returns False when the budget is exhausted."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def _count(name, counter, amount=1):
+    with _stats_lock:
+        stats = _retry_stats.setdefault(name, {"calls": 0, "retries": 0, "budget_exhausted": 0, "failures": 0})
+        stats[counter] += amount
+
+
+def get_retry_stats():
+    """Return a copy of the per-policy counters (calls, retries, budget_exhausted, failures) of this instance."""
+    with _stats_lock:
+        return {name: dict(stats) for name, stats in _retry_stats.items()}
+
+
+def is_retryable(error):
+    """
+    Whether an error is transient: a retryable Google API error, connection error or HTTP status, or any
+    error the Cloud Storage library retries by default (broken transfers, urllib3 and auth transport errors).
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRYABLE_STATUSES
+    # httpx is only imported by the async handlers; without it no error can come from it
+    httpx = sys.modules.get("httpx")
+    if httpx is not None:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRYABLE_STATUSES
+        if isinstance(error, httpx.TransportError):
+            return True
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    # The storage library's own predicate is private but covers more transport errors than the list above;
+    # it is imported here so modules using the retry policies don't load the storage library on cold start
+    from google.cloud.storage import retry as storage_retry
+
+    return storage_retry._should_retry(error)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for one kind of external call, sharing a `RetryBudget`.
+
+    `max_attempts` counts the first call; `deadline` bounds the total time spent retrying in seconds.
+    """
+    name: str
+    max_attempts: int = 4
+    initial_delay: float = 0.2
+    max_delay: float = 10.0
+    multiplier: float = 2.0
+    deadline: float = 120.0
+    budget: RetryBudget = None
+
+    def __post_init__(self):
+        if self.budget is None:
+            object.__setattr__(self, "budget", RetryBudget())
+
+    def backoff(self, attempt):
+        """Delay before the retry following the `attempt`-th (0-based) failed attempt."""
+        return random.uniform(0, min(self.max_delay, self.initial_delay * self.multiplier ** attempt))
+
+    def should_retry(self, error):
+        """Count and allow a retry of `error` if it's transient and the budget allows it."""
+        if not is_retryable(error):
+            return False
+        if not self.budget.withdraw():
+            _count(self.name, "budget_exhausted")
+            return False
+        _count(self.name, "retries")
+        return True
+
+    def call(self, function, *args, **kwargs):
+        """Call `function`, retrying transient errors within `max_attempts`, `deadline` and the budget."""
+        _count(self.name, "calls")
+        self.budget.deposit()
+        started = time.monotonic()
+        for attempt in range(self.max_attempts):
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                delay = self.backoff(attempt)
+                out_of_time = time.monotonic() - started + delay > self.deadline
+                if attempt == self.max_attempts - 1 or out_of_time or not self.should_retry(e):
+                    _count(self.name, "failures")
+                    raise
+                time.sleep(delay)
+
+    async def call_async(self, function, *args, **kwargs):
+        """Like `call` for a coroutine function: awaits `function` and sleeps between attempts without blocking."""
+        _count(self.name, "calls")
+        self.budget.deposit()
+        started = time.monotonic()
+        for attempt in range(self.max_attempts):
+            try:
+                return await function(*args, **kwargs)
+            except Exception as e:
+                delay = self.backoff(attempt)
+                out_of_time = time.monotonic() - started + delay > self.deadline
+                if attempt == self.max_attempts - 1 or out_of_time or not self.should_retry(e):
+                    _count(self.name, "failures")
+                    raise
+                await asyncio.sleep(delay)
+
+    def as_api_core_retry(self):
+        """
+        Return an equivalent `google.api_core.retry.Retry` for client library calls that take a `retry`
+        argument (e.g. Cloud Storage uploads and downloads); retries are counted against this policy.
+
+        Build one per call: the predicate counts the failed attempts to enforce `max_attempts`.
+        """
+        attempts = itertools.count(1)
+
+        def predicate(error):
+            if next(attempts) < self.max_attempts and self.should_retry(error):
+                return True
+            _count(self.name, "failures")
+            return False
+
+        return Retry(
+            predicate=predicate,
+            initial=self.initial_delay,
+            maximum=self.max_delay,
+            multiplier=self.multiplier,
+            timeout=self.deadline,
+        )
+
+
+THUMBNAIL_RETRY = RetryPolicy(
+    "earth_engine_thumbnail", max_attempts=int(os.getenv("HTTP_MAX_RETRIES", "3")) + 1, initial_delay=0.5
+)
+GCS_RETRY = RetryPolicy("gcs", max_attempts=int(os.getenv("GCS_MAX_ATTEMPTS", "5")))
+FIRESTORE_RETRY = RetryPolicy("firestore", max_attempts=int(os.getenv("FIRESTORE_MAX_ATTEMPTS", "5")),
+                              initial_delay=0.1, max_delay=5.0)
+
+
+def gcs_options():
+    """Keyword arguments giving a Cloud Storage call the shared timeout and retry policy."""
+    _count(GCS_RETRY.name, "calls")
+    GCS_RETRY.budget.deposit()
+    return {"timeout": GCS_TIMEOUT, "retry": GCS_RETRY.as_api_core_retry()}
@@ -1,36 +1,61 @@
 from firebase_functions import https_fn
-from google.cloud import storage
-from PIL import Image
-import io
-import os
 import json
-import base64
-from dotenv import load_dotenv
+from clients import get_bucket
+from config import BUCKET_NAME
+from image_scaling import iter_scaled_blobs, list_renditions, scale_blobs, RENDITIONS, DEFAULT_RENDITION, \
+    SCALING_MAX_WORKERS
+from signed_urls import sign_url
+from http_cache import NO_STORE, conditional_response
+from tracing import span, traced
 
-# Load environment variables from .env
-load_dotenv()
-
-# Initialize Cloud Storage client
-storage_client = storage.Client()
-
-# Fetch the bucket name from the .env file
-BUCKET_NAME = os.getenv("BUCKET_NAME")
+# Supported ways of delivering the scaled images to the client
+DELIVERY_MODES = ("base64", "path", "signed_url")
 
 
 @https_fn.on_request()
+@traced("get_scaled_images")
 def get_scaled_images(request: https_fn.Request) -> https_fn.Response:
     """
     Firebase Function endpoint to fetch all images from Google Cloud Storage,
     scale them to HD resolution (720p), and return a list of the scaled images.
 
-    1. If `save_to_storage` is True and the image doesn't exist in storage, it will be scaled, saved to storage, and returned as base64.
-    2. If `save_to_storage` is True and the image already exists in storage, it will be retrieved and returned as base64.
+    1. If `save_to_storage` is True and the image already exists in storage, it will be retrieved and returned as base64.
+    2. If `save_to_storage` is True and the image doesn't exist in storage, it is listed in `errors`.
     3. If `save_to_storage` is False, the image will be scaled and returned as base64 without being saved to storage.
+
+    Renditions, paging, streaming, delivery modes and ETags are described in the README.
     """
     try:
         # Parse the JSON request to get optional parameters
         request_data = request.get_json()
         save_to_storage = request_data.get("save_to_storage", False)
+        max_workers = int(request_data.get("max_workers", SCALING_MAX_WORKERS))
+        page_size = int(request_data["page_size"]) if request_data.get("page_size") else None
+        page_token = request_data.get("page_token")
+        stream = request_data.get("stream", False)
+        delivery = request_data.get("delivery", "base64")
+        rendition = request_data.get("rendition", DEFAULT_RENDITION)
+
+        if delivery not in DELIVERY_MODES:
+            return https_fn.Response(
+                json.dumps({"error": f"Invalid delivery. Use one of: {', '.join(DELIVERY_MODES)}."}),
+                status=400,
+                mimetype="application/json"
+            )
+
+        if rendition not in RENDITIONS:
+            return https_fn.Response(
+                json.dumps({"error": f"Invalid rendition. Use one of: {', '.join(RENDITIONS)}."}),
+                status=400,
+                mimetype="application/json"
+            )
+
+        options = {
+            "save_to_storage": save_to_storage,
+            "delivery": delivery,
+            "sign_url": sign_url,
+            "rendition": rendition,
+        }
 
         # Ensure BUCKET_NAME is set in the environment variables
         if not BUCKET_NAME:
@@ -41,68 +66,84 @@ def get_scaled_images(request: https_fn.Request) -> https_fn.Response:
             )
 
         # Connect to the Google Cloud Storage bucket
-        bucket = storage_client.bucket(BUCKET_NAME)
+        bucket = get_bucket()
 
-        # List all blobs (files) in the "landsat_images" folder
-        blobs = list(bucket.list_blobs(prefix="landsat_images/"))
+        # Stream mode: list and scale lazily, writing one NDJSON line per image
+        if stream:
+            blobs = bucket.list_blobs(prefix="landsat_images/", page_size=page_size)
+            return https_fn.Response(
+                stream_scaled_images(bucket, blobs, max_workers, **options),
+                status=200,
+                mimetype="application/x-ndjson"
+            )
+
+        next_page_token = None
+        if page_size:
+            # Paginated mode: only fetch and scale a single page of the listing
+            with span("list_images"):
+                iterator = bucket.list_blobs(prefix="landsat_images/", page_size=page_size, page_token=page_token)
+                blobs = list(next(iterator.pages, []))
+                next_page_token = iterator.next_page_token
+        else:
+            # List all blobs (files) in the "landsat_images" folder
+            with span("list_images"):
+                blobs = list(bucket.list_blobs(prefix="landsat_images/"))
 
         # If no images are found, return an error response
-        if not blobs:
+        if not blobs and not page_token:
             return https_fn.Response(
                 json.dumps({"error": "No images found in the bucket"}),
                 status=404,
                 mimetype="application/json"
             )
 
-        scaled_images = []
-
-        for blob in blobs:
-            # Skip files that do not end with ".png"
-            if not blob.name.endswith(".png"):
-                continue
-
-            # Generate the corresponding scaled image name
-            scaled_blob_name = blob.name.replace("landsat_images/", "scaled_images/")
-            scaled_blob_name = scaled_blob_name.replace(".png", "_hd.png")
-            scaled_blob = bucket.blob(scaled_blob_name)
-
-            if save_to_storage:
-                if scaled_blob.exists():
-                    # Case 2: If the scaled image exists in storage, fetch and return it
-                    scaled_image_data = scaled_blob.download_as_bytes()
-                    scaled_images.append(base64.b64encode(scaled_image_data).decode("utf-8"))
-                else:
-                    # Case 1: Scale, save to storage, and return as base64
-                    image_data = blob.download_as_bytes()
-                    with Image.open(io.BytesIO(image_data)) as img:
-                        resolution = (1280, 720)
-                        img_resized = img.resize(resolution, Image.Resampling.LANCZOS)
-
-                        output = io.BytesIO()
-                        img_resized.save(output, format="PNG")
-                        output.seek(0)
-
-                        scaled_blob.upload_from_file(output, content_type="image/png")
-                        scaled_images.append(base64.b64encode(output.getvalue()).decode("utf-8"))
-            else:
-                # Case 3: Scale and return as base64 without saving to storage
-                image_data = blob.download_as_bytes()
-                with Image.open(io.BytesIO(image_data)) as img:
-                    resolution = (1280, 720)
-                    img_resized = img.resize(resolution, Image.Resampling.LANCZOS)
-
-                    output = io.BytesIO()
-                    img_resized.save(output, format="PNG")
-                    output.seek(0)
-
-                    scaled_images.append(base64.b64encode(output.getvalue()).decode("utf-8"))
-
-        # Return the scaled images as base64 strings in JSON format
-        return https_fn.Response(
-            json.dumps({"message": "Images scaled successfully", "scaled_images": scaled_images}),
-            status=200,
-            mimetype="application/json"
-        )
+        # Find existing renditions with one listing instead of one existence check per image
+        renditions = None
+        if save_to_storage or delivery != "base64":
+            renditions = options["renditions"] = list_renditions(bucket, blobs if page_size else None, rendition)
+
+        def scale():
+            # Scale the images concurrently; images that fail are reported instead of failing the request
+            scaled_images, errors = scale_blobs(bucket, blobs, max_workers, **options)
+
+            response_data = {
+                "message": "Images scaled successfully",
+                "content_type": RENDITIONS[rendition].content_type,
+                "scaled_images": scaled_images,
+                "errors": errors,
+            }
+            if page_size:
+                response_data["next_page_token"] = next_page_token
+            return response_data
+
+        # Signed URLs expire, so these responses are neither validated nor cached
+        if delivery == "signed_url":
+            return https_fn.Response(
+                json.dumps(scale()),
+                status=200,
+                mimetype="application/json",
+                headers={"Cache-Control": NO_STORE}
+            )
+
+        # The response only changes with the generations of the source images and stored renditions
+        validator = [
+            "get_scaled_images", RENDITIONS[rendition], delivery, save_to_storage, page_size, page_token,
+            next_page_token, [(blob.name, blob.generation) for blob in blobs],
+        ]
+        if renditions is not None:
+            validator.append(sorted((name, scaled_blob.generation) for name, scaled_blob in renditions.items()))
+
+        def cacheable(response_data):
+            if response_data["errors"]:
+                return False
+            if delivery == "base64":
+                return True
+            # Renditions scaled by this request have generations the validator doesn't know yet
+            listed = {name: scaled_blob.generation for name, scaled_blob in renditions.items()}
+            return all(listed.get(image["path"]) == image["generation"] for image in response_data["scaled_images"])
+
+        # Return the scaled images (base64 strings or storage references) in JSON format
+        return conditional_response(request, validator, scale, cacheable=cacheable)
 
     except Exception as e:
         # Handle unexpected errors and return an error response
@@ -111,3 +152,12 @@ def get_scaled_images(request: https_fn.Request) -> https_fn.Response:
             status=500,
             mimetype="application/json"
         )
+
+
+def stream_scaled_images(bucket, blobs, max_workers, **options):
+    """Yield one NDJSON line per scaled image so only the images in flight are held in memory."""
+    for blob_name, scaled_image, error in iter_scaled_blobs(bucket, blobs, max_workers, **options):
+        if error is None:
+            yield json.dumps({"image": blob_name, "scaled_image": scaled_image}) + "\n"
+        else:
+            yield json.dumps({"image": blob_name, "error": error}) + "\n"
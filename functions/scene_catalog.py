@@ -0,0 +1,184 @@
+import base64
+import json
+import math
+from datetime import datetime, timezone
+
+# Length of the footprint centroid geohash stored per scene (6 characters is about 1.2 x 0.6 km)
+GEOHASH_PRECISION = 6
+
+# Length of the geohash cells covering the footprint, matched by location searches (4 characters is about
+# 39 x 20 km, so a 185 km Landsat scene covers on the order of a hundred cells)
+GEOHASH_COVER_PRECISION = 4
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Typed catalog fields returned by `search_scenes` when no `fields` are requested
+DEFAULT_FIELDS = ["id", "acquired_at", "cloud_cover", "wrs_path", "wrs_row", "geohash", "spacecraft"]
+
+# Fields that may be requested with `fields`
+SELECTABLE_FIELDS = DEFAULT_FIELDS + ["type", "location", "properties"]
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Return the geohash of a point, e.g. `u0k` for Lausanne at precision 3."""
+    latitude_range, longitude_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits, bit_count, even = 0, 0, True
+    while len(geohash) < precision:
+        value_range, value = (longitude_range, longitude) if even else (latitude_range, latitude)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(geohash)
+
+
+def _parse_position(position):
+    # Flattened metadata stores positions as "lon,lat" strings
+    if isinstance(position, str):
+        position = position.split(",")
+    return float(position[0]), float(position[1])
+
+
+def footprint_positions(footprint):
+    """
+    Return the `(longitude, latitude)` vertices of a `system:footprint` (GeoJSON LinearRing or Polygon)
+    without the closing vertex of the ring.
+    """
+    footprint = footprint or {}
+    coordinates = footprint.get("coordinates") or []
+    if footprint.get("type") == "Polygon" and coordinates:
+        coordinates = coordinates[0]
+    positions = [_parse_position(position) for position in coordinates]
+    if len(positions) > 1 and positions[0] == positions[-1]:
+        positions = positions[:-1]
+    return positions
+
+
+def footprint_centroid(footprint):
+    """Return the `(longitude, latitude)` vertex centroid of a footprint, or None when it has no coordinates."""
+    positions = footprint_positions(footprint)
+    if not positions:
+        return None
+    return (sum(lon for lon, _ in positions) / len(positions), sum(lat for _, lat in positions) / len(positions))
+
+
+def _point_in_ring(longitude, latitude, ring):
+    inside = False
+    for (lon_a, lat_a), (lon_b, lat_b) in zip(ring, ring[1:] + ring[:1]):
+        if (lat_a > latitude) != (lat_b > latitude):
+            if longitude < lon_a + (latitude - lat_a) * (lon_b - lon_a) / (lat_b - lat_a):
+                inside = not inside
+    return inside
+
+
+def _segment_crosses_box(start, end, box):
+    # Liang-Barsky clipping of the segment against the box
+    west, south, east, north = box
+    low, high = 0.0, 1.0
+    delta_lon, delta_lat = end[0] - start[0], end[1] - start[1]
+    for direction, distance in ((-delta_lon, start[0] - west), (delta_lon, east - start[0]),
+                                (-delta_lat, start[1] - south), (delta_lat, north - start[1])):
+        if direction == 0:
+            if distance < 0:
+                return False
+            continue
+        ratio = distance / direction
+        if direction < 0:
+            low = max(low, ratio)
+        else:
+            high = min(high, ratio)
+        if low > high:
+            return False
+    return True
+
+
+def _ring_intersects_box(ring, box):
+    west, south, east, north = box
+    if any(west <= lon <= east and south <= lat <= north for lon, lat in ring):
+        return True
+    if _point_in_ring((west + east) / 2, (south + north) / 2, ring):
+        return True
+    return any(_segment_crosses_box(start, end, box) for start, end in zip(ring, ring[1:] + ring[:1]))
+
+
+def geohash_cover(footprint, precision=GEOHASH_COVER_PRECISION):
+    """Return the sorted geohash cells of length `precision` that a footprint overlaps."""
+    ring = footprint_positions(footprint)
+    if not ring:
+        return []
+    if max(lon for lon, _ in ring) - min(lon for lon, _ in ring) > 180:
+        # The footprint crosses the antimeridian: work in 0-360 longitudes, encode in -180-180
+        ring = [(lon + 360 if lon < 0 else lon, lat) for lon, lat in ring]
+
+    # Even bits of a geohash split longitudes, odd bits latitudes
+    lon_step = 360 / 2 ** ((5 * precision + 1) // 2)
+    lat_step = 180 / 2 ** (5 * precision // 2)
+    west, east = min(lon for lon, _ in ring), max(lon for lon, _ in ring)
+    south, north = min(lat for _, lat in ring), max(lat for _, lat in ring)
+    last_row = round(180 / lat_step) - 1
+
+    cells = set()
+    for column in range(math.floor((west + 180) / lon_step), math.floor((east + 180) / lon_step) + 1):
+        for row in range(math.floor((south + 90) / lat_step), min(math.floor((north + 90) / lat_step), last_row) + 1):
+            box = (-180 + column * lon_step, -90 + row * lat_step,
+                   -180 + (column + 1) * lon_step, -90 + (row + 1) * lat_step)
+            if _ring_intersects_box(ring, box):
+                center_lon = (box[0] + box[2]) / 2
+                center_lon = center_lon - 360 if center_lon >= 180 else center_lon
+                cells.add(encode_geohash((box[1] + box[3]) / 2, center_lon, precision))
+    return sorted(cells)
+
+
+def extract_catalog_fields(properties):
+    """
+    Extract the typed, indexed catalog fields of a scene from its Earth Engine properties: `acquired_at`,
+    `cloud_cover`, `wrs_path`, `wrs_row`, `spacecraft`, the `geohash` of the footprint centroid, and in
+    `geohash_prefixes` the cells of `geohash_cover` with all of their prefixes, so a point's cell of any
+    length up to `GEOHASH_COVER_PRECISION` is matched with `array_contains`. Properties missing from the
+    scene are left out.
+    """
+    fields = {}
+    if properties.get("system:time_start") is not None:
+        fields["acquired_at"] = datetime.fromtimestamp(properties["system:time_start"] / 1000, tz=timezone.utc)
+    if properties.get("CLOUD_COVER") is not None:
+        fields["cloud_cover"] = float(properties["CLOUD_COVER"])
+    if properties.get("WRS_PATH") is not None:
+        fields["wrs_path"] = int(properties["WRS_PATH"])
+    if properties.get("WRS_ROW") is not None:
+        fields["wrs_row"] = int(properties["WRS_ROW"])
+    if properties.get("SPACECRAFT_ID"):
+        fields["spacecraft"] = properties["SPACECRAFT_ID"]
+
+    footprint = properties.get("system:footprint")
+    centroid = footprint_centroid(footprint)
+    if centroid is not None:
+        fields["geohash"] = encode_geohash(centroid[1], centroid[0])
+        fields["geohash_prefixes"] = sorted({
+            cell[:length] for cell in geohash_cover(footprint) for length in range(1, len(cell) + 1)
+        })
+    return fields
+
+
+def encode_cursor(values):
+    """Encode the order-by values of the last returned scene as an opaque cursor."""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from `encode_cursor`; the first value is the `acquired_at` timestamp."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        values[0] = datetime.fromisoformat(values[0])
+        return values
+    except (ValueError, TypeError, IndexError) as e:
+        raise ValueError("Invalid cursor.") from e
@@ -0,0 +1,148 @@
+from firebase_functions import https_fn
+import json
+from datetime import datetime, timedelta, timezone
+from clients import get_firestore_client
+from scene_catalog import DEFAULT_FIELDS, SELECTABLE_FIELDS, GEOHASH_COVER_PRECISION, encode_geohash, \
+    encode_cursor, decode_cursor
+from tracing import span, traced
+
+# Scenes returned per page by default, and at most
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _error(message, status=400):
+    return https_fn.Response(json.dumps({"error": message}), status=status, mimetype="application/json")
+
+
+def _to_json(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def build_scene_query(filters, fields, page_size, cursor=None):
+    """
+    Build the catalog query over `landsat_metadata`, newest scenes first.
+
+    Every combination of filters is served by one composite index of `firestore.indexes.json`: equality
+    filters (`geohash_prefixes`, or `wrs_path`/`wrs_row`) come first, then the `acquired_at` range and
+    an optional `cloud_cover` upper bound. Returns the query and the order-by fields used by the cursor.
+    """
+    from google.cloud.firestore import FieldFilter, Query
+
+    query = get_firestore_client().collection("landsat_metadata")
+    if filters.get("geohash"):
+        query = query.where(filter=FieldFilter("geohash_prefixes", "array_contains", filters["geohash"]))
+    for field in ("wrs_path", "wrs_row"):
+        if filters.get(field) is not None:
+            query = query.where(filter=FieldFilter(field, "==", filters[field]))
+    if filters.get("start"):
+        query = query.where(filter=FieldFilter("acquired_at", ">=", filters["start"]))
+    if filters.get("end"):
+        query = query.where(filter=FieldFilter("acquired_at", "<", filters["end"]))
+    if filters.get("max_cloud_cover") is not None:
+        query = query.where(filter=FieldFilter("cloud_cover", "<=", filters["max_cloud_cover"]))
+
+    order = [("acquired_at", Query.DESCENDING)]
+    if filters.get("max_cloud_cover") is not None:
+        # Every inequality field must be ordered on
+        order.append(("cloud_cover", Query.ASCENDING))
+    order.append(("__name__", Query.DESCENDING))
+    for field, direction in order:
+        query = query.order_by(field, direction=direction)
+
+    # The ordered fields are always projected so the next cursor can be built from the last scene
+    order_fields = [field for field, _ in order]
+    query = query.select(sorted(set(fields) | set(order_fields[:-1])))
+    if cursor:
+        query = query.start_after(dict(zip(order_fields, cursor)))
+    return query.limit(page_size + 1), order_fields
+
+
+def parse_filters(params):
+    """Turn the request parameters into query filters; raises ValueError on invalid values."""
+    filters = {}
+    if params.get("start_date"):
+        filters["start"] = datetime.strptime(params["start_date"], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    if params.get("end_date"):
+        # The end date is inclusive
+        end = datetime.strptime(params["end_date"], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        filters["end"] = end + timedelta(days=1)
+    if params.get("max_cloud_cover") is not None:
+        filters["max_cloud_cover"] = float(params["max_cloud_cover"])
+    for field in ("wrs_path", "wrs_row"):
+        if params.get(field) is not None:
+            filters[field] = int(params[field])
+
+    if params.get("near"):
+        near = params["near"]
+        longitude, latitude = (near.split(",") if isinstance(near, str) else near)[:2]
+        precision = int(params.get("precision", GEOHASH_COVER_PRECISION))
+        if not 1 <= precision <= GEOHASH_COVER_PRECISION:
+            raise ValueError(f"precision must be between 1 and {GEOHASH_COVER_PRECISION}.")
+        # Matches every scene whose footprint overlaps the point's cell
+        filters["geohash"] = encode_geohash(float(latitude), float(longitude), precision)
+    elif params.get("geohash"):
+        filters["geohash"] = params["geohash"][:GEOHASH_COVER_PRECISION]
+
+    if filters.get("wrs_row") is not None and filters.get("wrs_path") is None:
+        raise ValueError("wrs_row requires wrs_path.")
+    if filters.get("geohash") and filters.get("wrs_path") is not None:
+        raise ValueError("Filter by geohash/near or by wrs_path/wrs_row, not both.")
+    return filters
+
+
+@https_fn.on_request()
+@traced("search_scenes")
+def search_scenes(request: https_fn.Request) -> https_fn.Response:
+    """
+    Firebase Function to search the Landsat scene catalog (`landsat_metadata`), newest scenes first.
+
+    Filters (JSON body or query parameters): `start_date`/`end_date` (YYYY-MM-DD, inclusive),
+    `max_cloud_cover`, `wrs_path` (and `wrs_row`), and either `near` (`[lon, lat]` with a geohash
+    `precision`, default 4) or a `geohash` cell, matching the scenes whose footprint overlaps the cell.
+    Each page is a single indexed query: pass `next_cursor` back as `cursor` for the following page.
+    `fields` limits the returned fields (default: the typed catalog fields).
+    """
+    try:
+        params = request.get_json(silent=True) or request.args.to_dict()
+
+        try:
+            filters = parse_filters(params)
+            page_size = int(params.get("page_size", DEFAULT_PAGE_SIZE))
+            if not 1 <= page_size <= MAX_PAGE_SIZE:
+                raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}.")
+            cursor = decode_cursor(params["cursor"]) if params.get("cursor") else None
+        except ValueError as e:
+            return _error(str(e))
+
+        fields = params.get("fields") or DEFAULT_FIELDS
+        if isinstance(fields, str):
+            fields = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in SELECTABLE_FIELDS]
+        if unknown:
+            return _error(f"Unknown fields: {', '.join(unknown)}. Use any of: {', '.join(SELECTABLE_FIELDS)}.")
+
+        query, order_fields = build_scene_query(filters, fields, page_size, cursor)
+        with span("catalog_query"):
+            snapshots = list(query.stream())
+
+        next_cursor = None
+        if len(snapshots) > page_size:
+            snapshots = snapshots[:page_size]
+            last = snapshots[-1]
+            next_cursor = encode_cursor([last.id if field == "__name__" else last.get(field) for field in order_fields])
+
+        scenes = []
+        for snapshot in snapshots:
+            data = snapshot.to_dict()
+            scene = {"id": snapshot.id}
+            scene.update({field: _to_json(data.get(field)) for field in fields if field != "id"})
+            scenes.append(scene)
+
+        return https_fn.Response(
+            json.dumps({"scenes": scenes, "count": len(scenes), "next_cursor": next_cursor}),
+            status=200,
+            mimetype="application/json",
+        )
+    except Exception as e:
+        return _error(str(e), status=500)
@@ -0,0 +1,64 @@
+import os
+import datetime
+import threading
+from urllib.parse import quote
+from clients import get_url_signer
+
+# Lifetime of the signed URLs handed out to clients
+SIGNED_URL_EXPIRATION_MINUTES = int(os.getenv("SIGNED_URL_EXPIRATION_MINUTES", "15"))
+
+
+class UrlSigner:
+    """
+    Creates V4 signed URLs with the default credentials. When they cannot sign locally (e.g. the Cloud
+    Functions compute identity), `generate_signed_url` signs through the IAM `signBlob` API with a
+    token that is refreshed here, once for all concurrent requests.
+    """
+
+    def __init__(self):
+        self._credentials = None
+        self._lock = threading.Lock()
+
+    def _signing_kwargs(self):
+        from google.auth import credentials as auth_credentials
+
+        with self._lock:
+            if self._credentials is None:
+                import google.auth
+                self._credentials, _ = google.auth.default()
+            credentials = self._credentials
+            if isinstance(credentials, auth_credentials.Signing):
+                return {}
+            if not credentials.valid:
+                from google.auth.transport import requests as auth_requests
+                credentials.refresh(auth_requests.Request())
+            return {"service_account_email": credentials.service_account_email, "access_token": credentials.token}
+
+    def sign(self, blob, expiration):
+        """Return a V4 signed GET URL of `blob`, pinned to its generation and valid for `expiration`."""
+        return blob.generate_signed_url(
+            version="v4",
+            expiration=expiration,
+            method="GET",
+            generation=blob.generation,
+            **self._signing_kwargs(),
+        )
+
+
+def sign_url(blob):
+    """
+    Return a URL the client can use to download `blob` directly from storage.
+
+    Against the storage emulator (`STORAGE_EMULATOR_HOST`) a plain emulator download URL is returned,
+    so the delivery mode works offline; otherwise the URL is signed by the registered signer (`UrlSigner`
+    unless a local fake was registered with `clients.override_client("url_signer", ...)`), valid for
+    `SIGNED_URL_EXPIRATION_MINUTES`.
+    """
+    emulator_host = os.getenv("STORAGE_EMULATOR_HOST")
+    if emulator_host:
+        url = f"{emulator_host.rstrip('/')}/v0/b/{blob.bucket.name}/o/{quote(blob.name, safe='')}?alt=media"
+        if blob.generation:
+            url += f"&generation={blob.generation}"
+        return url
+
+    return get_url_signer().sign(blob, datetime.timedelta(minutes=SIGNED_URL_EXPIRATION_MINUTES))
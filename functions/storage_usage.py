@@ -0,0 +1,153 @@
+import asyncio
+import datetime
+from firebase_functions import scheduler_fn, storage_fn
+from clients import get_async_firestore_client, get_bucket, get_firestore_client
+from config import BUCKET_NAME
+from tracing import span, traced
+
+# Firestore collection holding one usage aggregate (count, total bytes, last update) per top-level folder
+USAGE_COLLECTION = "storage_usage"
+
+
+def get_folder(blob_name):
+    """Return the top-level folder prefix of a blob (e.g. `landsat_images/`), or "" for root objects."""
+    return blob_name.split("/", 1)[0] + "/" if "/" in blob_name else ""
+
+
+def _usage_document_id(folder):
+    return folder.rstrip("/").replace("/", "_") or "_root"
+
+
+def get_usage_ref(folder):
+    """Return the Firestore document holding the usage aggregate of a top-level folder."""
+    return get_firestore_client().collection(USAGE_COLLECTION).document(_usage_document_id(folder))
+
+
+def sum_prefix(bucket, prefix):
+    """
+    Count the objects under `prefix` and sum their sizes page by page, without materializing the listing.
+    Only names and sizes are requested.
+    """
+    count = 0
+    total_bytes = 0
+    blobs = bucket.list_blobs(prefix=prefix, fields="items(name,size),nextPageToken")
+    for page in blobs.pages:
+        for blob in page:
+            count += 1
+            total_bytes += blob.size or 0
+    return count, total_bytes
+
+
+def get_usage(folder, fresh=False):
+    """
+    Return `{"folder", "count", "total_bytes", "updated_at", "source"}` for a folder prefix.
+
+    The materialized aggregate is read with a single document read. Prefixes that aren't top-level
+    folders, folders without an aggregate yet and `fresh` requests fall back to a streaming listing.
+    """
+    if not fresh and folder and get_folder(folder) == folder:
+        with span("usage_read"):
+            snapshot = get_usage_ref(folder).get()
+        if snapshot.exists:
+            return _indexed_usage(folder, snapshot.to_dict())
+
+    with span("usage_listing"):
+        count, total_bytes = sum_prefix(get_bucket(), folder)
+    return _listed_usage(folder, count, total_bytes)
+
+
+async def get_usage_async(folder, fresh=False):
+    """
+    `get_usage` for the async handlers: the aggregate is read with the asyncio Firestore client, and the
+    listing fallback (Cloud Storage has no asyncio client) runs on a worker thread.
+    """
+    if not fresh and folder and get_folder(folder) == folder:
+        reference = get_async_firestore_client().collection(USAGE_COLLECTION).document(_usage_document_id(folder))
+        with span("usage_read"):
+            snapshot = await reference.get()
+        if snapshot.exists:
+            return _indexed_usage(folder, snapshot.to_dict())
+
+    with span("usage_listing"):
+        count, total_bytes = await asyncio.to_thread(sum_prefix, get_bucket(), folder)
+    return _listed_usage(folder, count, total_bytes)
+
+
+def _indexed_usage(folder, usage):
+    updated_at = usage.get("updated_at")
+    return {
+        "folder": folder,
+        "count": usage.get("count", 0),
+        "total_bytes": usage.get("total_bytes", 0),
+        "updated_at": updated_at.isoformat() if updated_at else None,
+        "source": "index",
+    }
+
+
+def _listed_usage(folder, count, total_bytes):
+    return {
+        "folder": folder,
+        "count": count,
+        "total_bytes": total_bytes,
+        "updated_at": datetime.datetime.utcnow().isoformat(),
+        "source": "listing",
+    }
+
+
+def _apply_delta(object_name, count, size):
+    """Increment the aggregate of the object's folder by `count` objects and `size` bytes."""
+    from google.cloud.firestore import Increment, SERVER_TIMESTAMP
+
+    folder = get_folder(object_name)
+    get_usage_ref(folder).set(
+        {
+            "folder": folder,
+            "count": Increment(count),
+            "total_bytes": Increment(size),
+            "updated_at": SERVER_TIMESTAMP,
+        },
+        merge=True,
+    )
+
+
+@storage_fn.on_object_finalized(bucket=BUCKET_NAME)
+def count_uploaded_object(event: storage_fn.CloudEvent[storage_fn.StorageObjectData]) -> None:
+    """Add every new object (or new generation of an object) to the usage aggregate of its folder."""
+    _apply_delta(event.data.name, 1, int(event.data.size or 0))
+
+
+@storage_fn.on_object_deleted(bucket=BUCKET_NAME)
+def count_deleted_object(event: storage_fn.CloudEvent[storage_fn.StorageObjectData]) -> None:
+    """Remove deleted (or overwritten) objects from the usage aggregate of their folder."""
+    _apply_delta(event.data.name, -1, -int(event.data.size or 0))
+
+
+@scheduler_fn.on_schedule(schedule="every 24 hours")
+@traced("reconcile_storage_usage")
+def reconcile_storage_usage(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    Recompute the usage aggregates of every top-level folder from a full streaming listing, correcting
+    drift from duplicated or lost storage events.
+    """
+    from google.cloud.firestore import SERVER_TIMESTAMP
+
+    usage = {}
+    for page in get_bucket().list_blobs(fields="items(name,size),nextPageToken").pages:
+        for blob in page:
+            folder_usage = usage.setdefault(get_folder(blob.name), [0, 0])
+            folder_usage[0] += 1
+            folder_usage[1] += blob.size or 0
+
+    # Folders that no longer have any objects are reset too
+    for snapshot in get_firestore_client().collection(USAGE_COLLECTION).stream():
+        usage.setdefault(snapshot.get("folder"), [0, 0])
+
+    for folder, (count, total_bytes) in usage.items():
+        get_usage_ref(folder).set({
+            "folder": folder,
+            "count": count,
+            "total_bytes": total_bytes,
+            "updated_at": SERVER_TIMESTAMP,
+            "reconciled_at": SERVER_TIMESTAMP,
+        })
+        print(f"Reconciled {folder or '/'}: {count} objects, {total_bytes} bytes")
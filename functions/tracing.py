@@ -0,0 +1,171 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+import functools
+
+# Record per-stage timings, counters and byte totals of every traced invocation
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+
+# Also return the stage timings of traced HTTP endpoints in a `Server-Timing` response header
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+# Trace of the invocation being handled, propagated to worker threads by `submit`
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+class Trace:
+    """
+    Stage timings, counters and byte totals of one invocation.
+
+    A stage's time is the sum over all of its spans, so stages running on several threads can add up
+    to more than the wall-clock duration.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage, seconds):
+        with self._lock:
+            count, total = self.stages.get(stage, (0, 0.0))
+            self.stages[stage] = count + 1, total + seconds
+
+    def count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "trace": self.name,
+                "duration_ms": round((time.perf_counter() - self.started) * 1000, 2),
+                "stages": {
+                    stage: {"count": count, "total_ms": round(total * 1000, 2)}
+                    for stage, (count, total) in self.stages.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def server_timing(self):
+        """Return the `Server-Timing` header value, e.g. `download;dur=12.5, total;dur=80.1`."""
+        with self._lock:
+            metrics = [f"{stage};dur={total * 1000:.1f}" for stage, (_, total) in self.stages.items()]
+        metrics.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+class _Span:
+    __slots__ = ("trace", "stage", "started")
+
+    def __init__(self, trace, stage):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.add_stage(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage):
+    """Time a block as `stage` of the current trace: `with span("download"): ...`. A no-op when not tracing."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, stage)
+
+
+def count(counter, amount=1):
+    """Add `amount` to a counter of the current trace (e.g. images scaled)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count(counter, amount)
+
+
+def add_bytes(stage, amount):
+    """Add `amount` to the byte total of a stage of the current trace (`<stage>_bytes`)."""
+    trace = _current_trace.get()
+    if trace is not None and amount:
+        trace.count(f"{stage}_bytes", amount)
+
+
+def submit(executor, function, *args, **kwargs):
+    """`executor.submit` that runs `function` in a copy of the current context, so it records into the same trace."""
+    return executor.submit(contextvars.copy_context().run, function, *args, **kwargs)
+
+
+def get_logger():
+    """Return the logger writing traces as structured JSON logs (picked up by Cloud Logging from stdout)."""
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            from google.cloud.logging.handlers import StructuredLogHandler
+
+            _logger = logging.getLogger("traces")
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+            _logger.addHandler(StructuredLogHandler())
+        return _logger
+
+
+def emit(trace, **fields):
+    """Write a finished trace as one structured log entry."""
+    payload = trace.to_dict()
+    payload.update(fields)
+    get_logger().info(f"{trace.name} finished in {payload['duration_ms']} ms", extra={"json_fields": payload})
+
+
+def traced(name):
+    """
+    Decorator tracing every invocation of a function (an HTTP endpoint or an event trigger) as `name`.
+
+    When the function returns a response, its status is logged and, with `SERVER_TIMING_ENABLED`, the
+    stage timings are added as a `Server-Timing` header; for streamed responses only the work done before
+    the response is returned is included. Without `TRACING_ENABLED` the function is returned unchanged.
+    """
+    def decorator(function):
+        if not TRACING_ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            trace = Trace(name)
+            token = _current_trace.set(trace)
+            response = None
+            try:
+                response = function(*args, **kwargs)
+                return response
+            finally:
+                _current_trace.reset(token)
+                status = getattr(response, "status_code", None)
+                if SERVER_TIMING_ENABLED and status is not None:
+                    response.headers["Server-Timing"] = trace.server_timing()
+                emit(trace, status=status)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,199 @@
+import os
+import datetime
+from clients import get_firestore_client
+from firestore_writes import write_documents
+from monitoring_queries import MIN_ALIGNMENT_PERIOD, list_aggregated_series
+from tracing import span
+
+# Firestore collection holding one immutable rollup (total and 24 hourly sums) per bucket and completed day
+ROLLUP_COLLECTION = "network_traffic_rollups"
+
+SENT_BYTES_METRIC = "storage.googleapis.com/network/sent_bytes_count"
+
+# Monitoring ingests points with a delay, so a day is only rolled up once it ended this many seconds ago
+ROLLUP_SETTLE_SECONDS = int(os.getenv("TRAFFIC_ROLLUP_SETTLE_SECONDS", "3600"))
+
+# Days Cloud Monitoring keeps storage metrics for; older days without a rollup are reported as unavailable
+MONITORING_RETENTION_DAYS = int(os.getenv("MONITORING_RETENTION_DAYS", "42"))
+
+GRANULARITIES = ("day", "hour")
+
+ONE_DAY = datetime.timedelta(days=1)
+ONE_HOUR = datetime.timedelta(hours=1)
+
+
+def _day_start(day):
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
+
+
+def get_rollup_id(bucket_name, day):
+    return f"{bucket_name}_{day.isoformat()}"
+
+
+def _hour_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _fetch_aligned(bucket_name, start_time, end_time, alignment_period, hourly):
+    from google.cloud import monitoring_v3
+
+    results = list_aggregated_series(
+        f'metric.type="{SENT_BYTES_METRIC}" resource.labels.bucket_name="{bucket_name}"',
+        start_time,
+        end_time,
+        monitoring_v3.Aggregation.Aligner.ALIGN_SUM,
+        monitoring_v3.Aggregation.Reducer.REDUCE_SUM,
+        alignment_period=alignment_period,
+    )
+    for result in results:
+        for point in result.points:
+            # An aligned point is stamped with the end of its period
+            point_end = point.interval.end_time.astimezone(datetime.timezone.utc)
+            hour = _hour_start(point_end - datetime.timedelta(seconds=1))
+            hourly[hour] = hourly.get(hour, 0) + point.value.int64_value
+
+
+def fetch_hourly_traffic(bucket_name, start_time, end_time):
+    """
+    Return `{hour_start: sent_bytes}` for a bucket between two UTC datetimes, `start_time` on an hour boundary.
+    Points are summed per hour and across series by Cloud Monitoring, so one point per hour comes back;
+    hours without any point are left out.
+
+    Alignment periods end at `end_time`, so when it falls inside an hour the whole hours and the started
+    last hour are aggregated by separate queries.
+    """
+    hourly = {}
+    whole_hours_end = max(start_time, _hour_start(end_time))
+    if whole_hours_end > start_time:
+        _fetch_aligned(bucket_name, start_time, whole_hours_end, int(ONE_HOUR.total_seconds()), hourly)
+    started_hour = int((end_time - whole_hours_end).total_seconds())
+    if started_hour >= MIN_ALIGNMENT_PERIOD:
+        _fetch_aligned(bucket_name, whole_hours_end, end_time, started_hour, hourly)
+    return hourly
+
+
+def _missing_runs(days):
+    """Group consecutive days into `(first, last)` runs so each run costs a single Monitoring query."""
+    runs = []
+    for day in days:
+        if runs and runs[-1][1] + ONE_DAY == day:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def list_days(start_date, end_date, now):
+    """Return the days from `start_date` to `end_date` (inclusive) that have started."""
+    days = []
+    day = start_date
+    while day <= end_date and _day_start(day) < now:
+        days.append(day)
+        day += ONE_DAY
+    return days
+
+
+def is_settled(day, now):
+    """A day is settled (and can be rolled up) once it ended `ROLLUP_SETTLE_SECONDS` ago."""
+    return _day_start(day) + ONE_DAY <= now - datetime.timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+
+
+def _is_retained(day, now):
+    return _day_start(day) >= now - datetime.timedelta(days=MONITORING_RETENTION_DAYS)
+
+
+def read_rollups(bucket_name, days, now):
+    """Return `{rollup_id: rollup}` for the settled `days` that have a rollup, with one batched read."""
+    firestore_client = get_firestore_client()
+    collection = firestore_client.collection(ROLLUP_COLLECTION)
+    settled_refs = [collection.document(get_rollup_id(bucket_name, day)) for day in days if is_settled(day, now)]
+    with span("rollup_read"):
+        return {
+            snapshot.id: snapshot.to_dict()
+            for snapshot in (firestore_client.get_all(settled_refs) if settled_refs else [])
+            if snapshot.exists
+        }
+
+
+def days_to_query(bucket_name, days, rollups, now):
+    """Return the `days` without a rollup that are still within Monitoring's retention."""
+    return [day for day in days if get_rollup_id(bucket_name, day) not in rollups and _is_retained(day, now)]
+
+
+def get_daily_traffic(bucket_name, start_date, end_date, now=None, rollups=None):
+    """
+    Return `{"date", "total", "hourly", "partial", "source"}` for every day from `start_date` to `end_date`
+    (inclusive) that has started, `hourly` holding the 24 hourly sums of the day.
+
+    Settled days are read from their rollups with one batched read, unless `rollups` from `read_rollups`
+    are passed in. Only days without a rollup and the still partial days (today, or days that ended less
+    than `ROLLUP_SETTLE_SECONDS` ago) are queried from Cloud Monitoring; the settled ones that returned
+    data are then persisted so they are never queried again. Days without a rollup that began before
+    Monitoring's retention come back with `source` `unavailable` and `None` for `total` and `hourly`.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    days = list_days(start_date, end_date, now)
+    if rollups is None:
+        rollups = read_rollups(bucket_name, days, now)
+
+    missing = days_to_query(bucket_name, days, rollups, now)
+    hourly = {}
+    for first, last in _missing_runs(missing):
+        end_time = min(_day_start(last) + ONE_DAY, now)
+        with span("monitoring_query"):
+            hourly.update(fetch_hourly_traffic(bucket_name, _day_start(first), end_time))
+
+    series = []
+    new_rollups = {}
+    for day in days:
+        rollup_id = get_rollup_id(bucket_name, day)
+        if rollup_id in rollups:
+            rollup = rollups[rollup_id]
+            series.append({"date": day.isoformat(), "total": rollup["total"], "hourly": rollup["hourly"],
+                           "partial": False, "source": "rollup"})
+            continue
+        if not _is_retained(day, now):
+            series.append({"date": day.isoformat(), "total": None, "hourly": None,
+                           "partial": False, "source": "unavailable"})
+            continue
+
+        hours = [_day_start(day) + hour * ONE_HOUR for hour in range(24)]
+        day_hourly = [hourly.get(hour, 0) for hour in hours]
+        partial = not is_settled(day, now)
+        series.append({"date": day.isoformat(), "total": sum(day_hourly), "hourly": day_hourly,
+                       "partial": partial, "source": "monitoring"})
+        # A day without any point may be an empty or failed response; it's queried again next time
+        if not partial and any(hour in hourly for hour in hours):
+            new_rollups[rollup_id] = {
+                "bucket_name": bucket_name,
+                "date": day.isoformat(),
+                "total": sum(day_hourly),
+                "hourly": day_hourly,
+                "rolled_up_at": now,
+            }
+
+    if new_rollups:
+        with span("rollup_write"):
+            write_documents(get_firestore_client(), ROLLUP_COLLECTION, new_rollups)
+    return series
+
+
+def to_series(daily_traffic, granularity, now=None):
+    """
+    Flatten daily traffic into `[{"start", "sent_bytes"}]` points of the requested granularity;
+    `sent_bytes` is `None` for unavailable days.
+    """
+    if granularity == "day":
+        return [{"start": day["date"], "sent_bytes": day["total"], "partial": day["partial"]}
+                for day in daily_traffic]
+
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    points = []
+    for day in daily_traffic:
+        day_start = _day_start(datetime.date.fromisoformat(day["date"]))
+        for hour, sent_bytes in enumerate(day["hourly"] or [None] * 24):
+            hour_start = day_start + hour * ONE_HOUR
+            if hour_start >= now:
+                break
+            points.append({"start": hour_start.isoformat().replace("+00:00", "Z"), "sent_bytes": sent_bytes})
+    return points
@@ -1,21 +1,83 @@
+import os
 import json
+import time
+import threading
+from dataclasses import dataclass
 from datetime import datetime
+import requests
+from google.api_core import exceptions
+from retries import gcs_options
 
+# Seconds a loaded config is used before its generation is checked again
+CONFIG_CACHE_TTL = float(os.getenv("CONFIG_CACHE_TTL", "300"))
+
+# Loaded configs per (bucket, path) kept across warm invocations
+_config_cache = {}
+_config_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class RegionConfig:
+    """A region of interest: a circle of `radius` meters around `coordinates` ([lon, lat])."""
+    name: str
+    coordinates: list
+    radius: float
+
+
+def get_regions_from_cloud_storage(bucket, config_path):
+    """
+    Fetch the regions of interest from Cloud Storage.
+
+    The config holds either a `regions` list of `{"name", "coordinates", "radius"}` objects or, for a
+    single region, top-level `coordinates` and `radius`.
+
+    The parsed config is cached for the lifetime of the instance. After `CONFIG_CACHE_TTL` seconds
+    the blob generation is checked with a single metadata request, and the config is only downloaded
+    and parsed again when it changed. If storage is unavailable, the last good config is returned.
+    """
+    cache_key = (bucket.name, config_path)
+    with _config_cache_lock:
+        cached = _config_cache.get(cache_key)
+    if cached and time.monotonic() - cached["checked_at"] < CONFIG_CACHE_TTL:
+        return cached["regions"]
 
-def get_region_from_cloud_storage(bucket, config_path):
-    """Fetch region data from Cloud Storage."""
     try:
-        blob = bucket.blob(config_path)
-        if not blob.exists():
+        blob = bucket.get_blob(config_path)
+        if blob is None:
             raise ValueError(f"Config file not found at gs://{bucket.name}/{config_path}")
-        config_data = blob.download_as_text()
-        config = json.loads(config_data)
-        return config.get("coordinates", [6.746, 46.529]), config.get("radius", 10000)
+
+        if cached and cached["generation"] == blob.generation:
+            regions = cached["regions"]
+        else:
+            config_data = blob.download_as_text(if_generation_match=blob.generation, **gcs_options())
+            regions = parse_regions(json.loads(config_data))
     except json.JSONDecodeError:
         raise ValueError("Invalid JSON format in config file.")
+    except (exceptions.GoogleAPIError, requests.exceptions.RequestException) as e:
+        if cached:
+            print(f"Storage unavailable, using the last loaded config: {e}")
+            return cached["regions"]
+        raise ValueError(f"Error fetching config: {str(e)}")
     except Exception as e:
         raise ValueError(f"Error fetching config: {str(e)}")
 
+    with _config_cache_lock:
+        _config_cache[cache_key] = {"generation": blob.generation, "regions": regions, "checked_at": time.monotonic()}
+    return regions
+
+
+def parse_regions(config):
+    """Return the list of `RegionConfig` described by a config dictionary."""
+    regions = config.get("regions") or [config]
+    parsed = []
+    for i, region in enumerate(regions):
+        parsed.append(RegionConfig(
+            name=region.get("name") or (f"region-{i}" if len(regions) > 1 else "default"),
+            coordinates=region.get("coordinates", [6.746, 46.529]),
+            radius=region.get("radius", 10000),
+        ))
+    return parsed
+
 
 def flatten_data(data):
     """Recursively flatten nested arrays or dictionaries in Firestore data."""
@@ -0,0 +1,41 @@
+import os
+import sys
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT_DIR, "functions"), os.path.join(ROOT_DIR, "benchmarks")]
+
+os.environ.setdefault("BUCKET_NAME", "test-bucket")
+os.environ.setdefault("PROJECT_ID", "test-project")
+os.environ.setdefault("CONFIG_PATH", "config/regions.json")
+
+
+@pytest.fixture(autouse=True)
+def client_registry(monkeypatch):
+    """Give every test an empty client registry, so fakes registered by one test don't leak into the next."""
+    import clients
+
+    monkeypatch.setattr(clients, "_clients", {})
+    return clients
+
+
+@pytest.fixture
+def fake_storage(client_registry):
+    """Register an in-memory storage client and return the configured bucket."""
+    from fake_storage import FakeStorageClient
+
+    storage_client = FakeStorageClient()
+    bucket = storage_client.bucket(os.environ["BUCKET_NAME"])
+    client_registry.override_client("storage", storage_client)
+    client_registry.override_client("bucket", bucket)
+    return bucket
+
+
+@pytest.fixture
+def fake_firestore(client_registry):
+    """Register an in-memory Firestore client and return it."""
+    from fake_firestore import FakeFirestoreClient
+
+    firestore_client = FakeFirestoreClient()
+    client_registry.override_client("firestore", firestore_client)
+    return firestore_client
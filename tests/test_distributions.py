@@ -0,0 +1,135 @@
+from types import SimpleNamespace
+import pytest
+from distributions import merge_distributions, distribution_percentiles
+
+PERCENTILES = (10, 50, 90, 99)
+
+
+def explicit(*bounds):
+    return SimpleNamespace(explicit_buckets=SimpleNamespace(bounds=list(bounds)),
+                           exponential_buckets=SimpleNamespace(num_finite_buckets=0),
+                           linear_buckets=SimpleNamespace(num_finite_buckets=0))
+
+
+def linear(num_finite_buckets, width, offset):
+    return SimpleNamespace(explicit_buckets=SimpleNamespace(bounds=[]),
+                           exponential_buckets=SimpleNamespace(num_finite_buckets=0),
+                           linear_buckets=SimpleNamespace(num_finite_buckets=num_finite_buckets, width=width,
+                                                          offset=offset))
+
+
+def exponential(num_finite_buckets, growth_factor, scale):
+    return SimpleNamespace(explicit_buckets=SimpleNamespace(bounds=[]),
+                           exponential_buckets=SimpleNamespace(num_finite_buckets=num_finite_buckets,
+                                                               growth_factor=growth_factor, scale=scale),
+                           linear_buckets=SimpleNamespace(num_finite_buckets=0))
+
+
+def distribution(bucket_options, bucket_counts, mean=0.0, count=None):
+    count = sum(bucket_counts) if count is None else count
+    return SimpleNamespace(count=count, mean=mean, bucket_options=bucket_options, bucket_counts=bucket_counts)
+
+
+def percentiles(*distributions):
+    return distribution_percentiles(merge_distributions(distributions), PERCENTILES)
+
+
+def test_percentiles_interpolate_inside_buckets():
+    # 10 values spread over each of [10, 20), [20, 30) and [30, 40)
+    result = percentiles(distribution(explicit(10, 20, 30, 40), [0, 10, 10, 10, 0]))
+
+    assert result == pytest.approx({10: 13.0, 50: 25.0, 90: 37.0, 99: 39.7})
+
+
+def test_distributions_with_the_same_layout_are_summed():
+    layout = explicit(10, 20, 30, 40)
+    merged = merge_distributions([distribution(layout, [0, 10, 0, 10, 0], mean=25.0),
+                                  distribution(layout, [0, 0, 10, 0, 0], mean=25.0)])
+
+    assert merged["count"] == 30
+    assert merged["mean"] == 25.0
+    assert [list(counts) for counts in merged["layouts"].values()] == [[0, 10, 10, 10, 0]]
+    assert distribution_percentiles(merged, PERCENTILES) == pytest.approx({10: 13.0, 50: 25.0, 90: 37.0, 99: 39.7})
+
+
+def test_mixed_layouts_are_combined_on_the_union_of_their_boundaries():
+    # Linear buckets [0, 10, 20, 30, 40] with 10 values each, exponential buckets [10, 20, 40] with 10 values
+    # in [10, 20) and 20 in [20, 40), and an explicit layout equal to the linear one
+    merged = merge_distributions([
+        distribution(linear(4, 10.0, 0.0), [0, 10, 10, 10, 10, 0], mean=20.0),
+        distribution(exponential(2, 2.0, 10.0), [0, 10, 20, 0], mean=25.0),
+        distribution(explicit(0, 10, 20, 30, 40), [0, 0, 0, 0, 0, 0], mean=0.0, count=0),
+    ])
+
+    assert len(merged["layouts"]) == 2
+    assert merged["count"] == 70
+    assert merged["mean"] == pytest.approx((20.0 * 40 + 25.0 * 30) / 70)
+    # The combined density is 1 value per unit on [0, 10) and 2 on [10, 40)
+    assert distribution_percentiles(merged, PERCENTILES) == pytest.approx({10: 7.0, 50: 22.5, 90: 36.5, 99: 39.65})
+
+
+def test_linear_and_explicit_layouts_with_the_same_boundaries_are_merged():
+    merged = merge_distributions([distribution(linear(4, 10.0, 0.0), [0, 10, 10, 0, 0, 0]),
+                                  distribution(explicit(0, 10, 20, 30, 40), [0, 0, 0, 10, 10, 0])])
+
+    assert len(merged["layouts"]) == 1
+    assert distribution_percentiles(merged, PERCENTILES) == pytest.approx({10: 4.0, 50: 20.0, 90: 36.0, 99: 39.6})
+
+
+def test_truncated_bucket_counts_are_padded_with_empty_buckets():
+    layout = explicit(10, 20, 30, 40)
+    truncated = merge_distributions([distribution(layout, [0, 10, 10])])
+    padded = merge_distributions([distribution(layout, [0, 10, 10, 0, 0])])
+
+    assert [list(counts) for counts in truncated["layouts"].values()] == [[0, 10, 10, 0, 0]]
+    assert distribution_percentiles(truncated, PERCENTILES) == distribution_percentiles(padded, PERCENTILES)
+    assert distribution_percentiles(truncated, PERCENTILES) == pytest.approx({10: 12.0, 50: 20.0, 90: 28.0, 99: 29.8})
+
+
+def test_extra_bucket_counts_are_ignored():
+    merged = merge_distributions([distribution(explicit(10, 20), [0, 10, 0, 5, 5])])
+
+    assert [list(counts) for counts in merged["layouts"].values()] == [[0, 10, 0]]
+
+
+def test_overflow_is_clamped_to_the_last_boundary():
+    # Half of the values are above the last boundary
+    result = percentiles(distribution(explicit(10, 20), [0, 5, 5]))
+
+    assert result == pytest.approx({10: 12.0, 50: 20.0, 90: 20.0, 99: 20.0})
+
+
+def test_underflow_is_spread_from_zero_to_the_first_boundary():
+    result = percentiles(distribution(explicit(10, 20), [10, 0, 0]))
+
+    assert result == pytest.approx({10: 1.0, 50: 5.0, 90: 9.0, 99: 9.9})
+
+
+def test_underflow_below_a_negative_first_boundary_is_clamped_to_it():
+    result = percentiles(distribution(explicit(-10, 10), [4, 6, 0]))
+
+    assert result[10] == -10.0
+    assert result[50] == pytest.approx(-10 + 20 / 6)
+    assert result[99] == pytest.approx(-10 + 5.9 / 6 * 20)
+
+
+def test_zero_count_distributions_are_skipped():
+    merged = merge_distributions([distribution(explicit(10, 20), [0, 0, 0], mean=50.0)])
+
+    assert merged == {"count": 0, "mean": 0.0, "layouts": {}}
+    assert distribution_percentiles(merged, PERCENTILES) == {p: 0.0 for p in PERCENTILES}
+
+
+def test_bucketless_distributions_fall_back_to_the_mean():
+    merged = merge_distributions([distribution(explicit(), [4], mean=10.0),
+                                  distribution(explicit(), [], mean=20.0, count=4)])
+
+    assert merged["count"] == 8
+    assert distribution_percentiles(merged, PERCENTILES) == {p: 15.0 for p in PERCENTILES}
+
+
+def test_bucketless_distributions_are_ignored_next_to_bucketed_ones():
+    result = percentiles(distribution(explicit(), [100], mean=1000.0),
+                         distribution(explicit(10, 20, 30, 40), [0, 10, 10, 10, 0], mean=25.0))
+
+    assert result == pytest.approx({10: 13.0, 50: 25.0, 90: 37.0, 99: 39.7})
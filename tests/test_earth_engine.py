@@ -0,0 +1,51 @@
+import pytest
+import earth_engine
+from earth_engine import EarthEngineClient
+from fake_earth_engine import FakeEarthEngineModule
+
+START_DATE, END_DATE = "2022-01-01", "2022-04-01"
+
+
+@pytest.fixture
+def fake_ee(client_registry):
+    def register(scene_count):
+        module = FakeEarthEngineModule(scene_count, START_DATE, END_DATE)
+        client_registry.override_client("earth_engine", module)
+        return module
+    return register
+
+
+def test_list_scenes_fetches_a_window_in_one_round_trip(fake_ee):
+    module = fake_ee(25)
+
+    scenes = EarthEngineClient().list_scenes("LANDSAT/LC09/C02/T2_TOA", START_DATE, END_DATE, region=None)
+
+    assert module.round_trips == 1
+    assert len(scenes) == 25
+    times = [scene["properties"]["system:time_start"] for scene in scenes]
+    assert times == sorted(times)
+
+
+def test_list_scenes_pages_past_the_collection_limit(fake_ee):
+    module = fake_ee(5200)
+    # A single getInfo() of the whole window is what Earth Engine rejects
+    with pytest.raises(RuntimeError, match="5000 elements"):
+        module.ImageCollection("LANDSAT/LC09/C02/T2_TOA").getInfo()
+    module.round_trips = 0
+
+    scenes = EarthEngineClient().list_scenes("LANDSAT/LC09/C02/T2_TOA", START_DATE, END_DATE, region=None)
+
+    assert module.round_trips == 6
+    assert len(scenes) == 5200
+    assert len({scene["id"] for scene in scenes}) == 5200
+
+
+def test_list_scenes_stops_after_a_full_last_page(fake_ee, monkeypatch):
+    monkeypatch.setattr(earth_engine, "LIST_PAGE_SIZE", 10)
+    module = fake_ee(20)
+
+    scenes = EarthEngineClient().list_scenes("LANDSAT/LC09/C02/T2_TOA", START_DATE, END_DATE, region=None)
+
+    # Two full pages and the empty page that ends the listing
+    assert module.round_trips == 3
+    assert len(scenes) == 20
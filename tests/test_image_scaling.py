@@ -0,0 +1,50 @@
+import io
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+import image_scaling
+from bench_suite import make_png
+from fake_storage import FakeBlob
+
+
+class StreamingSource(io.BytesIO):
+    """A blob reader whose reads past the middle of the file wait until every reader has got that far."""
+
+    def __init__(self, data, barrier):
+        super().__init__(data)
+        self.barrier = barrier
+        self.waited = False
+
+    def read(self, size=-1):
+        if not self.waited and self.tell() >= len(self.getbuffer()) // 2:
+            self.waited = True
+            self.barrier.wait()
+        return super().read(size)
+
+
+def test_streamed_sources_download_concurrently_with_a_single_cpu_slot(monkeypatch):
+    monkeypatch.setattr(image_scaling, "_cpu_slots", threading.BoundedSemaphore(1))
+    readers = 4
+    barrier = threading.Barrier(readers, timeout=5)
+    sources = [StreamingSource(make_png(512, seed), barrier) for seed in range(readers)]
+    specs = [image_scaling.RENDITIONS["thumb"]]
+
+    with ThreadPoolExecutor(readers) as executor:
+        rendered = list(executor.map(lambda source: image_scaling.render_renditions(source, specs), sources))
+
+    assert all(renditions["thumb"] for renditions in rendered)
+
+
+def test_trigger_skips_uploads_above_the_byte_budget(fake_storage, monkeypatch):
+    import rendition_trigger
+
+    source = FakeBlob(fake_storage, "landsat_images/scene.png")
+    source.upload_from_string(make_png(64, 0), content_type="image/png")
+    monkeypatch.setattr(image_scaling, "MAX_SOURCE_BYTES", source.size - 1)
+    event = SimpleNamespace(data=SimpleNamespace(bucket=fake_storage.name, name=source.name,
+                                                 generation=source.generation, size=str(source.size)))
+
+    # Unwrapped from the Cloud Functions decorator, which expects a raw CloudEvent
+    rendition_trigger.scale_uploaded_image.__wrapped__(event)
+
+    assert list(fake_storage.list_blobs(prefix="scaled_images/")) == []
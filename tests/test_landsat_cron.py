@@ -0,0 +1,144 @@
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import event_loop
+import landsat_cron
+from bench_suite import make_png
+from fake_earth_engine import FakeEarthEngineClient
+from utils import RegionConfig
+
+COLLECTION = "LANDSAT/LC09/C02/T2_TOA"
+START_DATE, END_DATE = "2022-01-01", "2022-04-01"
+TODAY = datetime(2024, 4, 1)
+REGION = RegionConfig("lausanne", [6.746, 46.529], 10000)
+PNG = make_png(32, 0)
+
+
+@pytest.fixture
+def thumbnail_server():
+    """Local HTTP server serving `PNG` for every thumbnail, except the scene ids in `server.missing` (404)."""
+    missing = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            scene_id = self.path.rsplit("/", 1)[-1].removesuffix(".png")
+            status, body = (404, b"") if scene_id in missing else (200, PNG)
+            self.send_response(status)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.missing = missing
+    server.base_url = f"http://127.0.0.1:{server.server_port}/thumbnails"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def earth_engine(thumbnail_server, monkeypatch):
+    client = FakeEarthEngineClient(scene_count=5, thumbnail_base_url=thumbnail_server.base_url)
+    monkeypatch.setattr(landsat_cron, "earth_engine_client", client)
+    return client
+
+
+@pytest.fixture(params=["sync", "async"])
+def ingest_region(request):
+    """`ingest_region`, or `ingest_region_async` run on the shared event loop."""
+    if request.param == "sync":
+        return landsat_cron.ingest_region
+    return lambda *args: event_loop.run(landsat_cron.ingest_region_async(*args))
+
+
+def scene_ids(earth_engine):
+    return [scene["id"].split("/")[-1] for scene in earth_engine.list_scenes(COLLECTION, START_DATE, END_DATE, None)]
+
+
+def watermark():
+    return landsat_cron.get_watermark_ref(COLLECTION, REGION.coordinates, REGION.radius).get()
+
+
+def test_ingest_region_saves_thumbnails_metadata_and_watermark(fake_storage, fake_firestore, earth_engine,
+                                                                ingest_region):
+    report = ingest_region(COLLECTION, REGION, START_DATE, END_DATE, TODAY)
+
+    ids = scene_ids(earth_engine)
+    expected_blobs = [f"landsat_images/{image_id}.png" for image_id in ids]
+    assert report["message"] == "Region ingested successfully"
+    assert report["image_count"] == 5
+    assert report["errors"] == []
+    assert report["skipped_images"] == []
+    assert sorted(report["saved_images"]) == sorted(expected_blobs)
+    for name in expected_blobs:
+        blob = fake_storage.get_blob(name)
+        assert blob.data == PNG
+        assert blob.content_type == "image/png"
+
+    metadata = {snapshot.id: snapshot.to_dict() for snapshot in fake_firestore.collection("landsat_metadata").stream()}
+    assert sorted(metadata) == sorted(ids)
+    assert all(document["location"]["region_radius"] == REGION.radius for document in metadata.values())
+
+    assert watermark().exists
+    assert watermark().get("end_date") == END_DATE
+
+
+def test_ingest_region_skips_a_window_behind_the_watermark(fake_storage, fake_firestore, earth_engine,
+                                                            ingest_region):
+    ingest_region(COLLECTION, REGION, START_DATE, END_DATE, TODAY)
+    round_trips = earth_engine.round_trips
+
+    report = ingest_region(COLLECTION, REGION, START_DATE, END_DATE, TODAY)
+
+    assert report["message"] == "No new images"
+    assert earth_engine.round_trips == round_trips
+
+
+def test_failed_thumbnail_is_reported_and_holds_the_watermark(fake_storage, fake_firestore, earth_engine,
+                                                              thumbnail_server, ingest_region):
+    failing = scene_ids(earth_engine)[2]
+    thumbnail_server.missing.add(failing)
+
+    report = ingest_region(COLLECTION, REGION, START_DATE, END_DATE, TODAY)
+
+    assert [error["id"].split("/")[-1] for error in report["errors"]] == [failing]
+    assert len(report["saved_images"]) == 4
+    assert fake_storage.get_blob(f"landsat_images/{failing}.png") is None
+    assert not watermark().exists
+
+    # The next run only ingests the scene that failed
+    thumbnail_server.missing.clear()
+    report = ingest_region(COLLECTION, REGION, START_DATE, END_DATE, TODAY)
+
+    assert report["saved_images"] == [f"landsat_images/{failing}.png"]
+    assert len(report["skipped_images"]) == 4
+    assert watermark().get("end_date") == END_DATE
+
+
+def test_backfill_catalog_adds_fields_to_scenes_stored_without_them(fake_storage, fake_firestore, earth_engine):
+    landsat_cron.ingest_region(COLLECTION, REGION, START_DATE, END_DATE, TODAY)
+    metadata = fake_firestore.collection("landsat_metadata")
+    expected = {snapshot.id: snapshot.to_dict() for snapshot in metadata.stream()}
+    # Documents stored before the catalog fields existed only have the flattened properties
+    for image_id, data in expected.items():
+        metadata.document(image_id).set({field: value for field, value in data.items()
+                                         if field not in landsat_cron.CATALOG_FIELDS})
+
+    pages, cursor = [], None
+    while True:
+        page = landsat_cron.backfill_catalog(page_size=2, cursor=cursor)
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [page["scanned"] for page in pages] == [2, 2, 1]
+    assert sum(page["updated"] for page in pages) == 5
+    assert {snapshot.id: snapshot.to_dict() for snapshot in metadata.stream()} == expected
+    assert landsat_cron.backfill_catalog()["updated"] == 0
@@ -0,0 +1,145 @@
+import asyncio
+import datetime
+import threading
+import pytest
+from google.cloud import monitoring_v3
+import cache
+import event_loop
+import firebase_stats
+import monitoring_queries
+from fake_monitoring import FakeMetricServiceClient, FakeMetricServiceAsyncClient
+
+Aligner = monitoring_v3.Aggregation.Aligner
+Reducer = monitoring_v3.Aggregation.Reducer
+
+START = datetime.datetime(2024, 3, 1, tzinfo=datetime.timezone.utc)
+END = datetime.datetime(2024, 3, 31, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def metrics_cache(monkeypatch):
+    metrics_cache = cache.TTLCache(60)
+    monkeypatch.setattr(monitoring_queries, "_metrics_cache", metrics_cache)
+    return metrics_cache
+
+
+@pytest.fixture
+def monitoring(client_registry):
+    client = FakeMetricServiceClient()
+    client_registry.override_client("monitoring", client)
+    return client
+
+
+def test_sum_is_aggregated_server_side_over_the_interval(monitoring):
+    total = monitoring_queries.get_metric_sum(firebase_stats.READ_COUNT_METRIC, START, END)
+
+    [request] = monitoring.requests
+    assert request["name"] == "projects/test-project"
+    assert request["filter"] == f'metric.type="{firebase_stats.READ_COUNT_METRIC}"'
+    assert request["interval"] == {"start_time": {"seconds": int(START.timestamp())},
+                                   "end_time": {"seconds": int(END.timestamp())}}
+    aggregation = request["aggregation"]
+    assert aggregation.per_series_aligner == Aligner.ALIGN_SUM
+    assert aggregation.cross_series_reducer == Reducer.REDUCE_SUM
+    # One alignment period spanning the whole interval, so a single point comes back
+    assert aggregation.alignment_period == END - START
+    assert isinstance(total, int)
+
+
+def test_distribution_is_aligned_per_series_and_merged_locally(monitoring):
+    summary = monitoring_queries.get_metric_distribution(firebase_stats.REQUEST_LATENCIES_METRIC, START, END)
+
+    [request] = monitoring.requests
+    aggregation = request["aggregation"]
+    assert aggregation.per_series_aligner == Aligner.ALIGN_DELTA
+    assert aggregation.cross_series_reducer == Reducer.REDUCE_NONE
+    assert aggregation.alignment_period == END - START
+    assert set(summary) == {"count", "mean", "p50", "p90", "p99"}
+    assert summary["count"] > 0
+    assert summary["p50"] <= summary["p90"] <= summary["p99"]
+
+
+def test_alignment_period_is_at_least_a_minute(monitoring):
+    monitoring_queries.get_metric_sum(firebase_stats.READ_COUNT_METRIC, START, START + datetime.timedelta(seconds=10))
+
+    [request] = monitoring.requests
+    minimum = datetime.timedelta(seconds=monitoring_queries.MIN_ALIGNMENT_PERIOD)
+    assert request["aggregation"].alignment_period == minimum
+
+
+def test_results_are_cached_per_metric_and_interval(monitoring, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+
+    first = monitoring_queries.get_metric_sum(firebase_stats.READ_COUNT_METRIC, START, END)
+    assert monitoring_queries.get_metric_sum(firebase_stats.READ_COUNT_METRIC, START, END) == first
+    assert len(monitoring.requests) == 1
+
+    # Another metric or interval is a miss
+    monitoring_queries.get_metric_sum(firebase_stats.REQUEST_COUNT_METRIC, START, END)
+    monitoring_queries.get_metric_sum(firebase_stats.READ_COUNT_METRIC, START, END - datetime.timedelta(days=1))
+    assert len(monitoring.requests) == 3
+
+    # Entries expire after the TTL
+    now[0] += 61
+    monitoring_queries.get_metric_sum(firebase_stats.READ_COUNT_METRIC, START, END)
+    assert len(monitoring.requests) == 4
+
+
+def test_async_queries_share_the_cache(monitoring, client_registry):
+    async_monitoring = FakeMetricServiceAsyncClient()
+    client_registry.override_client("async_monitoring", async_monitoring)
+
+    value = event_loop.run(monitoring_queries.get_metric_sum_async(firebase_stats.READ_COUNT_METRIC, START, END))
+
+    assert monitoring_queries.get_metric_sum(firebase_stats.READ_COUNT_METRIC, START, END) == value
+    assert len(async_monitoring.requests) == 1
+    assert monitoring.requests == []
+
+
+def test_stats_metrics_are_queried_concurrently(client_registry):
+    class BarrierMonitoring(FakeMetricServiceClient):
+        """Every query waits until all three are in flight; sequential queries break the barrier."""
+
+        def __init__(self):
+            super().__init__()
+            self.barrier = threading.Barrier(3, timeout=5)
+
+        def list_time_series(self, request):
+            self.barrier.wait()
+            return super().list_time_series(request)
+
+    monitoring = BarrierMonitoring()
+    client_registry.override_client("monitoring", monitoring)
+
+    reads, latency, request_count = firebase_stats.fetch_metrics(START, END)
+
+    assert {request["filter"] for request in monitoring.requests} == {
+        f'metric.type="{metric}"' for metric in (firebase_stats.READ_COUNT_METRIC,
+                                                 firebase_stats.REQUEST_LATENCIES_METRIC,
+                                                 firebase_stats.REQUEST_COUNT_METRIC)
+    }
+    assert "p99" in latency
+
+
+def test_async_stats_metrics_are_awaited_together(client_registry):
+    class CountingMonitoring(FakeMetricServiceAsyncClient):
+        def __init__(self):
+            super().__init__()
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+        async def list_time_series(self, request):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.05)
+            self.in_flight -= 1
+            return await super().list_time_series(request)
+
+    async_monitoring = CountingMonitoring()
+    client_registry.override_client("async_monitoring", async_monitoring)
+
+    event_loop.run(firebase_stats.fetch_metrics_async(START, END))
+
+    assert len(async_monitoring.requests) == 3
+    assert async_monitoring.max_in_flight == 3
@@ -0,0 +1,118 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from google.api_core import exceptions
+import retries
+from http_session import fetch_bytes
+from retries import RetryBudget, RetryPolicy, get_retry_stats
+
+PAYLOAD = b"thumbnail"
+
+
+@pytest.fixture
+def flaky_server():
+    """Local HTTP server answering with the statuses queued in `server.statuses`, then 200."""
+    statuses = []
+    requests_seen = []
+
+    class FlakyHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            requests_seen.append(self.path)
+            status = statuses.pop(0) if statuses else 200
+            body = PAYLOAD if status == 200 else b""
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    server.statuses = statuses
+    server.requests = requests_seen
+    server.url = f"http://127.0.0.1:{server.server_port}/thumbnail.png"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def policy(name, max_attempts=4, budget=None):
+    return RetryPolicy(name, max_attempts=max_attempts, initial_delay=0.001, max_delay=0.01, budget=budget)
+
+
+def test_transient_statuses_are_retried_until_success(flaky_server):
+    flaky_server.statuses.extend([503, 503])
+
+    assert fetch_bytes(flaky_server.url, retry=policy("test_success")) == PAYLOAD
+    assert len(flaky_server.requests) == 3
+    assert get_retry_stats()["test_success"] == {"calls": 1, "retries": 2, "budget_exhausted": 0, "failures": 0}
+
+
+def test_attempts_stop_at_max_attempts(flaky_server):
+    flaky_server.statuses.extend([503] * 10)
+
+    with pytest.raises(requests.HTTPError):
+        fetch_bytes(flaky_server.url, retry=policy("test_max_attempts", max_attempts=3))
+    assert len(flaky_server.requests) == 3
+    assert get_retry_stats()["test_max_attempts"] == {"calls": 1, "retries": 2, "budget_exhausted": 0,
+                                                      "failures": 1}
+
+
+def test_permanent_statuses_are_not_retried(flaky_server):
+    flaky_server.statuses.append(404)
+
+    with pytest.raises(requests.HTTPError):
+        fetch_bytes(flaky_server.url, retry=policy("test_permanent"))
+    assert len(flaky_server.requests) == 1
+
+
+def test_exhausted_budget_stops_retries_and_is_counted(flaky_server):
+    flaky_server.statuses.extend([503] * 10)
+    # One retry in the budget and no refill
+    budget = RetryBudget(ratio=0, minimum=1)
+
+    with pytest.raises(requests.HTTPError):
+        fetch_bytes(flaky_server.url, retry=policy("test_budget", max_attempts=5, budget=budget))
+    assert len(flaky_server.requests) == 2
+    assert get_retry_stats()["test_budget"] == {"calls": 1, "retries": 1, "budget_exhausted": 1, "failures": 1}
+
+
+def test_api_core_retry_stops_at_max_attempts():
+    retry_policy = policy("test_api_core", max_attempts=3)
+    attempts = []
+
+    def unavailable():
+        attempts.append(1)
+        raise exceptions.ServiceUnavailable("unavailable")
+
+    with pytest.raises(exceptions.ServiceUnavailable):
+        retry_policy.as_api_core_retry()(unavailable)()
+    assert len(attempts) == 3
+
+    # Every call gets its own attempt count
+    with pytest.raises(exceptions.ServiceUnavailable):
+        retry_policy.as_api_core_retry()(unavailable)()
+    assert len(attempts) == 6
+    assert get_retry_stats()["test_api_core"] == {"calls": 0, "retries": 4, "budget_exhausted": 0, "failures": 2}
+
+
+def test_api_core_retry_does_not_retry_permanent_errors():
+    attempts = []
+
+    def not_found():
+        attempts.append(1)
+        raise exceptions.NotFound("missing")
+
+    with pytest.raises(exceptions.NotFound):
+        policy("test_api_core_permanent").as_api_core_retry()(not_found)()
+    assert len(attempts) == 1
+
+
+def test_storage_transport_errors_are_retryable():
+    assert retries.is_retryable(ConnectionError("connection reset"))
+    assert not retries.is_retryable(ValueError("bad request"))
@@ -0,0 +1,118 @@
+import datetime
+import threading
+import pytest
+from google.auth import credentials as auth_credentials
+import image_scaling
+import signed_urls
+from bench_suite import http_call, make_png
+from fake_storage import FakeBlob, FakeUrlSigner
+
+NOW = datetime.datetime(2024, 5, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def signer(client_registry, monkeypatch):
+    monkeypatch.delenv("STORAGE_EMULATOR_HOST", raising=False)
+    clock = [NOW]
+    url_signer = FakeUrlSigner(clock=lambda: clock[0])
+    url_signer.now = clock
+    client_registry.override_client("url_signer", url_signer)
+    return url_signer
+
+
+@pytest.fixture
+def rendition(fake_storage):
+    """A source image and its fresh `hd` rendition."""
+    source = FakeBlob(fake_storage, "landsat_images/scene 1.png")
+    source.upload_from_string(make_png(16, 0), content_type="image/png")
+    scaled = FakeBlob(fake_storage, image_scaling.get_scaled_blob_name(source.name))
+    scaled.metadata = {image_scaling.SOURCE_GENERATION_KEY: str(source.generation)}
+    scaled.upload_from_string(b"rendition", content_type="image/png")
+    return source, scaled
+
+
+def test_signed_url_is_deterministic_and_pinned_to_generation_and_expiry(signer, rendition):
+    _, scaled = rendition
+
+    url = signed_urls.sign_url(scaled)
+
+    expires = int((NOW + datetime.timedelta(minutes=signed_urls.SIGNED_URL_EXPIRATION_MINUTES)).timestamp())
+    assert url.startswith("https://storage.fake/test-bucket/scaled_images/scene%201_hd.png?")
+    assert f"generation={scaled.generation}" in url
+    assert f"expires={expires}" in url
+    assert signed_urls.sign_url(scaled) == url
+    assert signer.verify(url) == ("test-bucket", "scaled_images/scene 1_hd.png", scaled.generation)
+
+
+def test_signed_url_expires_and_rejects_tampering(signer, rendition):
+    _, scaled = rendition
+    url = signed_urls.sign_url(scaled)
+
+    assert signer.verify(url.replace(f"generation={scaled.generation}", "generation=1")) is None
+    signer.now[0] = NOW + datetime.timedelta(minutes=signed_urls.SIGNED_URL_EXPIRATION_MINUTES)
+    assert signer.verify(url) is None
+
+
+def test_get_scaled_images_signed_url_delivery(signer, rendition, fake_storage):
+    import main
+
+    source, scaled = rendition
+    response = http_call(main.get_scaled_images, {"delivery": "signed_url"})
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-store"
+    assert "ETag" not in response.headers
+    [image] = response.get_json()["scaled_images"]
+    assert image["path"] == scaled.name
+    assert image["generation"] == scaled.generation
+    assert signer.verify(image["url"]) == (fake_storage.name, scaled.name, scaled.generation)
+
+
+def test_emulator_urls_bypass_the_signer(signer, rendition, monkeypatch):
+    monkeypatch.setenv("STORAGE_EMULATOR_HOST", "http://localhost:9090")
+    _, scaled = rendition
+
+    url = signed_urls.sign_url(scaled)
+
+    assert url == (f"http://localhost:9090/v0/b/test-bucket/o/scaled_images%2Fscene%201_hd.png"
+                   f"?alt=media&generation={scaled.generation}")
+
+
+def test_url_signer_refreshes_the_token_once_for_concurrent_requests(monkeypatch):
+    class Credentials(auth_credentials.Credentials):
+        service_account_email = "functions@test-project.iam.gserviceaccount.com"
+
+        def __init__(self):
+            super().__init__()
+            self.refreshes = 0
+
+        def refresh(self, request):
+            self.refreshes += 1
+            self.token = f"token-{self.refreshes}"
+            self.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+    credentials = Credentials()
+    defaults = []
+
+    def default():
+        defaults.append(1)
+        return credentials, "test-project"
+
+    monkeypatch.setattr("google.auth.default", default)
+    url_signer = signed_urls.UrlSigner()
+    barrier = threading.Barrier(8)
+    results = []
+
+    def sign():
+        barrier.wait()
+        results.append(url_signer._signing_kwargs())
+
+    threads = [threading.Thread(target=sign) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(defaults) == 1
+    assert credentials.refreshes == 1
+    assert results == [{"service_account_email": Credentials.service_account_email, "access_token": "token-1"}] * 8